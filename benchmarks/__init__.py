@@ -0,0 +1,19 @@
+"""
+Benchmarks do projeto. Executar a partir da raiz, ex.: python -m benchmarks.normalization
+"""
+import os
+
+
+def setup_django():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
@@ -0,0 +1,112 @@
+"""
+Servidor HTTP local que simula a API do OpenWeather (/weather e /forecast) para os benchmarks.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+COORDINATES = {"lat": -8.05, "lon": -34.9}
+
+
+class FakeOpenWeatherServer(ThreadingHTTPServer):
+    """
+    latency: atraso (segundos) antes de responder; error_rate: fração de respostas 500;
+    payload_bytes: tamanho do campo de preenchimento de cada registro;
+    forecast_records: quantidade de itens retornados pelo /forecast.
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, error_rate=0.0, payload_bytes=0, forecast_records=40, seed=0):
+        super().__init__(('127.0.0.1', 0), FakeOpenWeatherHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.payload_bytes = payload_bytes
+        self.forecast_records = forecast_records
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='fake-openweather', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.error_rate
+            self.errors += failed
+            return failed
+
+    def build_record(self, city, index=0):
+        return {
+            "coord": COORDINATES,
+            "weather": [{"id": 800, "main": "Clear", "description": "céu limpo"}],
+            "main": {"temp": 20 + index % 15, "humidity": 40 + index % 60},
+            "dt": 1_700_000_000 + index * 10_800,
+            "sys": {"country": "BR"},
+            "name": city,
+            "padding": "x" * self.payload_bytes,
+        }
+
+
+class FakeOpenWeatherHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        city = parse_qs(url.query).get('q', ['Recife'])[0]
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.should_fail():
+            return self.send_json(500, {"cod": 500, "message": "erro simulado"})
+        if url.path.endswith('/weather'):
+            return self.send_json(200, server.build_record(city))
+        if url.path.endswith('/forecast'):
+            return self.send_forecast(city)
+        return self.send_json(404, {"cod": 404, "message": "not found"})
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_forecast(self, city):
+        """Envia o /forecast em blocos (chunked), como uma resposta grande real."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_chunk(data):
+            self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+
+        write_chunk(b'{"cod":"200","list":[')
+        for index in range(self.server.forecast_records):
+            record = self.server.build_record(city, index)
+            record.pop('name')
+            write_chunk((b',' if index else b'') + json.dumps(record).encode())
+        write_chunk(b'],"city":' + json.dumps({"name": city, "country": "BR", "coord": COORDINATES}).encode() + b'}')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,227 @@
+"""
+Benchmark de ponta a ponta da ingestão: sobe um OpenWeather falso local, cria N integrações
+(com as respectivas credenciais) e executa fetch_all_active_integrations de forma síncrona.
+
+Reporta vazão (integrações e registros por segundo), latência p50/p99 por integração,
+consultas SQL por registro e pico de memória. Com --output os resultados são gravados em JSON
+e com --compare são comparados com uma execução anterior.
+
+Use um banco dedicado: as integrações do benchmark são criadas com o prefixo --prefix e removidas
+ao final, e a execução é recusada se existirem outras integrações ativas.
+
+Uso:
+    python -m benchmarks.ingest --integrations 50 --mode forecast --records 200 --latency 0.05
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from benchmarks import percentile, setup_django
+from benchmarks.fake_openweather import FakeOpenWeatherServer
+
+
+class QueryCounter:
+    """Conta as consultas SQL de todas as conexões (inclusive as abertas por threads durante a execução)."""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def capture(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        def install(sender, connection, **kwargs):
+            connection.execute_wrappers.append(self)
+
+        wrapped = []
+        for connection in connections.all(initialized_only=True):
+            connection.execute_wrappers.append(self)
+            wrapped.append(connection)
+        connection_created.connect(install, weak=False)
+        try:
+            yield self
+        finally:
+            connection_created.disconnect(install)
+            for connection in wrapped:
+                if self in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(self)
+
+
+def seed_integrations(prefix, count, base_url, mode):
+    from integrations.models import CredentialsEntity, Integration
+
+    credentials = CredentialsEntity.objects.create(
+        name=f'{prefix} credenciais',
+        handle=f'{prefix}-credentials'[:32],
+        credentials_type_id='open_weather',
+        credentials_type_data={'base_url': base_url},
+        credentials_type_private_data={'api_key': 'benchmark-api-key'},
+        is_active=True,
+    )
+    Integration.objects.bulk_create([
+        Integration(
+            name=f'{prefix} {index}',
+            handle=f'{prefix}-{index}',
+            credentials=credentials,
+            provider_backend_id='open_weather',
+            provider_backend_data={'city': f'Cidade {index}', 'language': 'pt_br', 'mode': mode},
+            is_active=True,
+        )
+        for index in range(count)
+    ])
+
+
+def cleanup(prefix):
+    from integrations.models import ContextualEvent, CredentialsEntity, Integration
+
+    integrations = Integration.objects.filter(handle__startswith=f'{prefix}-')
+    ContextualEvent.objects.filter(integration__in=integrations).delete()
+    integrations.delete()
+    CredentialsEntity.objects.filter(handle__startswith=f'{prefix}-').delete()
+
+
+def run(args):
+    from integrations import tasks
+    from integrations.caching import active_integrations
+    from integrations.models import Integration
+
+    others = Integration.objects.filter(is_active=True).exclude(handle__startswith=f'{args.prefix}-').count()
+    if others and not args.allow_existing:
+        sys.exit(f'Existem {others} outras integrações ativas neste banco; use um banco dedicado '
+                 f'ou --allow-existing (elas também serão executadas).')
+
+    server = FakeOpenWeatherServer(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        payload_bytes=args.payload_bytes,
+        forecast_records=args.records,
+        seed=args.seed,
+    ).start()
+
+    latencies = []
+    original_pipeline = tasks.run_ingest_pipeline
+
+    def timed_pipeline(provider_backend, *pipeline_args, **pipeline_kwargs):
+        started = time.perf_counter()
+        try:
+            return original_pipeline(provider_backend, *pipeline_args, **pipeline_kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    cleanup(args.prefix)
+    seed_integrations(args.prefix, args.integrations, server.base_url, args.mode)
+    active_integrations.invalidate()
+
+    counter = QueryCounter()
+    tasks.run_ingest_pipeline = timed_pipeline
+    tracemalloc.start()
+    try:
+        with counter.capture():
+            started = time.perf_counter()
+            result = tasks.fetch_all_active_integrations.apply()
+            elapsed = time.perf_counter() - started
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        tasks.run_ingest_pipeline = original_pipeline
+        server.stop()
+        if not args.keep:
+            cleanup(args.prefix)
+
+    stats = result.result if isinstance(result.result, dict) else {}
+    records = sum(item['persisted'] for item in stats.values())
+    return {
+        'parameters': {
+            'integrations': args.integrations,
+            'mode': args.mode,
+            'records_per_integration': args.records if args.mode == 'forecast' else 1,
+            'latency': args.latency,
+            'error_rate': args.error_rate,
+            'payload_bytes': args.payload_bytes,
+        },
+        'elapsed_seconds': elapsed,
+        'integrations_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'records': records,
+        'records_per_second': records / elapsed if elapsed else 0.0,
+        'latency_p50_ms': percentile(latencies, 0.50) * 1000,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000,
+        'queries': counter.count,
+        'queries_per_record': counter.count / records if records else None,
+        'peak_memory_mb': peak_memory / 1024 / 1024,
+        'upstream_requests': server.requests,
+        'upstream_errors': server.errors,
+    }
+
+
+def print_report(results, previous=None):
+    rows = [
+        ('Tempo total (s)', 'elapsed_seconds', '{:.2f}'),
+        ('Integrações/s', 'integrations_per_second', '{:.1f}'),
+        ('Registros persistidos', 'records', '{}'),
+        ('Registros/s', 'records_per_second', '{:.1f}'),
+        ('Latência p50 (ms)', 'latency_p50_ms', '{:.1f}'),
+        ('Latência p99 (ms)', 'latency_p99_ms', '{:.1f}'),
+        ('Consultas SQL', 'queries', '{}'),
+        ('Consultas por registro', 'queries_per_record', '{:.2f}'),
+        ('Pico de memória (MB)', 'peak_memory_mb', '{:.1f}'),
+        ('Requisições ao provider', 'upstream_requests', '{}'),
+        ('Erros do provider', 'upstream_errors', '{}'),
+    ]
+    print('Parâmetros:', json.dumps(results['parameters'], ensure_ascii=False))
+    if previous and previous.get('parameters') != results['parameters']:
+        print('  Atenção: a execução anterior usou parâmetros diferentes:',
+              json.dumps(previous.get('parameters'), ensure_ascii=False))
+    for label, key, fmt in rows:
+        value = results.get(key)
+        line = f'  {label:<26} {fmt.format(value) if value is not None else "-":>12}'
+        old = (previous or {}).get(key)
+        if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+            line += f'  ({(value - old) / old:+.1%} vs anterior)'
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--integrations', type=int, default=20, help='Quantidade de integrações criadas.')
+    parser.add_argument('--mode', choices=['current', 'forecast'], default='current',
+                        help='current: 1 registro por integração; forecast: --records registros em streaming.')
+    parser.add_argument('--records', type=int, default=40, help='Registros por integração no modo forecast.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latência simulada do provider (segundos).')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de respostas 500 do provider.')
+    parser.add_argument('--payload-bytes', type=int, default=0, help='Bytes extras em cada registro.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prefix', default='bench', help='Prefixo dos handles criados.')
+    parser.add_argument('--keep', action='store_true', help='Mantém os dados criados ao final.')
+    parser.add_argument('--allow-existing', action='store_true', help='Executa mesmo com outras integrações ativas.')
+    parser.add_argument('--output', help='Grava os resultados neste arquivo JSON.')
+    parser.add_argument('--compare', help='Arquivo JSON de uma execução anterior para comparação.')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results = run(args)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+    print_report(results, previous)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
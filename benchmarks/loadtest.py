@@ -0,0 +1,296 @@
+"""
+Teste de carga dos endpoints de eventos e dados contextuais da API.
+
+Executa um pacote de cenários (filtros RQL, profundidade de página, geo) com cada modo de
+autenticação (jwt, session, basic e api-key) e nível de concorrência informados, contra um
+servidor local já em execução (ou iniciado com --start-server), e reporta vazão, latências
+p50/p90/p99 e respostas por status de cada combinação. Com --output os resultados são gravados
+em JSON e com --compare são comparados com uma execução anterior.
+
+Para volumes realistas, gere os dados antes com o comando generate_synthetic_data. O limite de
+taxa (API_THROTTLE_RATE) e o de requisições simultâneas por cliente (API_MAX_CONCURRENT_REQUESTS)
+do servidor também se aplicam ao teste: as respostas 429 aparecem no relatório.
+
+Uso:
+    python -m benchmarks.loadtest --username admin --password admin --auth jwt basic --concurrency 1 4 16
+"""
+import argparse
+import base64
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import requests
+
+from benchmarks import percentile
+
+EVENTS_PATH = '/api/v1/integrations/contextual-events/'
+DATA_PATH = '/api/v1/integrations/contextual-data/'
+
+SCENARIOS = [
+    {'name': 'events-first-page', 'path': EVENTS_PATH, 'query': ''},
+    {'name': 'events-deep-page', 'path': EVENTS_PATH, 'query': 'page={deep_page}'},
+    {'name': 'events-city', 'path': EVENTS_PATH, 'query': 'eq(city,{city})'},
+    {'name': 'events-date-range', 'path': EVENTS_PATH,
+     'query': 'ge(event_date,{start_date})&le(event_date,{end_date})&ordering(-event_date)'},
+    {'name': 'events-extra-fields', 'path': EVENTS_PATH, 'query': 'eq(extra_fields,country:BR)'},
+    {'name': 'events-within', 'path': EVENTS_PATH, 'query': 'within={latitude},{longitude},50'},
+    {'name': 'data-first-page', 'path': DATA_PATH, 'query': ''},
+    {'name': 'data-deep-page', 'path': DATA_PATH, 'query': 'page={deep_page}'},
+    {'name': 'data-temperature', 'path': DATA_PATH, 'query': 'ge(weather.temperature,30)&ordering(-fetched_at)'},
+]
+
+
+class Authenticator:
+    """Prepara uma requests.Session autenticada no modo informado."""
+
+    def __init__(self, base_url, mode, username=None, password=None, api_key=None):
+        self.base_url = base_url
+        self.mode = mode
+        self.username = username
+        self.password = password
+        self.api_key = api_key
+        self.headers = {}
+        self.cookies = None
+
+    def setup(self):
+        if self.mode == 'jwt':
+            response = requests.post(f'{self.base_url}/api/v1/token/',
+                                     json={'username': self.username, 'password': self.password}, timeout=30)
+            response.raise_for_status()
+            self.headers = {'Authorization': f"Bearer {response.json()['access']}"}
+        elif self.mode == 'basic':
+            token = base64.b64encode(f'{self.username}:{self.password}'.encode()).decode()
+            self.headers = {'Authorization': f'Basic {token}'}
+        elif self.mode == 'api-key':
+            if not self.api_key:
+                raise SystemExit('O modo api-key exige --api-key.')
+            self.headers = {'Authorization': f'Api-Key {self.api_key}'}
+        elif self.mode == 'session':
+            session = requests.Session()
+            login_url = f'{self.base_url}/admin/login/'
+            session.get(login_url, timeout=30).raise_for_status()
+            response = session.post(login_url, timeout=30, allow_redirects=False, headers={'Referer': login_url}, data={
+                'username': self.username,
+                'password': self.password,
+                'csrfmiddlewaretoken': session.cookies.get('csrftoken'),
+                'next': '/admin/',
+            })
+            if 'sessionid' not in session.cookies:
+                raise SystemExit(f'Falha no login por sessão (status {response.status_code}).')
+            self.cookies = session.cookies
+        return self
+
+    def new_session(self):
+        session = requests.Session()
+        session.headers.update(self.headers)
+        if self.cookies is not None:
+            session.cookies.update(self.cookies)
+        return session
+
+
+def run_scenario(base_url, scenario, authenticator, concurrency, duration, warmup, timeout):
+    """
+    Executa o cenário com `concurrency` threads durante warmup + duration segundos.
+    Apenas as requisições iniciadas após o aquecimento entram nas estatísticas; as latências
+    consideram somente as respostas 200.
+    """
+    url = f"{base_url}{scenario['path']}"
+    if scenario['query']:
+        url += f"?{scenario['query']}"
+
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def worker():
+        session = authenticator.new_session()
+        local_latencies = []
+        local_statuses = Counter()
+        while True:
+            request_started = time.perf_counter()
+            if request_started >= deadline:
+                break
+            try:
+                response = session.get(url, timeout=timeout)
+                response.content
+                status = response.status_code
+            except requests.RequestException:
+                status = 'erro'
+            if request_started >= measure_from:
+                if status == 200:
+                    local_latencies.append(time.perf_counter() - request_started)
+                local_statuses[status] += 1
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    total = sum(statuses.values())
+    return {
+        'scenario': scenario['name'],
+        'auth': authenticator.mode,
+        'concurrency': concurrency,
+        'url': url,
+        'requests': total,
+        'requests_per_second': total / duration if duration else 0.0,
+        'ok': statuses.get(200, 0),
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'latency_p50_ms': percentile(latencies, 0.50) * 1000,
+        'latency_p90_ms': percentile(latencies, 0.90) * 1000,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000,
+        'latency_max_ms': max(latencies, default=0.0) * 1000,
+    }
+
+
+def load_scenarios(args):
+    scenarios = SCENARIOS
+    if args.scenarios_file:
+        with open(args.scenarios_file, encoding='utf-8') as f:
+            scenarios = json.load(f)
+    if args.scenario:
+        scenarios = [scenario for scenario in scenarios if scenario['name'] in args.scenario]
+        if not scenarios:
+            raise SystemExit('Nenhum cenário corresponde a --scenario.')
+
+    values = {
+        'deep_page': args.deep_page,
+        'city': args.city,
+        'start_date': args.start_date,
+        'end_date': args.end_date,
+        'latitude': args.latitude,
+        'longitude': args.longitude,
+    }
+    return [{**scenario, 'query': scenario.get('query', '').format(**values)} for scenario in scenarios]
+
+
+def start_server(args):
+    """Inicia o servidor local (--server-command) e aguarda até que ele responda."""
+    address = urlsplit(args.base_url)
+    command = args.server_command.format(python=sys.executable, host=address.hostname, port=address.port or 80)
+    process = subprocess.Popen(shlex.split(command), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               env=os.environ.copy())
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'O servidor foi encerrado (código {process.returncode}): {command}')
+        try:
+            requests.get(f'{args.base_url}/admin/login/', timeout=2)
+            return process
+        except requests.RequestException:
+            time.sleep(0.5)
+    process.terminate()
+    raise SystemExit('O servidor não respondeu em 60 segundos.')
+
+
+def run(args):
+    scenarios = load_scenarios(args)
+    results = []
+    for mode in args.auth:
+        authenticator = Authenticator(args.base_url, mode, args.username, args.password, args.api_key).setup()
+        for concurrency in args.concurrency:
+            for scenario in scenarios:
+                result = run_scenario(args.base_url, scenario, authenticator, concurrency, args.duration,
+                                      args.warmup, args.timeout)
+                results.append(result)
+                print_result(result)
+    return {
+        'parameters': {
+            'auth': args.auth,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'scenarios': [scenario['name'] for scenario in scenarios],
+        },
+        'results': results,
+    }
+
+
+def get_key(result):
+    return result['scenario'], result['auth'], result['concurrency']
+
+
+def print_result(result, previous=None):
+    line = (
+        f"{result['scenario']:<22} {result['auth']:<8} {result['concurrency']:>4} "
+        f"{result['requests_per_second']:>9.1f} {result['latency_p50_ms']:>9.1f} {result['latency_p90_ms']:>9.1f} "
+        f"{result['latency_p99_ms']:>9.1f}  {json.dumps(result['statuses'])}"
+    )
+    if previous and previous.get('requests_per_second'):
+        change = (result['requests_per_second'] - previous['requests_per_second']) / previous['requests_per_second']
+        line += f"  (req/s {change:+.1%}, p99 {previous['latency_p99_ms']:.1f} ms antes)"
+    print(line)
+
+
+def print_report(results, previous=None):
+    print('Parâmetros:', json.dumps(results['parameters'], ensure_ascii=False))
+    if previous and previous.get('parameters') != results['parameters']:
+        print('  Atenção: a execução anterior usou parâmetros diferentes:',
+              json.dumps(previous.get('parameters'), ensure_ascii=False))
+    print(f"{'cenário':<22} {'auth':<8} {'conc':>4} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}  status")
+    previous_results = {get_key(result): result for result in (previous or {}).get('results', [])}
+    for result in results['results']:
+        print_result(result, previous_results.get(get_key(result)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Endereço do servidor testado.')
+    parser.add_argument('--auth', nargs='+', choices=['jwt', 'session', 'basic', 'api-key'], default=['jwt'])
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--api-key', help='Chave usada no modo api-key.')
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16], help='Níveis de concorrência.')
+    parser.add_argument('--duration', type=float, default=10, help='Segundos medidos por combinação.')
+    parser.add_argument('--warmup', type=float, default=1, help='Segundos de aquecimento (não medidos).')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout de cada requisição (segundos).')
+    parser.add_argument('--scenario', nargs='+', help='Executa apenas os cenários informados.')
+    parser.add_argument('--scenarios-file', help='Arquivo JSON com cenários ([{"name", "path", "query"}]).')
+    parser.add_argument('--deep-page', type=int, default=50, help='Página usada nos cenários *-deep-page.')
+    parser.add_argument('--city', default='São Paulo')
+    parser.add_argument('--start-date', default='2025-01-01')
+    parser.add_argument('--end-date', default='2025-03-31')
+    parser.add_argument('--latitude', type=float, default=-23.5505)
+    parser.add_argument('--longitude', type=float, default=-46.6333)
+    parser.add_argument('--start-server', action='store_true', help='Inicia o servidor com --server-command.')
+    parser.add_argument('--server-command', default='{python} manage.py runserver {host}:{port} --noreload',
+                        help='Comando do servidor ({python}, {host} e {port} são substituídos).')
+    parser.add_argument('--output', help='Grava os resultados neste arquivo JSON.')
+    parser.add_argument('--compare', help='Arquivo JSON de uma execução anterior para comparação.')
+    args = parser.parse_args(argv)
+
+    server = start_server(args) if args.start_server else None
+    try:
+        results = run(args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+    print()
+    print_report(results, previous)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
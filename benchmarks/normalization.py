@@ -0,0 +1,66 @@
+"""
+Compara a normalização registro a registro (normalize + serialize_data) com a normalização em lote
+(normalize_batch, validação da lista inteira por um TypeAdapter) do provider OpenWeather.
+
+Uso:
+    python -m benchmarks.normalization --records 10000 --repeat 5
+"""
+import argparse
+import random
+import timeit
+
+from benchmarks import setup_django
+
+
+def build_raw_records(count, seed=0):
+    rng = random.Random(seed)
+    start = 1_700_000_000
+    return [
+        {
+            "coord": {"lon": -34.88, "lat": -8.05},
+            "weather": [{"id": 800, "main": "Clear", "description": rng.choice(["céu limpo", "nublado", "chuva"])}],
+            "main": {"temp": round(rng.uniform(18, 35), 2), "humidity": rng.randint(30, 100)},
+            "dt": start + index * 60,
+            "sys": {"country": "BR"},
+            "name": rng.choice(["Recife", "Olinda", "São Paulo", "Curitiba"]),
+        }
+        for index in range(count)
+    ]
+
+
+def measure(func, repeat):
+    """Retorna o menor tempo entre as execuções (o menos afetado por ruído da máquina)."""
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10000, help="Quantidade de registros crus.")
+    parser.add_argument("--repeat", type=int, default=7, help="Execuções por cenário (usa a menor).")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from integrations.providers.openweather.provider import OpenWeatherProviderBackend
+
+    provider = OpenWeatherProviderBackend()
+    raw_records = build_raw_records(args.records)
+
+    normalized_list = provider.normalize_batch(raw_records)
+    assert normalized_list == [provider.normalize(raw_data) for raw_data in raw_records], \
+        "Os dois caminhos devem produzir os mesmos dados."
+
+    scenarios = {
+        "normalize (por registro)": lambda: [provider.normalize(raw_data) for raw_data in raw_records],
+        "normalize_batch": lambda: provider.normalize_batch(raw_records),
+        "serialize_data": lambda: [provider.serialize_data(normalized) for normalized in normalized_list],
+    }
+    results = {name: measure(func, args.repeat) for name, func in scenarios.items()}
+
+    print(f"{args.records} registros, melhor de {args.repeat} execuções")
+    for name, elapsed in results.items():
+        print(f"  {name:<26} {elapsed * 1000:9.1f} ms  {args.records / elapsed:12,.0f} registros/s")
+    print(f"  ganho do lote: {results['normalize (por registro)'] / results['normalize_batch']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
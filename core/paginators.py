@@ -0,0 +1,42 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator que usa a estimativa do PostgreSQL no lugar de COUNT(*) em tabelas grandes.
+
+    Sem filtros, a quantidade vem das estatísticas da tabela (pg_class.reltuples); com filtros,
+    da estimativa de linhas do plano (EXPLAIN). A contagem exata só é feita quando a estimativa
+    fica abaixo de ADMIN_ESTIMATED_COUNT_THRESHOLD.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query') or connections[queryset.db].vendor != 'postgresql':
+            return super().count
+
+        estimate = self.get_estimated_count(queryset)
+        if estimate is None or estimate < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+    @staticmethod
+    def get_estimated_count(queryset):
+        if not queryset.query.where:
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            # reltuples é -1 enquanto a tabela não foi analisada.
+            return row[0] if row and row[0] >= 0 else None
+
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'integrations.apps.IntegrationsConfig',
     'django_jsonform',
     'rest_framework',
@@ -56,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'integrations.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -92,6 +94,23 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Com CACHE_URL (ex.: redis://redis:6379/0, definido no docker-compose) o cache é compartilhado entre os
+# processos, o que os caches de autenticação, os limites de uso da API e as invalidações exigem; sem ele,
+# CACHE_BACKEND/CACHE_LOCATION (padrão: LocMemCache, local a cada processo).
+CACHE_URL = config('CACHE_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='hopen-integrator'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -160,7 +179,13 @@ JAZZMIN_SETTINGS = {
         "integrations.Integration": "fas fa-plug",
         "integrations.IntegrationLog": "fas fa-history",
         "integrations.ContextualEvent": "fas fa-calendar-alt",
+        "integrations.CityAlias": "fas fa-city",
         "integrations.ContextualData": "fas fa-database",
+        "integrations.ContextualDataRollup": "fas fa-chart-line",
+        "integrations.APIKey": "fas fa-lock",
+        "integrations.ProfileSample": "fas fa-fire",
+        "integrations.WebhookDelivery": "fas fa-inbox",
+        "integrations.IngestLease": "fas fa-lock-open",
         "django_celery_beat.PeriodicTask": "fas fa-clock",
         "django_celery_beat.IntervalSchedule": "fas fa-stopwatch",
         "django_celery_beat.CrontabSchedule": "fas fa-calendar-check",
@@ -184,15 +209,30 @@ JAZZMIN_SETTINGS = {
 # Rest framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'integrations.api.authentication.APIKeyAuthentication',
+        'integrations.api.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'DEFAULT_FILTER_BACKENDS': ['dj_rql.drf.RQLFilterBackend'],
+    'DEFAULT_FILTER_BACKENDS': ['integrations.api.filter_backends.CostGuardedRQLFilterBackend'],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'PAGE_SIZE': 10,
+    'DEFAULT_THROTTLE_CLASSES': ['integrations.api.throttling.CostWeightedRateThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'integrations': config('API_THROTTLE_RATE', default='1200/min'),
+    },
+}
+
+# Peso de cada ação no limite de taxa (CostWeightedRateThrottle) e limite de consultas simultâneas por cliente
+API_THROTTLE_WEIGHTS = {
+    'default': 1,
+    'retrieve': 1,
+    'list': 5,
+    'bulk': 50,
 }
+API_MAX_CONCURRENT_REQUESTS = config('API_MAX_CONCURRENT_REQUESTS', default=4, cast=int)
+API_CONCURRENCY_SLOT_TTL = config('API_CONCURRENCY_SLOT_TTL', default=120, cast=int)
 
 # Celery settings
 CELERY_BROKER_URL = (
@@ -205,8 +245,8 @@ CELERY_TIMEZONE = 'America/Sao_Paulo'
 CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_TASK_TRACK_STARTED = True
 
-CELERY_DEFAULT_QUEUE = f"auto_parking_default"
-CELERY_HIGH_PRIORITY_QUEUE = f"{PROJECT_NAME.lower().replace(' ', '_')}_h_p"
+CELERY_TASK_DEFAULT_QUEUE = config('CELERY_DEFAULT_QUEUE', default='default')
+CELERY_HIGH_PRIORITY_QUEUE = config('CELERY_HIGH_PRIORITY_QUEUE', default='high_priority')
 
 CELERY_RESULT_BACKEND = 'django-db'
 CELERY_CACHE_BACKEND = 'django-cache'
@@ -218,4 +258,37 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
     'SCHEMA_PATH_PREFIX': '/api/v1',
-}
\ No newline at end of file
+}
+# Integrations settings
+PLUGIN_MANIFEST_PATH = config('PLUGIN_MANIFEST_PATH', default=str(BASE_DIR / '.plugin_manifest.json'))
+PLUGIN_MANIFEST_AUTO_REFRESH = config('PLUGIN_MANIFEST_AUTO_REFRESH', default=DEBUG, cast=bool)
+BULK_INGEST_MAX_ITEMS = config('BULK_INGEST_MAX_ITEMS', default=5000, cast=int)
+WEBHOOK_BATCH_WINDOW = config('WEBHOOK_BATCH_WINDOW', default=2, cast=int)
+WEBHOOK_BATCH_SIZE = config('WEBHOOK_BATCH_SIZE', default=500, cast=int)
+WEBHOOK_MAX_ATTEMPTS = config('WEBHOOK_MAX_ATTEMPTS', default=4, cast=int)
+RQL_MAX_QUERY_COST = config('RQL_MAX_QUERY_COST', default=100000, cast=float)
+# Caches da autenticação: usados apenas com um cache compartilhado (integrations.caching.is_shared_cache).
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60, cast=int)
+API_KEY_CACHE_TTL = config('API_KEY_CACHE_TTL', default=300, cast=int)
+INGEST_BATCH_SIZE = config('INGEST_BATCH_SIZE', default=500, cast=int)
+INGEST_PREFETCH_PAGES = config('INGEST_PREFETCH_PAGES', default=1, cast=int)
+EVENT_DEDUP_DATE_BUCKET = config('EVENT_DEDUP_DATE_BUCKET', default='day')
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100000, cast=int)
+# Token exigido pelo endpoint /metrics (vazio = sem autenticação, proteger pela rede).
+# Para agregar as métricas dos workers, defina PROMETHEUS_MULTIPROC_DIR no ambiente (ver integrations.metrics).
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Profiler por amostragem (integrations.profiling): intervalo entre amostras, duração máxima e header que o ativa.
+# O profile de requisições (ProfilingMiddleware) só é feito com PROFILING_ENABLED e para usuários is_staff.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_INTERVAL = config('PROFILING_INTERVAL', default=0.005, cast=float)
+PROFILING_MAX_DURATION = config('PROFILING_MAX_DURATION', default=600, cast=int)
+PROFILING_HEADER = config('PROFILING_HEADER', default='X-Profile')
+# Shards da importação (integrations.sharding): quantidade de filas, prefixo e pontos por fila no anel de hash
+INGEST_SHARDS = config('INGEST_SHARDS', default=4, cast=int)
+INGEST_SHARD_QUEUE_PREFIX = config('INGEST_SHARD_QUEUE_PREFIX', default='ingest')
+INGEST_SHARD_VNODES = config('INGEST_SHARD_VNODES', default=64, cast=int)
+# Lease da importação de cada integração (integrations.leases): validade e intervalo entre renovações
+# (feitas por uma thread durante a importação, no máximo a cada um terço da validade)
+INGEST_LEASE_TTL = config('INGEST_LEASE_TTL', default=120, cast=int)
+INGEST_LEASE_RENEW_INTERVAL = config('INGEST_LEASE_RENEW_INTERVAL', default=30, cast=int)
+TEST_TIME_BUDGET_FACTOR = config('TEST_TIME_BUDGET_FACTOR', default=1.0, cast=float)
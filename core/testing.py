@@ -0,0 +1,138 @@
+"""
+Orçamentos de consultas SQL e de tempo para os testes dos caminhos críticos.
+
+Um Budget descreve o máximo permitido para uma operação em função do tamanho da entrada:
+base + per_unit * unidades, em que as unidades são ceil(tamanho / unit_size) (ex.: lotes de
+INGEST_BATCH_SIZE registros). Assim, "O(1) por lote" é Budget(base, per_unit=<consultas por lote>,
+unit_size=<tamanho do lote>) e "O(1) por página" é Budget(base) com per_unit=0.
+
+Ao estourar o orçamento, o teste falha com a lista das consultas executadas.
+"""
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass(frozen=True)
+class Budget:
+    queries: int
+    per_unit: int = 0
+    unit_size: int = 1
+    seconds: float = None
+    seconds_per_unit: float = 0.0
+
+    def get_units(self, size):
+        return math.ceil(size / self.unit_size) if size else 0
+
+    def get_max_queries(self, size=0):
+        return self.queries + self.per_unit * self.get_units(size)
+
+    def get_max_seconds(self, size=0):
+        """Limite de tempo, multiplicado por TEST_TIME_BUDGET_FACTOR (útil em máquinas de CI lentas)."""
+        if self.seconds is None:
+            return None
+        max_seconds = self.seconds + self.seconds_per_unit * self.get_units(size)
+        return max_seconds * getattr(settings, 'TEST_TIME_BUDGET_FACTOR', 1.0)
+
+
+def format_queries(captured_queries, limit=200):
+    lines = [f"  {index}. ({query['time']}s) {query['sql']}" for index, query in enumerate(captured_queries[:limit], 1)]
+    if len(captured_queries) > limit:
+        lines.append(f"  ... mais {len(captured_queries) - limit} consultas")
+    return '\n'.join(lines)
+
+
+class BudgetResult:
+    def __init__(self, label, size):
+        self.label = label
+        self.size = size
+        self.captured_queries = []
+        self.elapsed = 0.0
+
+    @property
+    def num_queries(self):
+        return len(self.captured_queries)
+
+    def report(self, reason):
+        return (
+            f"{self.label} (tamanho {self.size}): {reason}\n"
+            f"{self.num_queries} consultas em {self.elapsed:.3f}s:\n{format_queries(self.captured_queries)}"
+        )
+
+
+@contextmanager
+def measure(label='operação', size=0, using=DEFAULT_DB_ALIAS):
+    """
+    Captura as consultas da conexão `using` e o tempo decorrido do bloco.
+    Apenas a conexão da thread atual é observada (desative o prefetch em thread da ingestão nos testes).
+    """
+    context = CaptureQueriesContext(connections[using])
+    result = BudgetResult(label, size)
+    started = time.perf_counter()
+    with context:
+        yield result
+    result.elapsed = time.perf_counter() - started
+    result.captured_queries = context.captured_queries
+
+
+def check_budget(result, budget):
+    max_queries = budget.get_max_queries(result.size)
+    if result.num_queries > max_queries:
+        raise BudgetExceeded(result.report(f"{result.num_queries} consultas, orçamento de {max_queries}."))
+
+    max_seconds = budget.get_max_seconds(result.size)
+    if max_seconds is not None and result.elapsed > max_seconds:
+        raise BudgetExceeded(result.report(f"{result.elapsed:.3f}s, orçamento de {max_seconds:.3f}s."))
+
+
+@contextmanager
+def assert_budget(budget, label='operação', size=0, using=DEFAULT_DB_ALIAS):
+    """Executa o bloco e falha (BudgetExceeded) se as consultas ou o tempo passarem do orçamento."""
+    with measure(label, size, using) as result:
+        yield result
+    check_budget(result, budget)
+
+
+class BudgetTestMixin:
+    """
+    Mixin para TestCase com as asserções de orçamento.
+
+    assertScales executa a operação para cada tamanho e verifica, além do orçamento absoluto,
+    que o crescimento das consultas entre o menor e cada um dos demais tamanhos não passa de
+    per_unit por unidade adicional; isso detecta N+1 mesmo quando o orçamento base é folgado.
+    """
+
+    def assertBudget(self, budget, label='operação', size=0, using=DEFAULT_DB_ALIAS):
+        return assert_budget(budget, label, size, using)
+
+    def assertScales(self, budget, sizes, setup, operation, label='operação', using=DEFAULT_DB_ALIAS):
+        """
+        setup(tamanho) prepara os dados e retorna o argumento de operation(argumento), que é a parte medida.
+        Retorna a lista de BudgetResult, na ordem dos tamanhos.
+        """
+        results = []
+        for size in sorted(sizes):
+            argument = setup(size)
+            with self.assertBudget(budget, label, size, using) as result:
+                operation(argument)
+            results.append(result)
+
+        first = results[0]
+        for result in results[1:]:
+            allowed = budget.per_unit * (budget.get_units(result.size) - budget.get_units(first.size))
+            growth = result.num_queries - first.num_queries
+            if growth > allowed:
+                raise BudgetExceeded(result.report(
+                    f"{growth} consultas a mais que com tamanho {first.size} ({first.num_queries}), "
+                    f"crescimento permitido de {allowed}."
+                ))
+        return results
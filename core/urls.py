@@ -7,6 +7,7 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
     SpectacularRedocView,
 )
+from integrations.views import metrics_view
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -26,6 +27,9 @@ urlpatterns = [
       path('api/v1/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
       path('api/v1/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
 
+      # Metrics
+      path('metrics', metrics_view, name='metrics'),
+
       # API Documentation
       path('api/v1/schema/', SpectacularAPIView.as_view(), name='schema'),
       path('api/v1/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
@@ -4,6 +4,12 @@ echo "Verificando e criando o banco de dados..."
 PGPASSWORD=$POSTGRES_PASSWORD psql -h $POSTGRES_HOST -U $POSTGRES_USER -p $POSTGRES_PORT -c "SELECT 1 FROM pg_database WHERE datname = '$POSTGRES_NAME';" | grep -q 1 || \
 PGPASSWORD=$POSTGRES_PASSWORD psql -h $POSTGRES_HOST -U $POSTGRES_USER -p $POSTGRES_PORT -c "CREATE DATABASE $POSTGRES_NAME;"
 
+# Descarta as métricas da execução anterior (modo multiprocess do Prometheus)
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+  rm -f "$PROMETHEUS_MULTIPROC_DIR"/*.db
+fi
+
 # Cria as migrações
 echo "Criando as migrações..."
 python manage.py makemigrations
@@ -12,6 +18,10 @@ python manage.py makemigrations
 echo "Rodando as migrações..."
 python manage.py migrate
 
+# Gera o manifesto de plugins
+echo "Gerando o manifesto de plugins..."
+python manage.py build_plugin_manifest
+
 # Cria o superusuário automaticamente
 echo "Criando superusuário..."
 python manage.py shell <<EOF
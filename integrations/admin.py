@@ -1,20 +1,37 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.postgres.search import SearchQuery
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.utils.text import slugify
 from django_jsonform.forms.fields import JSONFormField
 
+from core.paginators import EstimatedCountPaginator
 from integrations.admin_forms import (
     CredentialsTypeAdminForm,
-    BaseCredentialsEntityAdminForm,
-    BaseIntegrationAdminForm,
-    IntegrationProviderBackendAdminForm
+    IntegrationProviderBackendAdminForm,
+    get_credentials_entity_form_class,
+    get_integration_form_class,
 )
+from integrations.helpers import get_affected_contextual_data, sync_contextual_data, syncing_contextual_data
 from integrations.registry import plugin_registry
+from integrations.sharding import get_ingest_queue
 from .models import (
+    APIKey,
+    CityAlias,
     CredentialsEntity,
     Integration,
+    IngestLease,
     IntegrationLog,
+    LOG_SEARCH_VECTOR,
+    ProfileSample,
     ContextualEvent,
-    ContextualData
+    ContextualData,
+    ContextualDataRollup,
+    WebhookDelivery,
 )
 
 
@@ -31,68 +48,27 @@ class CredentialsEntityAdmin(admin.ModelAdmin):
             obj.handle = slugify(obj.name)
         super().save_model(request, obj, form, change)
 
-    def get_form(self, request, obj=None, **kwargs):
+    def get_credentials_type(self, request, obj=None):
         credentials_type_id = request.GET.get('credentials_type_id') or (obj and obj.credentials_type_id)
-        credentials_type_cls = plugin_registry.get_credentials_type(credentials_type_id)
+        return plugin_registry.get_credentials_type(credentials_type_id)
+
+    def get_prepopulated_fields(self, request, obj=None):
+        return {'handle': ('name',)} if self.get_credentials_type(request, obj) else {}
 
+    def get_form(self, request, obj=None, **kwargs):
+        credentials_type_cls = self.get_credentials_type(request, obj)
         if not credentials_type_cls:
-            self.prepopulated_fields = {}
             return CredentialsTypeAdminForm
-
-        # Validar se o tipo de credencial é válido
-        schema_cls = credentials_type_cls.get_credentials_schema()
-        try:
-            schema = schema_cls.schema() if schema_cls and hasattr(schema_cls, 'schema') else {}
-            if not isinstance(schema, (dict, list)):
-                raise ValueError("Schema público inválido.")
-        except Exception as e:
-            schema = {}
-
-        # Validar se o schema privado é válido
-        private_schema_cls = credentials_type_cls.get_credentials_private_schema()
-        try:
-            private_schema = (
-                private_schema_cls.schema()
-                if private_schema_cls and hasattr(private_schema_cls, 'schema')
-                else None
-            )
-            if not isinstance(private_schema, (dict, list)):
-                private_schema = None
-        except Exception:
-            private_schema = None
-
-        # Configurar o formulário com os campos necessários
-        self.prepopulated_fields = {'handle': ('name',)}
-        form = BaseCredentialsEntityAdminForm
-        form.base_fields['credentials_type_data'] = JSONFormField(schema=schema, label='Configurações Personalizadas')
-
-        # Adicionar ou remover o campo de acordo com a validação do schema privado
-        if private_schema is None:
-            form.base_fields.pop('credentials_type_private_data', None)
-        else:
-            form.base_fields['credentials_type_private_data'] = JSONFormField(
-                schema=private_schema,
-                label='Configurações Privadas',
-                required=False,
-            )
-
-        if not obj:
-            form.base_fields['credentials_type_id'].initial = credentials_type_cls.id
-            form.base_fields['name'].initial = credentials_type_cls.name
-        if obj:
-            form.base_fields['credentials_type_id'].disabled = True
-            form.base_fields['handle'].disabled = True
-
-        return form
+        return get_credentials_entity_form_class(credentials_type_cls, change=obj is not None)
 
 
 @admin.register(Integration)
 class IntegrationAdmin(admin.ModelAdmin):
-    list_display = ('get_provider', 'is_active', 'enable_logging')
-    list_filter = ('is_active', 'enable_logging')
+    list_display = ('get_provider', 'is_active', 'enable_logging', 'get_ingest_queue')
+    list_filter = ('is_active', 'enable_logging', 'enable_profiling')
     list_editable = ('is_active', 'enable_logging')
     exclude = ('name',)
-    prepopulated_fields = {}
+    readonly_fields = ('webhook_token',)
 
     def save_model(self, request, obj, form, change):
         if not obj.handle and obj.name:
@@ -100,47 +76,28 @@ class IntegrationAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
     def get_provider(self, obj):
-        provider = plugin_registry.get_provider_backend(obj.provider_backend_id)
-        return provider.name if provider else '-'
+        provider = plugin_registry.get_provider_backend_info(obj.provider_backend_id)
+        return provider['name'] if provider else '-'
 
     get_provider.short_description = 'Provedor'
 
-    def get_form(self, request, obj=None, **kwargs):
-        provider_backend_id = request.GET.get('provider_backend_id') or (obj and obj.provider_backend_id)
-        provider_backend = plugin_registry.get_provider_backend(provider_backend_id)
+    def get_ingest_queue(self, obj):
+        return get_ingest_queue(obj)
 
-        if not provider_backend:
-            self.prepopulated_fields = {}
-            return IntegrationProviderBackendAdminForm
-
-        self.prepopulated_fields = {'handle': ('name',)}
-        form = BaseIntegrationAdminForm
-        schema_fields = provider_backend.get_schema_dict(integration=obj)
-
-        form.base_fields['provider_backend_data'] = JSONFormField(
-            schema=schema_fields,
-            label='Configurações Personalizadas',
-            required=False,
-        )
+    get_ingest_queue.short_description = 'Fila da Importação'
 
-        allowed_credentials_types = (
-            plugin_registry.get_provider_backend(obj.provider_backend_id).allowed_credentials_types
-            if obj else provider_backend.allowed_credentials_types
-        )
-        credentials_qs = CredentialsEntity.objects.filter(
-            credentials_type_id__in=allowed_credentials_types
-        )
-        form.base_fields['credentials'].queryset = credentials_qs
+    def get_provider_backend(self, request, obj=None):
+        provider_backend_id = request.GET.get('provider_backend_id') or (obj and obj.provider_backend_id)
+        return plugin_registry.get_provider_backend(provider_backend_id)
 
-        if not obj:
-            form.base_fields['provider_backend_id'].initial = provider_backend.id
-            form.base_fields['name'].initial = provider_backend.name
-            form.base_fields['handle'].initial = provider_backend.handle
-        if obj:
-            form.base_fields['provider_backend_id'].disabled = True
-            form.base_fields['handle'].disabled = True
+    def get_prepopulated_fields(self, request, obj=None):
+        return {'handle': ('name',)} if self.get_provider_backend(request, obj) else {}
 
-        return form
+    def get_form(self, request, obj=None, **kwargs):
+        provider_backend = self.get_provider_backend(request, obj)
+        if not provider_backend:
+            return IntegrationProviderBackendAdminForm
+        return get_integration_form_class(provider_backend, integration=obj)
 
 
 @admin.register(IntegrationLog)
@@ -154,7 +111,9 @@ class IntegrationLogAdmin(admin.ModelAdmin):
         "records_imported",
     )
     list_filter = ("integration", "method", "success", "timestamp")
-    search_fields = ("integration__name", "message", "request_data", "response_data")
+    list_select_related = ("integration",)
+    search_fields = ("message",)
+    search_help_text = "Busca textual na mensagem ou pelo nome da integração."
     readonly_fields = (
         "timestamp",
         "integration",
@@ -165,15 +124,172 @@ class IntegrationLogAdmin(admin.ModelAdmin):
         "response_data",
         "records_imported",
     )
-    date_hierarchy = "timestamp"
+    ordering = ("-timestamp",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Busca pelo índice de texto da mensagem (tsvector/GIN) em vez de ILIKE.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        integration_ids = Integration.objects.filter(name__icontains=search_term).values_list('pk', flat=True)
+        queryset = queryset.alias(search=LOG_SEARCH_VECTOR).filter(
+            Q(search=SearchQuery(search_term, config='simple', search_type='websearch'))
+            | Q(integration_id__in=list(integration_ids))
+        )
+        return queryset, False
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    """Entregas de webhook pendentes ou marcadas como falha, com a ação de reprocessamento."""
+    list_display = ('received_at', 'integration', 'event', 'attempts', 'failed_at')
+    list_filter = (('failed_at', admin.EmptyFieldListFilter), 'integration', 'event')
+    list_select_related = ('integration',)
+    readonly_fields = ('integration', 'event', 'payload', 'received_at', 'attempts', 'last_error', 'failed_at')
+    ordering = ('received_at',)
+    actions = ('reprocess',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Reprocessar entregas selecionadas', permissions=['delete'])
+    def reprocess(self, request, queryset):
+        from integrations.tasks import consume_webhook_deliveries
+
+        integrations = list(Integration.objects.filter(pk__in=queryset.values('integration_id')))
+        updated = queryset.update(attempts=0, last_error='', failed_at=None)
+        for integration in integrations:
+            consume_webhook_deliveries.apply_async(args=[str(integration.uid)], queue=get_ingest_queue(integration))
+        messages.success(request, f'{updated} entregas reenviadas para processamento.')
+
+
+@admin.register(IngestLease)
+class IngestLeaseAdmin(admin.ModelAdmin):
+    """Leases da importação em andamento; excluir um lease libera a integração para outra execução."""
+    list_display = ('integration', 'owner', 'acquired_at', 'expires_at')
+    list_select_related = ('integration',)
+    readonly_fields = ('integration', 'owner', 'acquired_at', 'expires_at')
+    ordering = ('acquired_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProfileSample)
+class ProfileSampleAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'kind', 'name', 'integration', 'duration', 'samples', 'get_download_link')
+    list_filter = ('kind', 'integration')
+    list_select_related = ('integration',)
+    search_fields = ('name', 'task_id')
+    ordering = ('-created_at',)
+    exclude = ('data',)
+    readonly_fields = (
+        'kind', 'name', 'integration', 'task_id', 'duration', 'samples', 'interval', 'created_at', 'get_download_link',
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('data')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<path:object_id>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='integrations_profilesample_download',
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, object_id):
+        """Retorna as pilhas no formato folded (flamegraph.pl, speedscope)."""
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(ProfileSample, pk=object_id)
+        response = HttpResponse(profile.get_folded(), content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile.uid}.folded"'
+        return response
+
+    def get_download_link(self, obj):
+        url = reverse('admin:integrations_profilesample_download', args=[obj.pk])
+        return format_html('<a href="{}">Baixar (.folded)</a>', url)
+
+    get_download_link.short_description = 'Flamegraph'
+
+
+class ContextualDataSyncAdminMixin:
+    """
+    Mantém as projeções tipadas e os agregados dos dados contextuais nas gravações feitas pelo Django Admin
+    (integrations.helpers.sync_contextual_data).
+    """
+    sync_projections = True
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            with syncing_contextual_data(obj, projections=self.sync_projections):
+                super().save_model(request, obj, form, change)
+            return
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            sync_contextual_data(get_affected_contextual_data(obj), projections=self.sync_projections)
+
+    def delete_model(self, request, obj):
+        with syncing_contextual_data(obj, projections=self.sync_projections):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with syncing_contextual_data(queryset, projections=self.sync_projections):
+            super().delete_queryset(request, queryset)
+
+
+class EventSearchAdminMixin:
+    """
+    Busca pelo tipo exato do evento ou pela cidade (índices de ContextualEvent) ou pelo nome da
+    integração, em vez de ILIKE '%termo%' sobre as tabelas de eventos e dados contextuais.
+    """
+    event_search_field = 'pk'
+    search_fields = ('event_type',)
+    search_help_text = 'Tipo exato do evento (ex.: "São Paulo - weather"), cidade ou nome da integração.'
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        events = ContextualEvent.objects.filter(Q(event_type=search_term) | Q(city=search_term))
+        integration_ids = Integration.objects.filter(name__icontains=search_term).values_list('pk', flat=True)
+        queryset = queryset.filter(
+            Q(**{f'{self.event_search_field}__in': events.values('pk')})
+            | Q(integration_id__in=list(integration_ids))
+        )
+        return queryset, False
 
 
 @admin.register(ContextualEvent)
-class ContextualEventAdmin(admin.ModelAdmin):
+class ContextualEventAdmin(ContextualDataSyncAdminMixin, EventSearchAdminMixin, admin.ModelAdmin):
     list_display = ('uid', 'event_type', 'event_date', 'integration', 'created_at')
-    search_fields = ('event_type', 'integration__name')
-    list_filter = ('event_type', 'event_date', 'integration')
+    list_filter = ('event_date', 'integration')
+    list_select_related = ('integration',)
+    ordering = ('-created_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('extra_fields',)
+    sync_projections = False
 
     def formfield_for_dbfield(self, db_field, request, **kwargs):
         if db_field.name == 'extra_fields':
@@ -181,14 +297,56 @@ class ContextualEventAdmin(admin.ModelAdmin):
         return super().formfield_for_dbfield(db_field, request, **kwargs)
 
 
+@admin.register(CityAlias)
+class CityAliasAdmin(admin.ModelAdmin):
+    list_display = ('alias', 'city')
+    search_fields = ('alias', 'city')
+    ordering = ('city', 'alias')
+
+
 @admin.register(ContextualData)
-class ContextualDataAdmin(admin.ModelAdmin):
+class ContextualDataAdmin(ContextualDataSyncAdminMixin, EventSearchAdminMixin, admin.ModelAdmin):
     list_display = ('uid', 'event', 'integration', 'version', 'fetched_at')
-    search_fields = ('event__event_type', 'integration__name')
-    list_filter = ('integration', 'version', 'fetched_at')
+    event_search_field = 'event'
+    list_filter = ('integration', 'fetched_at')
+    list_select_related = ('event', 'integration')
+    raw_id_fields = ('event',)
+    ordering = ('-fetched_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('extra_fields',)
 
     def formfield_for_dbfield(self, db_field, request, **kwargs):
         if db_field.name == 'extra_fields':
             return JSONFormField(schema={}, disabled=True, label='Dados Contextuais')
         return super().formfield_for_dbfield(db_field, request, **kwargs)
+
+
+@admin.register(ContextualDataRollup)
+class ContextualDataRollupAdmin(admin.ModelAdmin):
+    list_display = ('metric', 'city', 'category', 'granularity', 'bucket', 'count', 'minimum', 'maximum', 'average')
+    list_filter = ('granularity', 'category', 'integration', 'metric')
+    search_fields = ('city',)
+    date_hierarchy = 'bucket'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(APIKey)
+class APIKeyAdmin(admin.ModelAdmin):
+    list_display = ('name', 'prefix', 'user', 'is_active', 'expires_at', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'prefix', 'user__username')
+    list_select_related = ('user',)
+    readonly_fields = ('prefix',)
+    fields = ('name', 'user', 'prefix', 'is_active', 'expires_at')
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            raw_key = obj.set_new_key()
+            messages.warning(request, f'Chave de API gerada (exibida apenas uma vez): {raw_key}')
+        super().save_model(request, obj, form, change)
@@ -1,7 +1,12 @@
+import copy
+from functools import lru_cache
+
 from django import forms
+from django_jsonform.forms.fields import JSONFormField
 
 from .models import CredentialsEntity, Integration
 from .registry import plugin_registry
+from .sharding import get_queue_choices
 
 
 class BaseCredentialsEntityAdminForm(forms.ModelForm):
@@ -56,6 +61,11 @@ class BaseIntegrationAdminForm(forms.ModelForm):
         label='Provedor da Integração',
         required=True
     )
+    ingest_queue = forms.ChoiceField(
+        label='Fila da Importação',
+        required=False,
+        help_text='Fila do Celery em que a importação é executada. Automática: shard definido por hash consistente do uid.'
+    )
 
     class Meta:
         model = Integration
@@ -63,6 +73,8 @@ class BaseIntegrationAdminForm(forms.ModelForm):
             'provider_backend_id',
             'is_active',
             'enable_logging',
+            'enable_profiling',
+            'ingest_queue',
             'name',
             'handle',
             'credentials',
@@ -73,6 +85,10 @@ class BaseIntegrationAdminForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields['handle'].required = False
         self.fields['provider_backend_id'].choices = plugin_registry.get_provider_backends_choices()
+        queue_choices = get_queue_choices()
+        if self.instance.ingest_queue and self.instance.ingest_queue not in dict(queue_choices):
+            queue_choices.append((self.instance.ingest_queue, self.instance.ingest_queue))
+        self.fields['ingest_queue'].choices = queue_choices
 
     def clean_handle(self):
         handle = self.cleaned_data.get('handle')
@@ -122,3 +138,126 @@ class IntegrationProviderBackendAdminForm(forms.ModelForm):
             if choice[0] not in used_providers
         ]
         self.fields['provider_backend_id'].choices = available_choices
+
+
+"""Fábricas de formulários por plugin (cacheadas pela classe do plugin e pela versão da integração)."""
+
+
+def _get_schema(schema_cls):
+    """Gera o schema JSON de uma classe Pydantic, retornando None quando indisponível ou inválido."""
+    try:
+        schema = schema_cls.schema() if schema_cls and hasattr(schema_cls, 'schema') else None
+    except Exception:
+        return None
+    return schema if isinstance(schema, (dict, list)) else None
+
+
+def _build_form_class(base_form, name, fields=None, **attrs):
+    """
+    Cria uma subclasse do formulário base, sem alterar os campos compartilhados da classe base.
+    """
+    if fields is not None:
+        attrs['Meta'] = type('Meta', (base_form.Meta,), {'fields': fields})
+    form = type(name, (base_form,), attrs)
+    # Campos declarados na classe base são compartilhados entre as subclasses; copia antes de alterá-los.
+    form.base_fields = {field_name: copy.deepcopy(field) for field_name, field in form.base_fields.items()}
+    return form
+
+
+@lru_cache(maxsize=None)
+def get_credentials_type_schemas(credentials_type_cls):
+    """
+    Retorna os schemas (público, privado) do tipo de credencial.
+    O schema público inválido é substituído por um objeto vazio e o privado por None (campo omitido).
+    """
+    schema = _get_schema(credentials_type_cls.get_credentials_schema()) or {}
+    try:
+        private_schema = _get_schema(credentials_type_cls.get_credentials_private_schema())
+    except NotImplementedError:
+        private_schema = None
+    return schema, private_schema
+
+
+@lru_cache(maxsize=None)
+def get_credentials_entity_form_class(credentials_type_cls, change=False):
+    """
+    Retorna o formulário de credenciais do tipo informado, para inclusão ou alteração.
+    """
+    schema, private_schema = get_credentials_type_schemas(credentials_type_cls)
+
+    fields = list(BaseCredentialsEntityAdminForm.Meta.fields)
+    attrs = {'credentials_type_data': JSONFormField(schema=schema, label='Configurações Personalizadas')}
+    if private_schema is None:
+        fields.remove('credentials_type_private_data')
+    else:
+        attrs['credentials_type_private_data'] = JSONFormField(
+            schema=private_schema,
+            label='Configurações Privadas',
+            required=False,
+        )
+
+    form = _build_form_class(
+        BaseCredentialsEntityAdminForm,
+        f'{credentials_type_cls.__name__}AdminForm',
+        fields=fields,
+        **attrs,
+    )
+    if change:
+        form.base_fields['credentials_type_id'].disabled = True
+        form.base_fields['handle'].disabled = True
+    else:
+        form.base_fields['credentials_type_id'].initial = credentials_type_cls.id
+        form.base_fields['name'].initial = credentials_type_cls.name
+    return form
+
+
+def get_integration_version(integration):
+    """Versão da integração usada nas chaves de cache dos schemas e formulários (None na inclusão)."""
+    return None if integration is None else (integration.pk, integration.updated_at)
+
+
+def get_provider_backend_schema(provider_backend_cls, integration=None):
+    """
+    Retorna o schema de configurações do provider para a integração.
+    O schema pode depender da integração (get_schema_dict(integration=...)), por isso é cacheado
+    por provider e versão da integração.
+    """
+    return _get_provider_backend_schema(provider_backend_cls, get_integration_version(integration), integration)
+
+
+@lru_cache(maxsize=256)
+def _get_provider_backend_schema(provider_backend_cls, integration_version, integration):
+    return provider_backend_cls.get_schema_dict(integration=integration)
+
+
+def get_integration_form_class(provider_backend_cls, integration=None):
+    """
+    Retorna o formulário de integração do provider informado, para inclusão (integration=None)
+    ou alteração da integração.
+    """
+    return _get_integration_form_class(provider_backend_cls, get_integration_version(integration), integration)
+
+
+@lru_cache(maxsize=256)
+def _get_integration_form_class(provider_backend_cls, integration_version, integration):
+    change = integration is not None
+    form = _build_form_class(
+        BaseIntegrationAdminForm,
+        f'{provider_backend_cls.__name__}AdminForm',
+        provider_backend_data=JSONFormField(
+            schema=get_provider_backend_schema(provider_backend_cls, integration),
+            label='Configurações Personalizadas',
+            required=False,
+        ),
+    )
+    form.base_fields['credentials'].queryset = CredentialsEntity.objects.filter(
+        credentials_type_id__in=provider_backend_cls.allowed_credentials_types
+    )
+    if change:
+        form.base_fields['provider_backend_id'].disabled = True
+        form.base_fields['handle'].disabled = True
+    else:
+        form.base_fields['provider_backend_id'].initial = provider_backend_cls.id
+        form.base_fields['name'].initial = provider_backend_cls.name
+        form.base_fields['handle'].initial = provider_backend_cls.id
+    return form
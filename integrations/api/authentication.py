@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import authentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from integrations.caching import is_shared_cache
+from integrations.models import APIKey
+
+
+def get_user_cache_key(user_id) -> str:
+    return f'auth:user:{user_id}'
+
+
+def get_api_key_cache_key(hashed_key: str) -> str:
+    return f'auth:api-key:{hashed_key}'
+
+
+def is_auth_cache_enabled(ttl) -> bool:
+    """
+    O cache de autenticação só é usado com um cache compartilhado: a invalidação feita pelos sinais
+    precisa alcançar todos os processos, senão usuários e chaves desativados seriam aceitos até o fim do TTL.
+    """
+    return ttl > 0 and is_shared_cache('cache de autenticação desativado')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que mantém em cache, por AUTH_USER_CACHE_TTL segundos, o usuário do token,
+    evitando uma consulta ao banco a cada requisição (apenas com um cache compartilhado).
+    O cache é invalidado quando o usuário é alterado ou removido, e as verificações de usuário
+    ativo e de troca de senha continuam sendo feitas a cada requisição.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token sem identificação de usuário reconhecível.')
+
+        cache_enabled = is_auth_cache_enabled(settings.AUTH_USER_CACHE_TTL)
+        cache_key = get_user_cache_key(user_id)
+        user = cache.get(cache_key) if cache_enabled else None
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed('Usuário não encontrado.', code='user_not_found')
+            if cache_enabled:
+                cache.set(cache_key, user, settings.AUTH_USER_CACHE_TTL)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('Usuário inativo.', code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed('A senha do usuário foi alterada.', code='password_changed')
+
+        return user
+
+
+class APIKeyAuthentication(authentication.BaseAuthentication):
+    """
+    Autenticação por chave de API, enviada no header "Authorization: Api-Key <chave>".
+    A chave é localizada pelo seu hash SHA-256 e, com um cache compartilhado, as chaves encontradas
+    ficam em cache por API_KEY_CACHE_TTL segundos (chaves inexistentes não), sendo invalidadas quando
+    a chave ou o usuário são alterados. Chave ativa, expiração e usuário ativo são verificados a cada
+    requisição.
+    """
+    keyword = 'Api-Key'
+
+    def authenticate(self, request):
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise AuthenticationFailed('Header de chave de API inválido.')
+
+        try:
+            raw_key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed('Header de chave de API inválido.')
+
+        return self.authenticate_credentials(raw_key)
+
+    def authenticate_credentials(self, raw_key):
+        hashed_key = APIKey.hash_key(raw_key)
+        cache_key = get_api_key_cache_key(hashed_key)
+
+        cache_enabled = is_auth_cache_enabled(settings.API_KEY_CACHE_TTL)
+        api_key = cache.get(cache_key) if cache_enabled else None
+        if api_key is None:
+            api_key = APIKey.objects.select_related('user').filter(hashed_key=hashed_key).first()
+            if api_key is None:
+                raise AuthenticationFailed('Chave de API inválida.')
+            if cache_enabled:
+                cache.set(cache_key, api_key, settings.API_KEY_CACHE_TTL)
+
+        if not api_key.is_active:
+            raise AuthenticationFailed('Chave de API inválida.')
+        if api_key.expires_at and api_key.expires_at <= timezone.now():
+            raise AuthenticationFailed('Chave de API expirada.')
+        if not api_key.user.is_active:
+            raise AuthenticationFailed('Usuário inativo.')
+
+        return api_key.user, api_key
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,140 @@
+import json
+
+from dj_rql.drf import RQLFilterBackend
+from django.conf import settings
+from django.db import connections
+from py_rql.exceptions import RQLFilterError
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from integrations.geo import filter_bbox, filter_within
+
+
+class QueryTooExpensive(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'A consulta excede o custo máximo permitido. Refine os filtros ou reduza a página.'
+    default_code = 'query_too_expensive'
+
+
+class CostGuardedRQLFilterBackend(RQLFilterBackend):
+    """
+    RQLFilterBackend com limite de custo das listagens. Erros de RQL viram respostas 400.
+
+    O custo da consulta de listagem é estimado via EXPLAIN antes da execução. Consultas acima de
+    RQL_MAX_QUERY_COST são rejeitadas com 400 (0 desativa a verificação).
+
+    A estimativa considera o LIMIT efetivo da página solicitada, de forma que paginações
+    profundas ou ordenações sem índice sobre tabelas grandes sejam barradas.
+
+    Parâmetros tratados por outros filter backends da view (view.non_rql_query_params) são
+    removidos da consulta antes da interpretação do RQL.
+    """
+
+    @classmethod
+    def get_query(cls, filter_instance, request, view):
+        query = super().get_query(filter_instance, request, view)
+        excluded = getattr(view, 'non_rql_query_params', ())
+        if not excluded or not query:
+            return query
+        return '&'.join(part for part in query.split('&') if part.split('=', 1)[0] not in excluded)
+
+    def filter_queryset(self, request, queryset, view):
+        try:
+            queryset = super().filter_queryset(request, queryset, view)
+        except RQLFilterError as e:
+            raise ValidationError({'rql': e.details or e.MESSAGE})
+
+        max_cost = settings.RQL_MAX_QUERY_COST
+        if not max_cost or request.method != 'GET' or getattr(view, 'action', None) != 'list':
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset
+
+        cost = self.estimate_cost(queryset[:self.get_rows_limit(request, view)])
+        if cost > max_cost:
+            raise QueryTooExpensive(
+                detail=f'{QueryTooExpensive.default_detail} (custo estimado {cost:.0f}, máximo {max_cost:.0f})'
+            )
+        return queryset
+
+    @staticmethod
+    def get_rows_limit(request, view):
+        """
+        Quantidade de linhas que o banco precisa produzir para atender a página solicitada.
+        """
+        paginator = getattr(view, 'paginator', None)
+        page_size = (paginator.get_page_size(request) if paginator else None) or settings.REST_FRAMEWORK['PAGE_SIZE']
+        try:
+            page = int(request.query_params.get(getattr(paginator, 'page_query_param', 'page'), 1))
+        except (TypeError, ValueError):
+            page = 1
+        return page_size * max(page, 1)
+
+    @staticmethod
+    def estimate_cost(queryset):
+        """
+        Retorna o custo total estimado pelo planejador do PostgreSQL para a consulta.
+        """
+        plan = json.loads(queryset.explain(format='json'))
+        return float(plan[0]['Plan']['Total Cost'])
+
+
+class GeoFilterBackend(BaseFilterBackend):
+    """
+    Filtros por proximidade sobre latitude/longitude, atendidos pelo índice de geohash:
+
+    - within=lat,lon,km: registros a até km quilômetros da coordenada;
+    - bbox=min_lon,min_lat,max_lon,max_lat: registros dentro do retângulo (ordem do GeoJSON; com
+      min_lon > max_lon, o retângulo cruza o antimeridiano).
+    """
+    within_param = 'within'
+    bbox_param = 'bbox'
+
+    @staticmethod
+    def parse_floats(request, param, count):
+        raw_value = request.query_params.get(param)
+        if not raw_value:
+            return None
+        try:
+            values = [float(value) for value in raw_value.split(',')]
+        except ValueError:
+            values = []
+        if len(values) != count or any(value != value for value in values):
+            raise ValidationError({param: f'Informe {count} números separados por vírgula.'})
+        return values
+
+    def filter_queryset(self, request, queryset, view):
+        bbox = self.parse_floats(request, self.bbox_param, 4)
+        if bbox:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+                raise ValidationError({self.bbox_param: 'Retângulo inválido.'})
+            queryset = filter_bbox(queryset, min_lat, min_lon, max_lat, max_lon)
+
+        within = self.parse_floats(request, self.within_param, 3)
+        if within:
+            latitude, longitude, radius_km = within
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and radius_km > 0):
+                raise ValidationError({self.within_param: 'Coordenada ou raio inválido.'})
+            queryset = filter_within(queryset, latitude, longitude, radius_km)
+
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.within_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Raio de busca: lat,lon,km (ex.: -8.05,-34.9,20).',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.bbox_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Retângulo: min_lon,min_lat,max_lon,max_lat.',
+                'schema': {'type': 'string'},
+            },
+        ]
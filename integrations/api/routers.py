@@ -1,7 +1,8 @@
 from rest_framework.routers import DefaultRouter
 
-from integrations.api.views import ContextualEventViewSet, ContextualDataViewSet
+from integrations.api.views import ContextualEventViewSet, ContextualDataViewSet, ContextualDataRollupViewSet
 
 router = DefaultRouter()
 router.register(r'contextual-events', ContextualEventViewSet, basename='contextual-events')
 router.register(r'contextual-data', ContextualDataViewSet, basename='contextual-data')
+router.register(r'contextual-rollups', ContextualDataRollupViewSet, basename='contextual-rollups')
@@ -1,6 +1,7 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 
-from integrations.models import ContextualEvent, ContextualData
+from integrations.models import ContextualEvent, ContextualData, ContextualDataRollup
 
 
 class ContextualEventSerializer(serializers.ModelSerializer):
@@ -12,10 +13,27 @@ class ContextualEventSerializer(serializers.ModelSerializer):
             'event_date',
             'location',
             'city',
+            'latitude',
+            'longitude',
+            'geohash',
             'category',
             'extra_fields',
             'created_at',
         ]
+        read_only_fields = ['geohash']
+
+    def validate(self, attrs):
+        # Campos da chave de deduplicação (índice único de match_key), ver ContextualEvent.clean.
+        values = {
+            field: attrs.get(field, getattr(self.instance, field, None))
+            for field in ('event_type', 'event_date', 'location', 'city')
+        }
+        event = ContextualEvent(pk=getattr(self.instance, 'pk', None), **values)
+        try:
+            event.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+        return attrs
 
 
 class ContextualDataSerializer(serializers.ModelSerializer):
@@ -29,3 +47,80 @@ class ContextualDataSerializer(serializers.ModelSerializer):
             'extra_fields',
         ]
         depth = 1
+
+
+class ContextualDataRollupSerializer(serializers.ModelSerializer):
+    average = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ContextualDataRollup
+        fields = [
+            'uid',
+            'integration',
+            'city',
+            'category',
+            'granularity',
+            'bucket',
+            'metric',
+            'count',
+            'total',
+            'minimum',
+            'maximum',
+            'average',
+            'updated_at',
+        ]
+
+
+class ContextualEventBulkItemSerializer(serializers.Serializer):
+    """
+    Valida um item da ingestão em lote de eventos contextuais.
+    O campo 'data', quando informado, gera uma nova versão de ContextualData para a integração.
+    """
+    event_type = serializers.CharField(max_length=100)
+    event_date = serializers.DateField(required=False, allow_null=True, default=None)
+    location = serializers.CharField(max_length=255, required=False, allow_null=True, default=None)
+    city = serializers.CharField(max_length=255, required=False, allow_null=True, default=None)
+    latitude = serializers.FloatField(min_value=-90, max_value=90, required=False, allow_null=True, default=None)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, required=False, allow_null=True, default=None)
+    category = serializers.CharField(max_length=100, required=False, allow_null=True, default=None)
+    extra_fields = serializers.JSONField(required=False, default=dict)
+    integration = serializers.UUIDField(required=False, allow_null=True, default=None)
+    data = serializers.JSONField(required=False, allow_null=True, default=None)
+
+    def validate_extra_fields(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Deve ser um objeto JSON.')
+        return value
+
+    def validate_integration(self, value):
+        if value is None:
+            return None
+        integration = self.context.get('integrations', {}).get(value)
+        if integration is None:
+            raise serializers.ValidationError('Integração não encontrada.')
+        return integration
+
+    def validate(self, attrs):
+        if (attrs.get('latitude') is None) != (attrs.get('longitude') is None):
+            raise serializers.ValidationError('Informe latitude e longitude juntas.')
+        if attrs.get('data') is not None:
+            if not isinstance(attrs['data'], dict):
+                raise serializers.ValidationError({'data': 'Deve ser um objeto JSON.'})
+            if not attrs.get('integration'):
+                raise serializers.ValidationError({'integration': 'Obrigatório quando "data" é informado.'})
+        return attrs
+
+
+class ContextualEventBulkResultSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=['created', 'updated', 'error'])
+    uid = serializers.UUIDField(required=False)
+    data_uid = serializers.UUIDField(required=False, allow_null=True)
+    errors = serializers.DictField(required=False)
+
+
+class ContextualEventBulkResponseSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    updated = serializers.IntegerField()
+    errors = serializers.IntegerField()
+    results = ContextualEventBulkResultSerializer(many=True)
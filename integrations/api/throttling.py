@@ -0,0 +1,131 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import SimpleRateThrottle
+
+from integrations.caching import is_shared_cache
+from integrations.models import APIKey
+from integrations.utils import get_token
+
+
+def get_client_ident(request, fallback) -> str:
+    """
+    Identifica o cliente para limites de uso: chave de API, usuário autenticado ou, por último, o IP.
+    """
+    if isinstance(request.auth, APIKey):
+        return f'key:{request.auth.pk}'
+    if request.user and request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{fallback}'
+
+
+class CostWeightedRateThrottle(SimpleRateThrottle):
+    """
+    Limite de taxa por cliente (usuário ou chave de API) com janela deslizante.
+
+    A taxa do escopo define o custo máximo por janela; cada requisição consome o peso da sua ação
+    (API_THROTTLE_WEIGHTS), de forma que listagens e ingestões em lote custem mais do que consultas
+    de detalhe. O custo de cada janela fica em um contador do cache, atualizado apenas com
+    operações atômicas (add/incr/decr), e o uso é estimado pela janela atual somada à fração
+    restante da anterior. Com um cache local ao processo, o limite vale por processo.
+    """
+    scope = 'integrations'
+    cache = cache
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': get_client_ident(request, self.get_ident(request)),
+        }
+
+    def get_weight(self, view):
+        weights = settings.API_THROTTLE_WEIGHTS
+        return weights.get(getattr(view, 'action', None), weights.get('default', 1))
+
+    def incr(self, key, delta):
+        """Soma delta ao contador da janela, criando-o (com expiração de duas janelas) se necessário."""
+        self.cache.add(key, 0, self.duration * 2)
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            # O contador expirou entre o add e o incr.
+            self.cache.add(key, delta, self.duration * 2)
+            return delta
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        is_shared_cache('limites de uso da API aplicados por processo')
+        capacity = self.num_requests
+        weight = min(self.get_weight(view), capacity)
+
+        now = time.time()
+        window = int(now // self.duration)
+        elapsed = (now % self.duration) / self.duration
+        key = f'{self.key}:{window}'
+
+        used = self.incr(key, weight)
+        previous = self.cache.get(f'{self.key}:{window - 1}', 0)
+        if used + previous * (1 - elapsed) <= capacity:
+            return True
+
+        # Requisições recusadas não consomem o limite.
+        try:
+            self.cache.decr(key, weight)
+        except ValueError:
+            pass
+        self.wait_time = (1 - elapsed) * self.duration
+        return False
+
+    def wait(self):
+        return getattr(self, 'wait_time', None)
+
+
+class ConcurrencyLimitMixin:
+    """
+    Limita a quantidade de requisições custosas (ações em concurrency_limited_actions) executadas
+    ao mesmo tempo por cliente, conforme API_MAX_CONCURRENT_REQUESTS.
+
+    Cada requisição ocupa uma das vagas do cliente, uma chave do cache adquirida com add (atômico) e
+    liberada ao final. Cada vaga expira API_CONCURRENCY_SLOT_TTL segundos após a sua própria aquisição,
+    evitando vazamento de vagas se um processo morrer; o TTL deve ser maior que a duração das requisições.
+    """
+    concurrency_limited_actions = ('list', 'bulk')
+
+    def get_concurrency_cache_key(self, request):
+        return f'throttle_concurrency_{get_client_ident(request, request.META.get("REMOTE_ADDR"))}'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        limit = settings.API_MAX_CONCURRENT_REQUESTS
+        if not limit or self.action not in self.concurrency_limited_actions:
+            return
+
+        is_shared_cache('limite de consultas simultâneas aplicado por processo')
+        key = self.get_concurrency_cache_key(request)
+        token = get_token()
+        for index in range(limit):
+            slot_key = f'{key}:{index}'
+            if cache.add(slot_key, token, settings.API_CONCURRENCY_SLOT_TTL):
+                self._concurrency_slot = (slot_key, token)
+                return
+
+        raise Throttled(detail=f'Limite de {limit} consultas simultâneas atingido.')
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        slot = getattr(self, '_concurrency_slot', None)
+        if slot is not None:
+            self._concurrency_slot = None
+            slot_key, token = slot
+            # Libera apenas a vaga própria (se expirou, outra requisição pode tê-la assumido).
+            if cache.get(slot_key) == token:
+                cache.delete(slot_key)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -2,9 +2,11 @@ from django.urls import include
 from django.urls import path
 
 from integrations.api.routers import router
+from integrations.api.views import IntegrationWebhookView
 
 app_name = 'integrations'
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('webhooks/<str:handle>/<str:event>/', IntegrationWebhookView.as_view(), name='integration-webhook'),
 ]
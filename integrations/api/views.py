@@ -1,31 +1,226 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema
-from rest_framework import viewsets
-from rest_framework.permissions import DjangoModelPermissions, IsAdminUser
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import AllowAny, DjangoModelPermissions, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from integrations.api.filter_backends import GeoFilterBackend
+from integrations.api.parsers import NDJSONParser
+from integrations.api.throttling import ConcurrencyLimitMixin
+from integrations.api.serializers import (
+    ContextualEventSerializer,
+    ContextualDataSerializer,
+    ContextualEventBulkItemSerializer,
+    ContextualEventBulkResponseSerializer,
+    ContextualDataRollupSerializer,
+)
+from integrations.filters import (
+    ContextualEventFilterClass,
+    ContextualDataFilterClass,
+    ContextualDataRollupFilterClass,
+)
+from integrations.helpers import (
+    bulk_upsert_events,
+    get_affected_contextual_data,
+    sync_contextual_data,
+    syncing_contextual_data,
+)
+from integrations.models import ContextualEvent, ContextualData, ContextualDataRollup, Integration, WebhookDelivery
+from integrations.profiling import SamplingProfiler, is_profiling_requested, save_request_profile
+from integrations.registry import plugin_registry
+from integrations.sharding import get_ingest_queue
+from integrations.tasks import consume_webhook_deliveries
+
+
+class ContextualDataSyncMixin:
+    """
+    Mantém as projeções tipadas e os agregados dos dados contextuais nas gravações feitas pela API
+    (integrations.helpers.sync_contextual_data).
+    """
+    sync_projections = True
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            sync_contextual_data(get_affected_contextual_data(serializer.instance), projections=self.sync_projections)
+
+    def perform_update(self, serializer):
+        with syncing_contextual_data(serializer.instance, projections=self.sync_projections):
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with syncing_contextual_data(instance, projections=self.sync_projections):
+            super().perform_destroy(instance)
 
-from integrations.api.serializers import ContextualEventSerializer, ContextualDataSerializer
-from integrations.filters import ContextualEventFilterClass, ContextualDataFilterClass
-from integrations.models import ContextualEvent, ContextualData
+
+class RequestProfilingMixin:
+    """
+    Gera o profile das requisições de administradores autenticados pela API (chave de API, JWT etc.),
+    iniciado após a autenticação do DRF; os autenticados por sessão já são perfilados pelo
+    ProfilingMiddleware (integrations.middleware).
+    """
+    _profiler = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if is_profiling_requested(request) and getattr(request, 'profiler', None) is None and request.user.is_staff:
+            self._profiler = SamplingProfiler().start()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        profiler, self._profiler = self._profiler, None
+        if profiler is not None:
+            profiler.stop()
+            save_request_profile(profiler, request, response)
+        return response
 
 
 @extend_schema(tags=['integrations'])
-class ContextualEventViewSet(viewsets.ModelViewSet):
+class ContextualEventViewSet(
+    RequestProfilingMixin, ContextualDataSyncMixin, ConcurrencyLimitMixin, viewsets.ModelViewSet
+):
     """
     API endpoint que permite visualizar ou editar eventos contextuais.
-    Suporta filtros por localização, cidade, data, categoria e tipo de evento.
+    Suporta filtros por localização, cidade, data, categoria e tipo de evento, além de
+    proximidade (within=lat,lon,km) e retângulo (bbox=min_lon,min_lat,max_lon,max_lat).
     """
-    queryset = ContextualEvent.objects.select_related('event').all()
+    queryset = ContextualEvent.objects.order_by('-created_at')
     serializer_class = ContextualEventSerializer
     rql_filter_class = ContextualEventFilterClass
+    # O filtro geográfico vem antes do RQL para que a estimativa de custo considere a consulta completa.
+    filter_backends = [GeoFilterBackend, *api_settings.DEFAULT_FILTER_BACKENDS]
+    non_rql_query_params = (GeoFilterBackend.within_param, GeoFilterBackend.bbox_param)
     permission_classes = [DjangoModelPermissions, IsAdminUser]
+    # Alterações do evento (cidade, categoria) movem os seus dados entre agregados, sem alterar as projeções.
+    sync_projections = False
+
+    @extend_schema(
+        request=ContextualEventBulkItemSerializer(many=True),
+        responses=ContextualEventBulkResponseSerializer,
+    )
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """
+        Ingestão em lote de eventos contextuais (array JSON ou NDJSON).
+        Os eventos são criados ou atualizados pela mesma chave natural usada pelos providers
+        e o resultado é retornado item a item.
+        """
+        items = request.data
+        if isinstance(items, dict):
+            items = [items]
+        if not isinstance(items, list):
+            return Response({'detail': 'O corpo deve ser uma lista de eventos.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_INGEST_MAX_ITEMS:
+            return Response(
+                {'detail': f'Máximo de {settings.BULK_INGEST_MAX_ITEMS} eventos por requisição.'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        integration_uids = set()
+        for item in items:
+            try:
+                integration_uids.add(uuid.UUID(str(item['integration'])))
+            except (TypeError, KeyError, ValueError):
+                continue
+        context = {'integrations': Integration.objects.in_bulk(integration_uids) if integration_uids else {}}
+
+        results = [None] * len(items)
+        valid_items = []
+        for index, item in enumerate(items):
+            serializer = ContextualEventBulkItemSerializer(data=item, context=context)
+            if serializer.is_valid():
+                valid_items.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+        upserted = bulk_upsert_events([data for _, data in valid_items])
+        for (index, _), (event, created, contextual_data) in zip(valid_items, upserted):
+            results[index] = {
+                'index': index,
+                'status': 'created' if created else 'updated',
+                'uid': event.uid,
+                'data_uid': contextual_data.uid if contextual_data else None,
+            }
+
+        summary = {'created': 0, 'updated': 0, 'error': 0}
+        for result in results:
+            summary[result['status']] += 1
+
+        return Response({
+            'created': summary['created'],
+            'updated': summary['updated'],
+            'errors': summary['error'],
+            'results': results,
+        })
 
 
 @extend_schema(tags=['integrations'])
-class ContextualDataViewSet(viewsets.ModelViewSet):
+class ContextualDataViewSet(
+    RequestProfilingMixin, ContextualDataSyncMixin, ConcurrencyLimitMixin, viewsets.ModelViewSet
+):
     """
     API endpoint que permite visualizar ou editar dados contextuais.
     Suporta filtros por evento, integração e versão.
     """
-    queryset = ContextualData.objects.all()
+    # O serializer aninha o evento (depth=1); sem o join seria uma consulta por item da página.
+    queryset = ContextualData.objects.select_related('event')
     serializer_class = ContextualDataSerializer
     rql_filter_class = ContextualDataFilterClass
     permission_classes = [DjangoModelPermissions, IsAdminUser]
+
+
+@extend_schema(tags=['integrations'])
+class ContextualDataRollupViewSet(RequestProfilingMixin, ConcurrencyLimitMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint somente leitura com os agregados por hora e por dia dos dados contextuais
+    (contagem, soma, mínimo, máximo e média de cada métrica numérica).
+    Suporta filtros por integração, cidade, categoria, granularidade, métrica e intervalo.
+    """
+    queryset = ContextualDataRollup.objects.all()
+    serializer_class = ContextualDataRollupSerializer
+    rql_filter_class = ContextualDataRollupFilterClass
+    permission_classes = [DjangoModelPermissions, IsAdminUser]
+
+
+@extend_schema(tags=['integrations'], request=None, responses=None)
+class IntegrationWebhookView(APIView):
+    """
+    Recebe eventos publicados por sistemas externos para uma integração (push).
+    O payload é armazenado e processado de forma assíncrona, em lote, pelo handler
+    de consumo do provider; a resposta é imediata (202).
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request, handle, event):
+        integration = get_object_or_404(Integration, handle=handle, is_active=True)
+        provider_cls = plugin_registry.get_provider_backend(integration.provider_backend_id)
+        if provider_cls is None or not provider_cls.supports_event(event):
+            return Response({'detail': 'Evento não suportado pela integração.'}, status=status.HTTP_404_NOT_FOUND)
+
+        provider_backend = provider_cls(integration=integration, credentials=None)
+        if not provider_backend.verify_webhook(request):
+            return Response({'detail': 'Token do webhook inválido.'}, status=status.HTTP_403_FORBIDDEN)
+
+        delivery = WebhookDelivery.objects.create(integration=integration, event=event, payload=request.data)
+
+        # Agenda apenas um processamento por janela; as entregas recebidas nesse intervalo são consumidas juntas.
+        if cache.add(f'webhook-batch:{integration.uid}', 1, timeout=settings.WEBHOOK_BATCH_WINDOW):
+            consume_webhook_deliveries.apply_async(
+                args=[str(integration.uid)],
+                countdown=settings.WEBHOOK_BATCH_WINDOW,
+                queue=get_ingest_queue(integration),
+            )
+
+        return Response({'status': 'accepted', 'uid': delivery.uid}, status=status.HTTP_202_ACCEPTED)
@@ -5,3 +5,6 @@ class IntegrationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'integrations'
     verbose_name = 'Hub de Integrações'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from integrations import metrics
+
+logger = logging.getLogger(__name__)
+
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@lru_cache(maxsize=None)
+def _is_shared_cache_backend(backend, feature):
+    shared = backend not in PROCESS_LOCAL_CACHE_BACKENDS
+    if not shared:
+        logger.warning(
+            f"[AVISO] O cache padrão ({backend}) é local ao processo: {feature}. "
+            f"Configure CACHE_URL (Redis) ou CACHE_BACKEND com um cache compartilhado.")
+    return shared
+
+
+def is_shared_cache(feature):
+    """
+    Indica se o cache padrão é compartilhado entre os processos (ex.: Redis ou Memcached).
+    Recursos cujo estado precisa valer para todos os workers (invalidações, contadores) não devem
+    usar um cache local ao processo; nesse caso o aviso `feature` (o efeito sobre o recurso) é
+    registrado uma única vez.
+    """
+    from django.conf import settings
+
+    return _is_shared_cache_backend(settings.CACHES['default']['BACKEND'], feature)
+
+
+class ValidatedObjectCache:
+    """
+    Cache dos objetos Pydantic validados a partir dos campos JSON dos models
+    (ex.: Integration.provider_backend_data e CredentialsEntity.credentials_type_data).
+
+    Os objetos ficam memorizados na própria instância do model e, por worker, em um LRU indexado
+    por (model, pk, campo, schema). As entradas são validadas pela assinatura (hash) do valor atual
+    do campo, de modo que alterações feitas sem passar por save() (update(), bulk_update, SQL ou
+    a própria instância em memória) nunca retornam um objeto desatualizado. Os sinais post_save e
+    post_delete apenas liberam as entradas do worker.
+    Os objetos retornados são compartilhados e devem ser tratados como somente leitura.
+    """
+    INSTANCE_ATTR = '_validated_objects'
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._objects = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_fingerprint(data) -> str:
+        """Assinatura do valor do campo JSON."""
+        raw = json.dumps(data, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    def get(self, instance, field_name, schema_model):
+        """
+        Retorna o objeto validado do campo JSON da instância, validando apenas quando o valor mudou.
+        """
+        data = getattr(instance, field_name)
+        fingerprint = self.get_fingerprint(data)
+
+        memo = instance.__dict__.setdefault(self.INSTANCE_ATTR, {})
+        entry = memo.get((field_name, schema_model))
+        if entry is not None and entry[0] == fingerprint:
+            return entry[1]
+
+        key = (instance._meta.label, instance.pk, field_name, schema_model)
+        cacheable = instance.pk is not None
+
+        obj = None
+        if cacheable:
+            with self._lock:
+                cached = self._objects.get(key)
+                if cached is not None and cached[0] == fingerprint:
+                    self._objects.move_to_end(key)
+                    obj = cached[1]
+
+        if cacheable:
+            metrics.observe_cache('validated_objects', obj is not None)
+
+        if obj is None:
+            obj = schema_model(**(data or {}))
+            if cacheable:
+                with self._lock:
+                    self._objects[key] = (fingerprint, obj)
+                    self._objects.move_to_end(key)
+                    while len(self._objects) > self.maxsize:
+                        self._objects.popitem(last=False)
+
+        memo[(field_name, schema_model)] = (fingerprint, obj)
+        return obj
+
+    def clear_instance(self, instance):
+        """Descarta os objetos memorizados na instância (chamado ao salvar)."""
+        instance.__dict__.pop(self.INSTANCE_ATTR, None)
+
+    def invalidate(self, model_label, pk):
+        """Descarta as entradas do worker para o registro informado."""
+        with self._lock:
+            for key in [key for key in self._objects if key[0] == model_label and key[1] == pk]:
+                del self._objects[key]
+
+    def clear(self):
+        with self._lock:
+            self._objects.clear()
+
+
+validated_objects = ValidatedObjectCache()
+
+
+class ActiveIntegrationsCache:
+    """
+    Cache, por worker, das integrações ativas com as suas credenciais e os providers já instanciados.
+
+    A cada uso é feita uma única consulta de versão (quantidade de integrações e maiores updated_at das
+    integrações e das credenciais); a lista só é recarregada quando essa versão muda ou quando os sinais
+    de alteração do próprio processo a invalidam.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_version():
+        from django.db.models import Count, Max, Q
+
+        from integrations.models import Integration
+
+        version = Integration.objects.aggregate(
+            total=Count('pk'),
+            active=Count('pk', filter=Q(is_active=True)),
+            updated_at=Max('updated_at'),
+            credentials_updated_at=Max('credentials__updated_at'),
+        )
+        return tuple(sorted(version.items()))
+
+    @staticmethod
+    def load_entries():
+        """
+        Carrega as integrações ativas (com as credenciais em um único join) e instancia os providers.
+        Retorna uma lista de tuplas (integração, provider).
+        """
+        from integrations.models import Integration
+        from integrations.registry import plugin_registry
+
+        entries = []
+        for integration in Integration.objects.filter(is_active=True).select_related('credentials'):
+            provider_cls = plugin_registry.get_provider_backend(integration.provider_backend_id)
+            if provider_cls is None:
+                logger.warning(
+                    f"[AVISO] Provider '{integration.provider_backend_id}' não encontrado para a integração "
+                    f"'{integration.name}'.")
+                continue
+            entries.append((integration, provider_cls(integration=integration, credentials=integration.credentials)))
+        return entries
+
+    def get_entries(self):
+        """Retorna as integrações ativas e os seus providers, recarregando apenas quando houve alteração."""
+        version = self.get_version()
+        with self._lock:
+            hit = self._entries is not None and self._version == version
+            if not hit:
+                self._entries = self.load_entries()
+                self._version = version
+            entries = list(self._entries)
+        metrics.observe_cache('active_integrations', hit)
+        return entries
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+            self._version = None
+
+
+active_integrations = ActiveIntegrationsCache()
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 
+from integrations.caching import validated_objects
 from integrations.models import CredentialsEntity
 
 
@@ -51,15 +52,14 @@ class BaseCredentialsType(ABC):
         """
         Converte os dados públicos do tipo de credencial (dicionário)
         em objeto Pydantic, usando o schema definido.
+        O objeto é memorizado enquanto os dados da credencial não mudam.
         """
         schema_model = self.get_credentials_schema()
-        data = self.instance.credentials_type_data or {}
-
         if not schema_model:
             return None
 
         try:
-            return schema_model(**data)
+            return validated_objects.get(self.instance, 'credentials_type_data', schema_model)
         except Exception as e:
             raise ValueError(f"Erro ao instanciar o schema público: {e}")
 
@@ -67,15 +67,14 @@ class BaseCredentialsType(ABC):
         """
         Converte os dados privados do tipo de credencial (dicionário)
         em objeto Pydantic, usando o schema privado definido.
+        O objeto é memorizado enquanto os dados da credencial não mudam.
         """
         schema_model = self.get_credentials_private_schema()
-        private_data = self.instance.credentials_type_private_data or {}
-
         if not schema_model:
             return None
 
         try:
-            return schema_model(**private_data)
+            return validated_objects.get(self.instance, 'credentials_type_private_data', schema_model)
         except Exception as e:
             raise ValueError(f"Erro ao instanciar o schema privado: {e}")
 
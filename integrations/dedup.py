@@ -0,0 +1,115 @@
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from integrations import metrics
+
+NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+MATCH_KEY_SEPARATOR = '\x1f'
+
+
+def normalize_text(value) -> str:
+    """
+    Normaliza um texto para comparação: remove acentos, ignora maiúsculas/minúsculas
+    e reduz pontuação e espaços a um único espaço (ex.: "São  Paulo!" -> "sao paulo").
+    """
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', str(value))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return NON_ALPHANUMERIC.sub(' ', value.casefold()).strip()
+
+
+def get_date_bucket(event_date) -> str:
+    """
+    Retorna o início do intervalo (EVENT_DEDUP_DATE_BUCKET: day, week ou month) que contém a data.
+    """
+    if event_date is None:
+        return ''
+    granularity = settings.EVENT_DEDUP_DATE_BUCKET
+    if granularity == 'week':
+        event_date = event_date - timedelta(days=event_date.weekday())
+    elif granularity == 'month':
+        event_date = event_date.replace(day=1)
+    return event_date.isoformat()
+
+
+class CityAliasResolver:
+    """
+    Resolve nomes de cidade para a forma canônica usando a tabela CityAlias.
+    A tabela é mantida em memória por processo e recarregada quando a versão compartilhada
+    no cache muda (alterada pelos sinais de CityAlias).
+    """
+    CACHE_VERSION_KEY = 'city-aliases:version'
+
+    def __init__(self):
+        self._aliases = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_aliases(self) -> dict:
+        """Retorna o dict {apelido normalizado: cidade canônica normalizada}."""
+        from integrations.models import CityAlias
+
+        version = cache.get(self.CACHE_VERSION_KEY)
+        with self._lock:
+            hit = self._aliases is not None and version == self._version
+            if not hit:
+                self._aliases = {
+                    alias: normalize_text(city)
+                    for alias, city in CityAlias.objects.values_list('alias', 'city')
+                }
+                self._version = version
+            aliases = self._aliases
+        metrics.observe_cache('city_aliases', hit)
+        return aliases
+
+    def invalidate(self):
+        cache.set(self.CACHE_VERSION_KEY, time.time_ns(), timeout=None)
+        with self._lock:
+            self._aliases = None
+
+
+city_aliases = CityAliasResolver()
+
+
+def get_city_key(city, aliases=None) -> str:
+    """Retorna a chave canônica da cidade (normalizada e resolvida pelos apelidos)."""
+    normalized = normalize_text(city)
+    aliases = city_aliases.get_aliases() if aliases is None else aliases
+    return aliases.get(normalized, normalized)
+
+
+def get_match_key(event_type, event_date, location=None, city=None, aliases=None) -> str:
+    """
+    Calcula a chave de deduplicação de um evento contextual.
+
+    A chave combina o tipo do evento, a cidade (canônica), a localização e o intervalo da data,
+    todos normalizados; a grafia da cidade embutida no tipo (ex.: "Sao Paulo - weather") também é
+    substituída pela forma canônica, como palavras inteiras. O resultado é um hash de 40 caracteres, consultado por índice.
+    """
+    aliases = city_aliases.get_aliases() if aliases is None else aliases
+    city_normalized = normalize_text(city)
+    city_key = aliases.get(city_normalized, city_normalized)
+
+    type_key = normalize_text(event_type)
+    if city_normalized and city_normalized != city_key:
+        # Apenas palavras inteiras: com o apelido "rio", "period" não vira "perio de janeirod".
+        type_key = re.sub(rf'\b{re.escape(city_normalized)}\b', lambda match: city_key, type_key)
+
+    raw = MATCH_KEY_SEPARATOR.join((type_key, city_key, normalize_text(location), get_date_bucket(event_date)))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def get_event_match_key(data, aliases=None) -> str:
+    """Calcula a chave de deduplicação a partir de um evento ou de um dict com os seus campos."""
+    if isinstance(data, dict):
+        return get_match_key(
+            data.get('event_type'), data.get('event_date'), data.get('location'), data.get('city'), aliases)
+    return get_match_key(data.event_type, data.event_date, data.location, data.city, aliases)
@@ -1,17 +1,100 @@
-from dj_rql.filter_cls import AutoRQLFilterClass
+import json
 
-from integrations.models import ContextualEvent, ContextualData
+from dj_rql.filter_cls import RQLFilterClass
+from django.db.models import Q
+from py_rql.constants import FilterLookups
+from py_rql.exceptions import RQLFilterParsingError
 
+from integrations.models import ContextualEvent, ContextualData, ContextualDataRollup
 
-class ContextualEventFilterClass(AutoRQLFilterClass):
+EXACT_LOOKUPS = {FilterLookups.EQ, FilterLookups.NE, FilterLookups.IN, FilterLookups.OUT}
+JSON_KEY_LOOKUPS = {FilterLookups.EQ}
+
+
+class JSONKeyFilterMixin:
+    """
+    Implementa os filtros customizados por chave de campos JSON, no formato eq(extra_fields,chave:valor).
+    O valor é interpretado como JSON quando possível (números, booleanos, null) e a consulta usa
+    o operador de contenção (@>), atendido pelo índice GIN do campo.
+    """
+    JSON_KEY_FILTERS = ()
+
+    def build_q_for_custom_filter(self, data):
+        if data.filter_name not in self.JSON_KEY_FILTERS:
+            return super().build_q_for_custom_filter(data)
+
+        key, separator, raw_value = data.str_value.partition(':')
+        if not separator or not key:
+            raise RQLFilterParsingError(details={
+                'error': f'Filtro inválido para {data.filter_name}: use o formato chave:valor.',
+            })
+
+        try:
+            value = json.loads(raw_value)
+        except ValueError:
+            value = raw_value
+
+        return Q(**{f'{data.filter_name}__contains': {key: value}})
+
+
+class ContextualEventFilterClass(JSONKeyFilterMixin, RQLFilterClass):
     """
-    Filter class for the Reservation model.
+    Filter class for the ContextualEvent model.
+    Only indexed columns are exposed, with exact lookups for text fields and ranges for dates.
     """
     MODEL = ContextualEvent
+    JSON_KEY_FILTERS = ('extra_fields',)
+    FILTERS = (
+        {'filter': 'uid', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'event_type', 'lookups': EXACT_LOOKUPS, 'ordering': True},
+        {'filter': 'event_date', 'ordering': True},
+        {'filter': 'city', 'lookups': EXACT_LOOKUPS, 'ordering': True},
+        {'filter': 'category', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'location', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'integration', 'source': 'integration__uid', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'created_at', 'ordering': True},
+        {'filter': 'extra_fields', 'custom': True, 'lookups': JSON_KEY_LOOKUPS},
+    )
 
 
-class ContextualDataFilterClass(AutoRQLFilterClass):
+class ContextualDataFilterClass(JSONKeyFilterMixin, RQLFilterClass):
     """
     Filter class for the ContextualData model.
+    Typed projection fields are filtered on their own indexed tables (e.g. weather.temperature).
     """
     MODEL = ContextualData
+    JSON_KEY_FILTERS = ('extra_fields',)
+    FILTERS = (
+        {'filter': 'uid', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'event', 'source': 'event__uid', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'integration', 'source': 'integration__uid', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'version', 'ordering': True},
+        {'filter': 'fetched_at', 'ordering': True},
+        {'filter': 'extra_fields', 'custom': True, 'lookups': JSON_KEY_LOOKUPS},
+        {
+            'namespace': 'weather',
+            'source': 'weather_observation',
+            'filters': (
+                {'filter': 'observed_at', 'ordering': True},
+                {'filter': 'temperature', 'ordering': True},
+                {'filter': 'humidity', 'ordering': True},
+                {'filter': 'weather', 'lookups': EXACT_LOOKUPS},
+                {'filter': 'country', 'lookups': EXACT_LOOKUPS},
+            ),
+        },
+    )
+
+
+class ContextualDataRollupFilterClass(RQLFilterClass):
+    """
+    Filter class for the ContextualDataRollup model.
+    """
+    MODEL = ContextualDataRollup
+    FILTERS = (
+        {'filter': 'integration', 'source': 'integration__uid', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'city', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'category', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'granularity', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'metric', 'lookups': EXACT_LOOKUPS},
+        {'filter': 'bucket', 'ordering': True},
+    )
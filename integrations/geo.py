@@ -0,0 +1,157 @@
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ACos, Cos, Least, Radians, Sin
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+MAX_COVERING_CELLS = 32
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION) -> str:
+    """Codifica uma coordenada em geohash (precisão 9 ≈ células de 5 m × 5 m)."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        coordinate, interval = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bit = 0
+            value = 0
+    return ''.join(chars)
+
+
+def get_event_geohash(latitude, longitude) -> str:
+    """Geohash armazenado no evento, ou '' quando não há coordenadas."""
+    if latitude is None or longitude is None:
+        return ''
+    return encode_geohash(latitude, longitude)
+
+
+def get_cell_size(precision):
+    """Retorna o tamanho (graus de latitude, graus de longitude) de uma célula na precisão informada."""
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def get_bounding_box(latitude, longitude, radius_km):
+    """
+    Retorna o retângulo (min_lat, min_lon, max_lat, max_lon) que contém o círculo informado. Quando o
+    círculo cruza o antimeridiano, min_lon > max_lon (como no bbox do GeoJSON); quando contém um dos polos,
+    o retângulo abrange todas as longitudes.
+    """
+    angular_radius = radius_km / EARTH_RADIUS_KM
+    delta_lat = math.degrees(angular_radius)
+    min_lat, max_lat = latitude - delta_lat, latitude + delta_lat
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0
+
+    # Maior diferença de longitude dentro do círculo (ocorre acima da latitude do centro).
+    delta_lon = math.degrees(math.asin(math.sin(angular_radius) / math.cos(math.radians(latitude))))
+    min_lon, max_lon = longitude - delta_lon, longitude + delta_lon
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def split_bounding_box(min_lat, min_lon, max_lat, max_lon):
+    """Divide no antimeridiano o retângulo em que min_lon > max_lon; os demais são retornados como estão."""
+    if min_lon <= max_lon:
+        return [(min_lat, min_lon, max_lat, max_lon)]
+    return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+
+
+def _steps(start, end, step):
+    value = start
+    while value < end:
+        yield value
+        value += step
+    yield end
+
+
+def get_covering_cells(min_lat, min_lon, max_lat, max_lon, max_cells=MAX_COVERING_CELLS):
+    """
+    Retorna os prefixos de geohash que cobrem o retângulo, usando a maior precisão
+    que resulte em no máximo max_cells células.
+    """
+    precision = GEOHASH_PRECISION
+    while precision > 1:
+        lat_size, lon_size = get_cell_size(precision)
+        cells = (math.ceil((max_lat - min_lat) / lat_size) + 1) * (math.ceil((max_lon - min_lon) / lon_size) + 1)
+        if cells <= max_cells:
+            break
+        precision -= 1
+
+    lat_size, lon_size = get_cell_size(precision)
+    return sorted({
+        encode_geohash(lat, lon, precision)
+        for lat in _steps(min_lat, max_lat, lat_size)
+        for lon in _steps(min_lon, max_lon, lon_size)
+    })
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    """Distância em km entre duas coordenadas."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def distance_km_expression(latitude, longitude, lat_field='latitude', lon_field='longitude'):
+    """Expressão SQL da distância (km, lei dos cossenos esférica) entre os campos e a coordenada informada."""
+    lat = Radians(Value(float(latitude), output_field=FloatField()))
+    lon = Radians(Value(float(longitude), output_field=FloatField()))
+    cosine = (
+        Cos(lat) * Cos(Radians(F(lat_field))) * Cos(Radians(F(lon_field)) - lon)
+        + Sin(lat) * Sin(Radians(F(lat_field)))
+    )
+    one = Value(1.0, output_field=FloatField())
+    return Value(EARTH_RADIUS_KM, output_field=FloatField()) * ACos(Least(cosine, one))
+
+
+def get_cells_q(cells, field='geohash'):
+    """Filtro por prefixos de geohash, atendido pelo índice (varchar_pattern_ops) da coluna."""
+    q = Q()
+    for cell in cells:
+        q |= Q(**{f'{field}__startswith': cell})
+    return q
+
+
+def filter_bbox(queryset, min_lat, min_lon, max_lat, max_lon):
+    """
+    Filtra os registros dentro do retângulo, primeiro pelas células de geohash e depois pelas coordenadas.
+    Com min_lon > max_lon, o retângulo cruza o antimeridiano.
+    """
+    q = Q()
+    for box_min_lat, box_min_lon, box_max_lat, box_max_lon in split_bounding_box(min_lat, min_lon, max_lat, max_lon):
+        q |= get_cells_q(get_covering_cells(box_min_lat, box_min_lon, box_max_lat, box_max_lon)) & Q(
+            latitude__range=(box_min_lat, box_max_lat),
+            longitude__range=(box_min_lon, box_max_lon),
+        )
+    return queryset.filter(q)
+
+
+def filter_within(queryset, latitude, longitude, radius_km):
+    """Filtra os registros a até radius_km da coordenada, anotando a distância em distance_km."""
+    queryset = filter_bbox(queryset, *get_bounding_box(latitude, longitude, radius_km))
+    return queryset.alias(distance_km=distance_km_expression(latitude, longitude)).filter(distance_km__lte=radius_km)
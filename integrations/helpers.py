@@ -0,0 +1,236 @@
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Max, QuerySet
+from django.utils import timezone
+from pydantic import ValidationError
+
+from integrations.dedup import city_aliases, get_event_match_key
+from integrations.geo import get_event_geohash
+from integrations.models import ContextualEvent, ContextualData
+from integrations.rollups import (
+    get_observed_at,
+    get_rollup_groups,
+    refresh_rollup_groups,
+    update_rollups_for_contextual_data,
+)
+from integrations.registry import plugin_registry
+
+EVENT_KEY_FIELDS = ('event_type', 'event_date', 'location', 'city')
+EVENT_UPDATE_FIELDS = ('category', 'integration', 'extra_fields', 'latitude', 'longitude', 'geohash')
+
+
+def _get_existing_events(match_keys):
+    """
+    Busca em uma única consulta (pelo índice único de match_key) os eventos já existentes para as chaves informadas.
+    Retorna um dict {match_key: evento}.
+    """
+    return {event.match_key: event for event in ContextualEvent.objects.filter(match_key__in=match_keys)}
+
+
+def _get_next_versions(pairs):
+    """
+    Retorna a próxima versão de ContextualData para cada par (event_uid, integration_uid).
+    """
+    event_uids = {event_uid for event_uid, _ in pairs}
+    integration_uids = {integration_uid for _, integration_uid in pairs}
+    rows = (
+        ContextualData.objects
+        .filter(event_id__in=event_uids, integration_id__in=integration_uids)
+        .values('event_id', 'integration_id')
+        .annotate(last_version=Max('version'))
+    )
+    next_versions = defaultdict(lambda: 1)
+    for row in rows:
+        next_versions[(row['event_id'], row['integration_id'])] = row['last_version'] + 1
+    return next_versions
+
+
+def bulk_upsert_events(items, batch_size=500, projection_model=None):
+    """
+    Cria ou atualiza em lote eventos contextuais (e, opcionalmente, seus dados contextuais).
+
+    Os eventos são identificados pela chave de deduplicação (integrations.dedup), de forma que
+    grafias diferentes da mesma cidade no mesmo dia resultam no mesmo evento.
+    Cada item é um dict já validado com as chaves de EVENT_KEY_FIELDS, além de
+    'category', 'extra_fields', 'integration' (instância ou None), 'latitude' e 'longitude' (opcionais)
+    e 'data' (dict com os dados contextuais ou None). Quando projection_model é informado, os itens com
+    'projection' (valores tipados) também são materializados na projeção da categoria.
+
+    Retorna uma lista, na mesma ordem dos itens, de tuplas (evento, criado, dado_contextual); quando
+    a mesma chave aparece mais de uma vez no lote, apenas a primeira ocorrência consta como criada.
+    """
+    from integrations.providers.base import BaseProviderBackend
+
+    if not items:
+        return []
+
+    aliases = city_aliases.get_aliases()
+    item_keys = [get_event_match_key(item, aliases) for item in items]
+    # Itens repetidos no lote (mesma chave) resultam em um único evento: apenas a primeira ocorrência
+    # de uma chave nova é informada como criada; as demais são atualizações (novas versões dos dados).
+    unique_keys = list(dict.fromkeys(item_keys))
+
+    with transaction.atomic():
+        events = _get_existing_events(unique_keys)
+        created_keys = set()
+        to_create = []
+        to_update = {}
+        previous_categories = {}
+
+        for item, key in zip(items, item_keys):
+            event = events.get(key)
+            if event is None:
+                event = ContextualEvent(match_key=key, **{field: item.get(field) for field in EVENT_KEY_FIELDS})
+                events[key] = event
+                created_keys.add(key)
+                to_create.append(event)
+            elif key not in created_keys:
+                to_update[event.pk] = event
+                previous_categories.setdefault(event.pk, event.category)
+
+            event.category = item.get('category')
+            event.integration = item.get('integration')
+            event.extra_fields = item.get('extra_fields') or {}
+            if item.get('latitude') is not None and item.get('longitude') is not None:
+                event.latitude = item['latitude']
+                event.longitude = item['longitude']
+                event.geohash = get_event_geohash(event.latitude, event.longitude)
+
+        # Eventos existentes que mudaram de categoria levam seus dados para outros grupos de agregados.
+        recategorized = [event.pk for event in to_update.values() if event.category != previous_categories[event.pk]]
+        previous_groups = (
+            get_rollup_groups(ContextualData.objects.filter(event_id__in=recategorized)) if recategorized else set()
+        )
+
+        # Um evento com a mesma chave pode ter sido criado por outro processo depois da consulta: o conflito
+        # no índice único vira uma atualização do evento existente, cujo uid substitui o gerado.
+        ContextualEvent.objects.bulk_create(
+            to_create,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['match_key'],
+            update_fields=EVENT_UPDATE_FIELDS,
+        )
+        if to_create:
+            stored_pks = dict(
+                ContextualEvent.objects.filter(match_key__in=[event.match_key for event in to_create])
+                .values_list('match_key', 'pk')
+            )
+            for event in to_create:
+                if stored_pks[event.match_key] != event.pk:
+                    event.pk = stored_pks[event.match_key]
+                    created_keys.discard(event.match_key)
+        ContextualEvent.objects.bulk_update(to_update.values(), EVENT_UPDATE_FIELDS, batch_size=batch_size)
+
+        next_versions = _get_next_versions({
+            (events[key].pk, item['integration'].pk)
+            for item, key in zip(items, item_keys)
+            if item.get('data') is not None and item.get('integration')
+        })
+
+        now = timezone.now()
+        results = []
+        contextual_data_list = []
+        projections = []
+        reported_keys = set()
+        for item, key in zip(items, item_keys):
+            event = events[key]
+            contextual_data = None
+            created = key in created_keys and key not in reported_keys
+            reported_keys.add(key)
+
+            if item.get('data') is not None and item.get('integration'):
+                version_key = (event.pk, item['integration'].pk)
+                data = item['data']
+                contextual_data = ContextualData(
+                    event=event,
+                    integration=item['integration'],
+                    version=next_versions[version_key],
+                    extra_fields={**data, "data_hash": BaseProviderBackend.version_data(data)},
+                    observed_at=get_observed_at(data, now),
+                )
+                next_versions[version_key] += 1
+                contextual_data_list.append(contextual_data)
+
+                if projection_model is not None and item.get('projection'):
+                    projections.append(projection_model(contextual_data=contextual_data, **item['projection']))
+
+            results.append((event, created, contextual_data))
+
+        ContextualData.objects.bulk_create(contextual_data_list, batch_size=batch_size)
+        if projections:
+            projection_model.objects.bulk_create(projections, batch_size=batch_size)
+        update_rollups_for_contextual_data(contextual_data_list)
+        if recategorized:
+            refresh_rollup_groups(
+                previous_groups | get_rollup_groups(ContextualData.objects.filter(event_id__in=recategorized)))
+
+    return results
+
+
+def sync_contextual_data_projections(contextual_data_list):
+    """
+    Materializa a projeção tipada de cada dado contextual, conforme o provider da sua integração.
+    Dados que não validam no schema normalizado do provider ficam sem projeção.
+    """
+    for contextual_data in contextual_data_list:
+        provider_cls = plugin_registry.get_provider_backend(contextual_data.integration.provider_backend_id)
+        projection_model = provider_cls.get_projection_model() if provider_cls else None
+        if projection_model is None:
+            continue
+
+        values = None
+        if provider_cls.normalized_schema is not None:
+            try:
+                normalized_data = provider_cls.normalized_schema.model_validate(contextual_data.extra_fields)
+                values = provider_cls.get_projection_values(normalized_data.model_dump())
+            except ValidationError as e:
+                logging.warning(
+                    f"[AVISO] Dado contextual '{contextual_data.pk}' fora do schema do provider, sem projeção: {e}")
+
+        if values is None:
+            projection_model.objects.filter(contextual_data=contextual_data).delete()
+        else:
+            projection_model.objects.update_or_create(contextual_data=contextual_data, defaults=values)
+
+
+def get_affected_contextual_data(target):
+    """
+    Dados contextuais afetados pela alteração de um evento ou dado contextual (instância ou queryset).
+    """
+    model = target.model if isinstance(target, QuerySet) else type(target)
+    if issubclass(model, ContextualEvent):
+        events = target if isinstance(target, QuerySet) else [target.pk]
+        return ContextualData.objects.filter(event__in=events)
+    return target if isinstance(target, QuerySet) else ContextualData.objects.filter(pk=target.pk)
+
+
+def sync_contextual_data(queryset, previous_groups=(), projections=True):
+    """
+    Caminho comum das gravações de dados contextuais feitas fora da ingestão em lote (API, Django Admin,
+    comandos): materializa as projeções tipadas dos registros do queryset e recalcula os agregados dos
+    grupos em que eles estão agora e dos grupos em que estavam antes da alteração (previous_groups).
+    """
+    with transaction.atomic():
+        if projections:
+            sync_contextual_data_projections(queryset.select_related('integration'))
+        return refresh_rollup_groups(set(previous_groups) | get_rollup_groups(queryset))
+
+
+@contextmanager
+def syncing_contextual_data(target, projections=True):
+    """
+    Executa o bloco (alteração ou exclusão do evento ou dado contextual informado) em uma transação,
+    sincronizando em seguida as projeções e os agregados afetados. Ex.:
+
+        with syncing_contextual_data(event):
+            event.save()
+    """
+    with transaction.atomic():
+        queryset = get_affected_contextual_data(target)
+        previous_groups = get_rollup_groups(queryset)
+        yield
+        sync_contextual_data(queryset, previous_groups, projections=projections)
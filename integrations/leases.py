@@ -0,0 +1,138 @@
+"""
+Leases da importação por integração, na tabela IngestLease (sem serviço externo).
+
+Cada execução adquire o lease da integração antes de importá-la e o libera ao terminar, de modo
+que uma integração é importada por no máximo um worker por vez, enquanto as demais integrações
+seguem em paralelo. O lease vale INGEST_LEASE_TTL segundos e é renovado a cada
+INGEST_LEASE_RENEW_INTERVAL segundos por uma thread (keep_alive), mesmo enquanto a execução espera
+uma resposta lenta do provider, e também pelo pipeline a cada página; se o worker for interrompido,
+o lease expira e a próxima execução o assume. Os horários são sempre os do banco, para não depender
+do relógio dos workers.
+
+A aquisição é um único INSERT ... ON CONFLICT DO UPDATE, condicionado a o lease atual estar expirado
+ou ser do próprio dono, de modo que o banco garante que apenas uma execução concorrente vence. Se outro
+worker assumiu o lease, a renovação (inclusive a próxima chamada a renew() depois de uma falha na
+thread) levanta LeaseLost e a execução é interrompida antes de persistir o lote seguinte.
+"""
+import datetime
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models.functions import Now
+
+from integrations.models import IngestLease
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def get_lease_owner(task_id=None):
+    """Identificador do dono do lease: host, processo e task."""
+    return f"{socket.gethostname()}:{os.getpid()}:{task_id or '-'}"
+
+
+class Lease:
+    def __init__(self, integration, owner, ttl=None, renew_interval=None):
+        self.integration = integration
+        self.owner = owner
+        self.ttl = ttl or settings.INGEST_LEASE_TTL
+        self.renew_interval = settings.INGEST_LEASE_RENEW_INTERVAL if renew_interval is None else renew_interval
+        self.held = False
+        self.lost = None
+        self._renewed_at = None
+
+    def get_expires_at(self):
+        return Now() + datetime.timedelta(seconds=self.ttl)
+
+    def acquire(self) -> bool:
+        """Adquire o lease (ou assume um lease expirado). Retorna False se outro worker o detém."""
+        table = IngestLease._meta.db_table
+        sql = f"""
+            INSERT INTO {table} (integration_id, owner, acquired_at, expires_at)
+            VALUES (%s, %s, STATEMENT_TIMESTAMP(), STATEMENT_TIMESTAMP() + %s)
+            ON CONFLICT (integration_id) DO UPDATE SET
+                owner = EXCLUDED.owner,
+                acquired_at = EXCLUDED.acquired_at,
+                expires_at = EXCLUDED.expires_at
+            WHERE {table}.expires_at <= STATEMENT_TIMESTAMP() OR {table}.owner = EXCLUDED.owner
+            RETURNING integration_id
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.integration.pk, self.owner, datetime.timedelta(seconds=self.ttl)])
+            self.held = cursor.fetchone() is not None
+
+        if self.held:
+            self._renewed_at = time.monotonic()
+        return self.held
+
+    def renew(self, force=False):
+        """
+        Prorroga o lease se já passou o intervalo de renovação (ou com force=True).
+        Levanta LeaseLost se o lease não pertence mais a este dono, inclusive quando isso foi
+        detectado pela thread de keep_alive.
+        """
+        if self.lost:
+            raise LeaseLost(self.lost)
+        if not self.held:
+            raise LeaseLost(f"Lease da integração '{self.integration}' não adquirido.")
+        if not force and time.monotonic() - self._renewed_at < self.renew_interval:
+            return
+        renewed = IngestLease.objects.filter(integration=self.integration, owner=self.owner).update(
+            expires_at=self.get_expires_at())
+        if not renewed:
+            self.held = False
+            self.lost = f"Lease da integração '{self.integration}' assumido por outro worker."
+            raise LeaseLost(self.lost)
+        self._renewed_at = time.monotonic()
+
+    def _heartbeat(self, stop, interval):
+        try:
+            while not stop.wait(interval):
+                try:
+                    self.renew(force=True)
+                except LeaseLost as e:
+                    logger.warning(f"[AVISO] {e}")
+                    return
+                except Exception as e:
+                    logger.error(f"[ERRO] Falha ao renovar o lease da integração '{self.integration}': {e}")
+        finally:
+            connections.close_all()
+
+    @contextmanager
+    def keep_alive(self):
+        """
+        Renova o lease em uma thread (com a sua própria conexão) a cada INGEST_LEASE_RENEW_INTERVAL
+        segundos (no máximo um terço do TTL) enquanto o bloco executa, para que ele não expire durante
+        uma busca demorada.
+        """
+        stop = threading.Event()
+        interval = max(min(self.renew_interval, self.ttl / 3), 1)
+        thread = threading.Thread(target=self._heartbeat, args=(stop, interval), name='lease-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+
+    def release(self):
+        if not self.held:
+            return
+        self.held = False
+        try:
+            IngestLease.objects.filter(integration=self.integration, owner=self.owner).delete()
+        except Exception as e:
+            logger.error(f"[ERRO] Falha ao liberar o lease da integração '{self.integration}': {e}")
+
+    def get_holder(self):
+        """Dono atual do lease (para diagnóstico), ou None."""
+        return IngestLease.objects.filter(integration=self.integration).values_list('owner', flat=True).first()
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from integrations.registry import plugin_registry
+
+
+class Command(BaseCommand):
+    help = 'Descobre os plugins de credenciais e providers e grava o manifesto usado pelo registro.'
+
+    def handle(self, *args, **options):
+        manifest = plugin_registry.load_manifest(rebuild=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Manifesto gravado em {settings.PLUGIN_MANIFEST_PATH}: "
+            f"{len(manifest['providers'])} providers, {len(manifest['credentials'])} tipos de credenciais."
+        ))
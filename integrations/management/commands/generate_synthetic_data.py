@@ -0,0 +1,323 @@
+import io
+import json
+import multiprocessing
+import random
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, time, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from integrations.dedup import city_aliases, get_match_key
+from integrations.geo import get_event_geohash
+from integrations.models import (
+    ContextualData,
+    ContextualDataRollup,
+    ContextualEvent,
+    CredentialsEntity,
+    Integration,
+    IntegrationLog,
+    ProfileSample,
+    WeatherObservation,
+    WebhookDelivery,
+)
+
+CATEGORY = 'weather'
+PROVIDER_ID = 'open_weather'
+BASE_CITIES = (
+    ('São Paulo', -23.5505, -46.6333),
+    ('Rio de Janeiro', -22.9068, -43.1729),
+    ('Belo Horizonte', -19.9167, -43.9345),
+    ('Brasília', -15.7939, -47.8828),
+    ('Salvador', -12.9714, -38.5014),
+    ('Fortaleza', -3.7319, -38.5267),
+    ('Curitiba', -25.4284, -49.2733),
+    ('Manaus', -3.1190, -60.0217),
+    ('Recife', -8.0476, -34.8770),
+    ('Porto Alegre', -30.0346, -51.2177),
+    ('Belém', -1.4558, -48.4902),
+    ('Goiânia', -16.6869, -49.2648),
+    ('Florianópolis', -27.5954, -48.5480),
+    ('Natal', -5.7945, -35.2110),
+    ('Campo Grande', -20.4697, -54.6201),
+)
+WEATHER_DESCRIPTIONS = ('céu limpo', 'algumas nuvens', 'nublado', 'chuva leve', 'chuva moderada', 'trovoada', 'névoa')
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def copy_value(value):
+    """Formata um valor para o formato texto do COPY do PostgreSQL."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    return str(value).translate(COPY_ESCAPES)
+
+
+class CopyBuffer:
+    """Acumula as linhas de uma tabela e as grava com COPY FROM STDIN."""
+
+    def __init__(self, model, fields):
+        self.table = model._meta.db_table
+        self.columns = [model._meta.get_field(field).column for field in fields]
+        self.buffer = io.StringIO()
+        self.rows = 0
+
+    def add(self, *values):
+        self.buffer.write('\t'.join(copy_value(value) for value in values))
+        self.buffer.write('\n')
+        self.rows += 1
+
+    def flush(self, cursor):
+        if not self.rows:
+            return 0
+        self.buffer.seek(0)
+        columns = ', '.join(f'"{column}"' for column in self.columns)
+        cursor.copy_expert(f'COPY "{self.table}" ({columns}) FROM STDIN', self.buffer)
+        rows, self.rows = self.rows, 0
+        self.buffer = io.StringIO()
+        return rows
+
+
+def get_uid(rng, moment):
+    """UUID no formato ULID (48 bits de timestamp em ms + 80 bits aleatórios), determinístico pelo rng."""
+    milliseconds = int(moment.timestamp() * 1000)
+    return uuid.UUID(int=(milliseconds << 80) | rng.getrandbits(80))
+
+
+def get_moment(day, rng):
+    return datetime.combine(day, time(), tzinfo=timezone.utc) + timedelta(seconds=rng.randrange(86400))
+
+
+def generate_events(cities, integration_uids, aliases, start, days, versions, seed, chunk_size):
+    """
+    Gera e grava (COPY) os eventos, dados contextuais e projeções das cidades da parte informada.
+    Executado nos processos do pool; cada cidade tem o seu próprio gerador, derivado da seed, de forma
+    que o resultado não depende da divisão em partes nem da quantidade de processos.
+    """
+    events = CopyBuffer(ContextualEvent, (
+        'uid', 'integration', 'event_type', 'event_date', 'location', 'city', 'latitude', 'longitude',
+        'geohash', 'category', 'extra_fields', 'match_key', 'created_at',
+    ))
+    data = CopyBuffer(ContextualData, (
+        'uid', 'event', 'integration', 'version', 'fetched_at', 'observed_at', 'extra_fields',
+    ))
+    observations = CopyBuffer(WeatherObservation, (
+        'contextual_data', 'observed_at', 'temperature', 'humidity', 'weather', 'country',
+    ))
+    totals = {'events': 0, 'data': 0}
+
+    def flush():
+        with transaction.atomic(), connection.cursor() as cursor:
+            totals['events'] += events.flush(cursor)
+            totals['data'] += data.flush(cursor)
+            observations.flush(cursor)
+
+    for city_index, name, latitude, longitude in cities:
+        rng = random.Random(f'{seed}:events:{city_index}')
+        integration_uid = integration_uids[city_index % len(integration_uids)]
+        geohash = get_event_geohash(latitude, longitude)
+        event_type = f'{name} - {CATEGORY}'
+        base_temperature = 30 - abs(latitude) * 0.5
+
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            created_at = get_moment(day, rng)
+            observation = None
+            for version in range(1, versions + 1):
+                observed_at = created_at + timedelta(hours=3 * (version - 1))
+                observation = {
+                    'temperature': round(base_temperature + rng.gauss(0, 4), 2),
+                    'humidity': rng.randint(20, 100),
+                    'weather': rng.choice(WEATHER_DESCRIPTIONS),
+                    'city': name,
+                    'country': 'BR',
+                    'timestamp': observed_at.replace(tzinfo=None).isoformat(),
+                    'latitude': latitude,
+                    'longitude': longitude,
+                }
+                if version == 1:
+                    event_uid = get_uid(rng, created_at)
+                data_uid = get_uid(rng, observed_at)
+                data_hash = '%064x' % rng.getrandbits(256)
+                # observed_at é o mesmo que get_observed_at extrai do 'timestamp' (UTC) na ingestão.
+                data.add(data_uid, event_uid, integration_uid, version, observed_at, observed_at,
+                         {**observation, 'data_hash': data_hash})
+                observations.add(data_uid, observed_at, observation['temperature'], observation['humidity'],
+                                 observation['weather'], 'BR')
+
+            events.add(event_uid, integration_uid, event_type, day, None, name, latitude, longitude, geohash,
+                       CATEGORY, observation, get_match_key(event_type, day, None, name, aliases), created_at)
+
+            if events.rows >= chunk_size:
+                flush()
+    flush()
+    connection.close()
+    return totals
+
+
+def generate_logs(integration_index, integration_uid, city, start, days, logs_per_day, seed, chunk_size):
+    """Gera e grava (COPY) os logs de importação de uma integração."""
+    rng = random.Random(f'{seed}:logs:{integration_index}')
+    logs = CopyBuffer(IntegrationLog, (
+        'uid', 'integration', 'success', 'error', 'message', 'method', 'records_imported', 'request_data',
+        'response_data', 'timestamp',
+    ))
+    total = 0
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        for _ in range(logs_per_day):
+            timestamp = get_moment(day, rng)
+            success = rng.random() >= 0.05
+            if success:
+                message, records = 'Previsão do clima obtida com sucesso.', rng.randint(1, 40)
+            else:
+                message, records = 'Erro ao buscar previsão do clima: 500 Server Error: Internal Server Error', 0
+            logs.add(get_uid(rng, timestamp), integration_uid, success, not success, message,
+                     IntegrationLog.MethodChoices.FETCH, records, {'q': city, 'lang': 'pt_br'}, {}, timestamp)
+            if logs.rows >= chunk_size:
+                with connection.cursor() as cursor:
+                    total += logs.flush(cursor)
+    with connection.cursor() as cursor:
+        total += logs.flush(cursor)
+    connection.close()
+    return {'logs': total}
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera dados sintéticos (eventos, dados contextuais, projeções e logs) para testes de escala, '
+        'gravando com COPY em processos paralelos. O resultado é determinístico para a mesma seed e forma. '
+        'Os rollups não são gerados: execute rebuild_contextual_rollups em seguida, se necessário.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--integrations', type=int, default=5, help='Quantidade de integrações.')
+        parser.add_argument('--cities', type=int, default=100, help='Quantidade de cidades.')
+        parser.add_argument('--days', type=int, default=365, help='Dias de histórico (um evento por cidade e dia).')
+        parser.add_argument('--versions', type=int, default=3, help='Versões de dados contextuais por evento.')
+        parser.add_argument('--logs-per-day', type=int, default=24, help='Logs de importação por integração e dia.')
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None,
+                            help='Último dia do histórico (AAAA-MM-DD). Padrão: hoje.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed dos dados gerados.')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Processos paralelos de gravação.')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Eventos gravados por COPY.')
+        parser.add_argument('--prefix', default='synthetic', help='Prefixo do identificador das integrações geradas.')
+        parser.add_argument('--clear', action='store_true',
+                            help='Remove antes os dados gerados anteriormente com o mesmo prefixo.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if options['clear']:
+            self.clear(prefix)
+        elif Integration.objects.filter(handle__startswith=f'{prefix}-').exists():
+            raise CommandError(f"Já existem integrações com o prefixo '{prefix}'; use --clear ou outro --prefix.")
+
+        rng = random.Random(f"{options['seed']}:shape")
+        end = options['end_date'] or date.today()
+        start = end - timedelta(days=options['days'] - 1)
+        cities = self.get_cities(options['cities'], rng)
+        integrations = self.create_integrations(prefix, options['integrations'], cities, rng)
+        integration_uids = [integration.uid for integration in integrations]
+        aliases = city_aliases.get_aliases()
+
+        workers = max(1, options['workers'])
+        parts_count = min(len(cities), workers * 4)
+        parts = [cities[index::parts_count] for index in range(parts_count)]
+
+        # Os processos filhos abrem as próprias conexões; a do processo pai não pode ser compartilhada.
+        connections.close_all()
+        totals = {'events': 0, 'data': 0, 'logs': 0}
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            futures = [
+                executor.submit(generate_events, part_cities, integration_uids, aliases, start, options['days'],
+                                options['versions'], options['seed'], options['chunk_size'])
+                for part_cities in parts
+            ]
+            futures += [
+                executor.submit(generate_logs, index, integration.uid, cities[index % len(cities)][1], start,
+                                options['days'], options['logs_per_day'], options['seed'], options['chunk_size'])
+                for index, integration in enumerate(integrations)
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                for key, value in future.result().items():
+                    totals[key] += value
+                self.stdout.write(f'{done}/{len(futures)} partes gravadas.')
+
+        with connection.cursor() as cursor:
+            for model in (ContextualEvent, ContextualData, WeatherObservation, IntegrationLog):
+                cursor.execute(f'ANALYZE "{model._meta.db_table}"')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(integrations)} integrações, {totals['events']} eventos, {totals['data']} dados contextuais "
+            f"e {totals['logs']} logs gerados ({start} a {end})."
+        ))
+
+    @staticmethod
+    def get_cities(count, rng):
+        """Retorna [(índice, nome, latitude, longitude)]: as capitais da base e, além delas, cidades sintéticas."""
+        cities = []
+        for index in range(count):
+            if index < len(BASE_CITIES):
+                name, latitude, longitude = BASE_CITIES[index]
+            else:
+                name = f'Cidade Sintética {index:05d}'
+                latitude, longitude = round(rng.uniform(-33, 5), 4), round(rng.uniform(-73, -35), 4)
+            cities.append((index, name, latitude, longitude))
+        return cities
+
+    @staticmethod
+    def create_integrations(prefix, count, cities, rng):
+        """Cria as integrações (inativas, para não serem importadas) e as suas credenciais."""
+        credentials = CredentialsEntity.objects.create(
+            uid=uuid.UUID(int=rng.getrandbits(128)),
+            name=f'{prefix} credenciais',
+            handle=f'{prefix}-credentials'[:32],
+            credentials_type_id=PROVIDER_ID,
+            credentials_type_data={'base_url': 'http://localhost/data/2.5'},
+            credentials_type_private_data={'api_key': 'synthetic-api-key'},
+        )
+        return Integration.objects.bulk_create([
+            Integration(
+                uid=uuid.UUID(int=rng.getrandbits(128)),
+                name=f'{prefix} {index}',
+                handle=f'{prefix}-{index}'[:32],
+                credentials=credentials,
+                provider_backend_id=PROVIDER_ID,
+                provider_backend_data={'city': cities[index % len(cities)][1], 'language': 'pt_br'},
+                is_active=False,
+            )
+            for index in range(count)
+        ])
+
+    def clear(self, prefix):
+        """
+        Remove as integrações do prefixo e todos os seus dados. As tabelas grandes são apagadas com
+        DELETE direto, sem carregar os registros em memória como faria o delete() do ORM.
+        """
+        integration_ids = list(Integration.objects.filter(handle__startswith=f'{prefix}-').values_list('pk', flat=True))
+        if not integration_ids:
+            return
+
+        tables = {model: model._meta.db_table for model in (
+            WeatherObservation, ContextualData, ContextualEvent, IntegrationLog)}
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM "{tables[WeatherObservation]}" WHERE contextual_data_id IN '
+                f'(SELECT uid FROM "{tables[ContextualData]}" WHERE integration_id = ANY(%s))',
+                [integration_ids],
+            )
+            cursor.execute(f'DELETE FROM "{tables[ContextualData]}" WHERE integration_id = ANY(%s)', [integration_ids])
+            cursor.execute(f'DELETE FROM "{tables[ContextualEvent]}" WHERE integration_id = ANY(%s)', [integration_ids])
+            cursor.execute(f'DELETE FROM "{tables[IntegrationLog]}" WHERE integration_id = ANY(%s)', [integration_ids])
+            for model in (ContextualDataRollup, ProfileSample, WebhookDelivery):
+                model.objects.filter(integration_id__in=integration_ids).delete()
+            Integration.objects.filter(pk__in=integration_ids).delete()
+            CredentialsEntity.objects.filter(handle__startswith=f'{prefix}-').delete()
+        self.stdout.write(f'{len(integration_ids)} integrações anteriores removidas.')
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from pydantic import ValidationError
+
+from integrations.models import ContextualData, Integration
+from integrations.registry import plugin_registry
+
+
+class Command(BaseCommand):
+    help = 'Materializa as projeções tipadas dos dados contextuais que ainda não possuem projeção.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Registros gravados por lote.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        provider_ids = Integration.objects.values_list('provider_backend_id', flat=True).distinct()
+
+        for provider_id in provider_ids:
+            provider_cls = plugin_registry.get_provider_backend(provider_id)
+            projection_model = provider_cls.get_projection_model() if provider_cls else None
+            if projection_model is None or provider_cls.normalized_schema is None:
+                continue
+
+            queryset = (
+                ContextualData.objects
+                .filter(integration__provider_backend_id=provider_id)
+                .exclude(pk__in=projection_model.objects.values('contextual_data'))
+                .order_by()
+                .only('uid', 'extra_fields')
+            )
+
+            created = skipped = 0
+            projections = []
+            for contextual_data in queryset.iterator(chunk_size=chunk_size):
+                try:
+                    normalized_data = provider_cls.normalized_schema.model_validate(contextual_data.extra_fields)
+                except ValidationError:
+                    skipped += 1
+                    continue
+                values = provider_cls.get_projection_values(normalized_data.model_dump())
+                projections.append(projection_model(contextual_data=contextual_data, **values))
+
+                if len(projections) >= chunk_size:
+                    created += len(projection_model.objects.bulk_create(projections, ignore_conflicts=True))
+                    projections = []
+
+            if projections:
+                created += len(projection_model.objects.bulk_create(projections, ignore_conflicts=True))
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{created} projeções criadas em {projection_model._meta.verbose_name_plural} ({provider_id}), '
+                f'{skipped} registros ignorados por não seguirem o schema normalizado.'))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from integrations.models import ContextualData, ContextualDataRollup
+from integrations.rollups import (
+    accumulate_rollups,
+    get_latest_observations,
+    get_observed_at,
+    lock_all_rollups,
+    upsert_rollups,
+)
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os agregados de dados contextuais a partir do histórico de ContextualData.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--integration', help='Handle da integração a recalcular (padrão: todas).')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Registros lidos por lote.')
+
+    def handle(self, *args, **options):
+        queryset = ContextualData.objects.select_related('event')
+        rollups = ContextualDataRollup.objects.all()
+        if options['integration']:
+            queryset = queryset.filter(integration__handle=options['integration'])
+            rollups = rollups.filter(integration__handle=options['integration'])
+
+        entries = (
+            (
+                contextual_data.integration_id,
+                contextual_data.event.city,
+                contextual_data.event.category,
+                contextual_data.observed_at or get_observed_at(contextual_data.extra_fields, contextual_data.fetched_at),
+                contextual_data.extra_fields,
+            )
+            # Apenas a última versão de cada observação (integrations.rollups).
+            for contextual_data in get_latest_observations(queryset).iterator(chunk_size=options['chunk_size'])
+        )
+
+        with transaction.atomic():
+            # Bloqueia a ingestão e os recálculos de grupos até o fim da reconstrução (integrations.rollups).
+            lock_all_rollups()
+            deleted, _ = rollups.delete()
+            accumulated = accumulate_rollups(entries)
+            created = upsert_rollups(accumulated)
+
+        self.stdout.write(self.style.SUCCESS(f'{deleted} agregados removidos, {created} agregados recalculados.'))
@@ -0,0 +1,149 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+
+from integrations.dedup import city_aliases, get_event_match_key
+from integrations.helpers import syncing_contextual_data
+from integrations.models import ContextualData, ContextualEvent
+
+TEMPORARY_VERSION_OFFSET = 1_000_000_000
+
+
+def get_parked_key(event) -> str:
+    """Chave provisória e única (não é um hash sha1) usada enquanto as chaves são trocadas."""
+    return f'~{event.pk.hex}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula a chave de deduplicação dos eventos contextuais e une os eventos que passam a ter '
+        'a mesma chave, movendo os dados contextuais para o evento mais antigo e renumerando as versões. '
+        'Deve ser executado após alterações na tabela de apelidos de cidades.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Eventos lidos e atualizados por lote.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas informa o que seria alterado.')
+
+    def handle(self, *args, **options):
+        changes = self.get_changes(options['chunk_size'])
+        if options['dry_run']:
+            merged = self.count_conflicts(changes, options['chunk_size'])
+            self.stdout.write(
+                f'{len(changes)} chaves de deduplicação seriam atualizadas e {merged} eventos seriam unidos '
+                f'(nada foi alterado).')
+            return
+
+        merged = self.apply_changes(changes, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(changes)} chaves de deduplicação atualizadas, {merged} eventos duplicados removidos.'))
+
+    @staticmethod
+    def get_changes(chunk_size):
+        """Eventos cuja chave mudou, com a nova chave: lista de (evento, nova chave)."""
+        aliases = city_aliases.get_aliases()
+        queryset = ContextualEvent.objects.only('pk', 'event_type', 'event_date', 'location', 'city', 'match_key')
+
+        changes = []
+        for event in queryset.order_by().iterator(chunk_size=chunk_size):
+            match_key = get_event_match_key(event, aliases)
+            if event.match_key != match_key:
+                changes.append((event, match_key))
+        return changes
+
+    @staticmethod
+    def count_conflicts(changes, chunk_size):
+        """Quantidade de eventos que seriam unidos (chave repetida entre as alteradas ou já ocupada)."""
+        changed_pks = {event.pk for event, _ in changes}
+        keys = Counter(match_key for _, match_key in changes)
+        conflicts = sum(total - 1 for total in keys.values())
+
+        unique_keys = list(keys)
+        for start in range(0, len(unique_keys), chunk_size):
+            holders = ContextualEvent.objects.filter(match_key__in=unique_keys[start:start + chunk_size])
+            conflicts += sum(1 for pk in holders.values_list('pk', flat=True) if pk not in changed_pks)
+        return conflicts
+
+    @classmethod
+    def apply_changes(cls, changes, chunk_size):
+        """
+        Grava as novas chaves em duas etapas, para respeitar o índice único de match_key: primeiro todos os
+        eventos alterados recebem uma chave provisória (liberando as chaves antigas, inclusive em trocas entre
+        eventos) e depois as novas chaves. Quando a nova chave já pertence a outro evento, os dois são unidos.
+        Retorna a quantidade de eventos removidos.
+        """
+        for start in range(0, len(changes), chunk_size):
+            events = []
+            for event, _ in changes[start:start + chunk_size]:
+                event.match_key = get_parked_key(event)
+                events.append(event)
+            ContextualEvent.objects.bulk_update(events, ['match_key'])
+
+        merged = 0
+        for start in range(0, len(changes), chunk_size):
+            chunk = changes[start:start + chunk_size]
+            try:
+                with transaction.atomic():
+                    for event, match_key in chunk:
+                        event.match_key = match_key
+                    ContextualEvent.objects.bulk_update([event for event, _ in chunk], ['match_key'])
+                continue
+            except IntegrityError:
+                pass
+
+            for event, match_key in chunk:
+                merged += cls.set_match_key(event, match_key)
+        return merged
+
+    @classmethod
+    def set_match_key(cls, event, match_key):
+        """Grava a chave do evento, unindo-o ao evento que já a ocupa. Retorna a quantidade de eventos removidos."""
+        with transaction.atomic():
+            holder = ContextualEvent.objects.select_for_update().filter(match_key=match_key).first()
+            if holder is None:
+                ContextualEvent.objects.filter(pk=event.pk).update(match_key=match_key)
+                return 0
+
+            events = [holder, event]
+            merged = cls.merge_events(events)
+            canonical = ContextualEvent.objects.filter(pk__in=[item.pk for item in events]).get()
+            if canonical.match_key != match_key:
+                ContextualEvent.objects.filter(pk=canonical.pk).update(match_key=match_key)
+            return merged
+
+    @staticmethod
+    def merge_events(events):
+        """
+        Une os eventos informados no mais antigo. As versões dos dados contextuais de cada
+        integração são renumeradas pela data de coleta (1..n). Os agregados afetados são recalculados.
+        """
+        # Os dados movidos podem mudar de grupo nos agregados (cidade e categoria do evento mais antigo).
+        pks = [event.pk for event in events]
+        with syncing_contextual_data(ContextualEvent.objects.filter(pk__in=pks), projections=False):
+            events = list(ContextualEvent.objects.select_for_update().filter(pk__in=pks).order_by('created_at'))
+            if len(events) < 2:
+                return 0
+
+            canonical, duplicates = events[0], events[1:]
+            contextual_data = list(
+                ContextualData.objects
+                .select_for_update()
+                .filter(event__in=events)
+                .order_by('integration_id', 'fetched_at', 'version')
+            )
+
+            # Primeiro move para versões temporárias, para não violar (event, integration, version) durante a troca.
+            for index, item in enumerate(contextual_data):
+                item.event = canonical
+                item.version = TEMPORARY_VERSION_OFFSET + index
+            ContextualData.objects.bulk_update(contextual_data, ['event', 'version'])
+
+            versions = {}
+            for item in contextual_data:
+                versions[item.integration_id] = versions.get(item.integration_id, 0) + 1
+                item.version = versions[item.integration_id]
+            ContextualData.objects.bulk_update(contextual_data, ['version'])
+
+            ContextualEvent.objects.filter(pk__in=[event.pk for event in duplicates]).delete()
+            return len(duplicates)
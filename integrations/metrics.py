@@ -0,0 +1,167 @@
+"""
+Métricas (formato Prometheus) das etapas da ingestão: requisições HTTP aos providers, normalização,
+persistência, retentativas e uso dos caches, com os labels provider e integration (handle).
+
+As medições são feitas por página, lote ou requisição (nunca por registro), para não pesar no
+caminho crítico. Com PROMETHEUS_MULTIPROC_DIR definido no ambiente antes da inicialização, cada
+processo (workers do Celery e do servidor web) grava as suas métricas nesse diretório e o endpoint
+/metrics agrega todas elas; o diretório deve ser compartilhado entre os processos e esvaziado ao
+iniciar o serviço.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LABELS = ('provider', 'integration')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+http_request_seconds = Histogram(
+    'hopen_ingest_http_request_seconds',
+    'Latência das requisições HTTP aos providers (até o recebimento dos headers).',
+    LABELS + ('status',),
+    buckets=LATENCY_BUCKETS,
+)
+http_response_bytes = Counter(
+    'hopen_ingest_http_response_bytes',
+    'Bytes recebidos dos providers.',
+    LABELS,
+)
+stage_seconds = Histogram(
+    'hopen_ingest_stage_seconds',
+    'Duração de cada etapa da ingestão (fetch, normalize e persist), por página ou lote.',
+    LABELS + ('stage',),
+    buckets=LATENCY_BUCKETS,
+)
+db_seconds = Counter(
+    'hopen_ingest_db_seconds',
+    'Tempo gasto em consultas SQL durante a persistência.',
+    LABELS,
+)
+records = Counter(
+    'hopen_ingest_records',
+    'Registros normalizados recebidos dos providers.',
+    LABELS,
+)
+skipped_records = Counter(
+    'hopen_ingest_skipped_records',
+    'Registros descartados na normalização (falha no mapeamento ou na validação).',
+    LABELS,
+)
+rows_written = Counter(
+    'hopen_ingest_rows_written',
+    'Registros persistidos.',
+    LABELS,
+)
+failed_batches = Counter(
+    'hopen_ingest_failed_batches',
+    'Lotes cuja persistência falhou.',
+    LABELS,
+)
+retries = Counter(
+    'hopen_ingest_retries',
+    'Retentativas agendadas da importação.',
+    LABELS,
+)
+cache_requests = Counter(
+    'hopen_cache_requests',
+    'Consultas aos caches internos, por resultado (hit ou miss).',
+    ('cache', 'result'),
+)
+
+
+def get_labels(provider_backend):
+    """Retorna os valores dos labels (provider, integration) de um provider."""
+    integration = getattr(provider_backend, 'integration', None)
+    return provider_backend.id, getattr(integration, 'handle', None) or ''
+
+
+@contextmanager
+def time_stage(labels, stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.labels(*labels, stage).observe(time.perf_counter() - started)
+
+
+def time_iter(iterable, labels, stage):
+    """Gera os itens do iterável, registrando o tempo de obtenção de cada um como a etapa informada."""
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        stage_seconds.labels(*labels, stage).observe(time.perf_counter() - started)
+        yield item
+
+
+class QueryTimer:
+    """execute_wrapper que soma o tempo das consultas SQL executadas."""
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+
+
+@contextmanager
+def time_queries(labels):
+    """Mede o tempo das consultas SQL da conexão atual executadas no bloco."""
+    timer = QueryTimer()
+    try:
+        with connection.execute_wrapper(timer):
+            yield timer
+    finally:
+        db_seconds.labels(*labels).inc(timer.elapsed)
+
+
+def observe_response(provider_backend, response, size=None):
+    """
+    Registra a latência e o tamanho de uma resposta HTTP do provider.
+    Em respostas lidas em streaming, informe em size os bytes lidos (ver providers.http.ByteCounter).
+    """
+    labels = get_labels(provider_backend)
+    http_request_seconds.labels(*labels, response.status_code).observe(response.elapsed.total_seconds())
+    http_response_bytes.labels(*labels).inc(len(response.content or b'') if size is None else size)
+
+
+def observe_cache(cache, hit):
+    cache_requests.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def get_registry():
+    """Registry a ser exposto: o agregado dos processos em modo multiprocess ou o do processo atual."""
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics():
+    """Retorna (conteúdo, content type) no formato de exposição do Prometheus."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Remove os arquivos de métricas de um processo encerrado (modo multiprocess)."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,28 @@
+from integrations.profiling import SamplingProfiler, is_profiling_requested, save_request_profile
+
+
+class ProfilingMiddleware:
+    """
+    Gera o profile de uma requisição quando PROFILING_ENABLED está ativo e ela traz o header
+    PROFILING_HEADER (padrão X-Profile), apenas para administradores (is_staff), de modo que outros
+    clientes não consigam impor o custo da amostragem. O id do ProfileSample gravado é retornado no
+    header X-Profile-Id.
+
+    Aqui são perfilados os administradores autenticados por sessão (request.user). Os autenticados
+    pela própria API (chave de API, JWT etc.) só são conhecidos após a autenticação do DRF: o profile
+    é iniciado pela view (integrations.api.views.RequestProfilingMixin), sem autenticá-los duas vezes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_profiling_requested(request) or not request.user.is_staff:
+            return self.get_response(request)
+
+        profiler = request.profiler = SamplingProfiler().start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        return save_request_profile(profiler, request, response)
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:17
+
+import django.db.models.deletion
+import integrations.utils
+from django.db import migrations, models
+
+
+def generate_webhook_tokens(apps, schema_editor):
+    Integration = apps.get_model('integrations', 'Integration')
+    for integration in Integration.objects.all():
+        integration.webhook_token = integrations.utils.get_token()
+        integration.save(update_fields=['webhook_token'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='integration',
+            name='webhook_token',
+            field=models.CharField(default=integrations.utils.get_token, editable=False, help_text='Token enviado no header X-Webhook-Token pelos sistemas que publicam eventos para a integração.', max_length=64, verbose_name='Token do Webhook'),
+        ),
+        migrations.RunPython(generate_webhook_tokens, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('uid', models.UUIDField(default=integrations.utils.get_uuid, editable=False, primary_key=True, serialize=False)),
+                ('event', models.CharField(max_length=100, verbose_name='Evento')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Payload')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Recebido em')),
+                ('integration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhook_deliveries', to='integrations.integration', verbose_name='Integração')),
+            ],
+            options={
+                'verbose_name': 'Entrega de Webhook',
+                'verbose_name_plural': 'Entregas de Webhook',
+                'ordering': ['received_at'],
+            },
+        ),
+    ]
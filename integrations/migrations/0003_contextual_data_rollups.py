@@ -0,0 +1,39 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:18
+
+import django.db.models.deletion
+import integrations.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0002_webhook_ingestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContextualDataRollup',
+            fields=[
+                ('uid', models.UUIDField(default=integrations.utils.get_uuid, editable=False, primary_key=True, serialize=False)),
+                ('city', models.CharField(blank=True, default='', max_length=255, verbose_name='Cidade')),
+                ('category', models.CharField(blank=True, default='', max_length=100, verbose_name='Categoria')),
+                ('granularity', models.CharField(choices=[('hour', 'Hora'), ('day', 'Dia')], max_length=10, verbose_name='Granularidade')),
+                ('bucket', models.DateTimeField(verbose_name='Início do Intervalo')),
+                ('metric', models.CharField(max_length=100, verbose_name='Métrica')),
+                ('count', models.PositiveBigIntegerField(default=0, verbose_name='Quantidade')),
+                ('total', models.FloatField(default=0, verbose_name='Soma')),
+                ('minimum', models.FloatField(blank=True, null=True, verbose_name='Mínimo')),
+                ('maximum', models.FloatField(blank=True, null=True, verbose_name='Máximo')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('integration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='integrations.integration', verbose_name='Integração')),
+            ],
+            options={
+                'verbose_name': 'Agregado de Dados Contextuais',
+                'verbose_name_plural': 'Agregados de Dados Contextuais',
+                'ordering': ['-bucket'],
+                'indexes': [models.Index(fields=['city', 'category', 'granularity', 'metric', 'bucket'], name='integration_city_9cc4be_idx')],
+                'constraints': [models.UniqueConstraint(fields=('integration', 'city', 'category', 'granularity', 'metric', 'bucket'), name='unique_contextual_data_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0003_contextual_data_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherObservation',
+            fields=[
+                ('contextual_data', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='weather_observation', serialize=False, to='integrations.contextualdata', verbose_name='Dado Contextual')),
+                ('observed_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Observado em')),
+                ('temperature', models.FloatField(blank=True, db_index=True, null=True, verbose_name='Temperatura')),
+                ('humidity', models.IntegerField(blank=True, db_index=True, null=True, verbose_name='Umidade')),
+                ('weather', models.CharField(blank=True, max_length=255, null=True, verbose_name='Condição do Tempo')),
+                ('country', models.CharField(blank=True, max_length=8, null=True, verbose_name='País')),
+            ],
+            options={
+                'verbose_name': 'Observação Meteorológica',
+                'verbose_name_plural': 'Observações Meteorológicas',
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:21
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Índices criados com CREATE INDEX CONCURRENTLY, sem bloquear as gravações nas tabelas.
+    atomic = False
+
+    dependencies = [
+        ('integrations', '0004_weather_observation_projection'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='contextualdata',
+            index=models.Index(fields=['-fetched_at'], name='integration_fetched_d961c4_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contextualdata',
+            index=models.Index(fields=['integration', '-fetched_at'], name='integration_integra_452522_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contextualdata',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['extra_fields'], name='contextual_data_extra_gin', opclasses=['jsonb_path_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='contextualdatarollup',
+            index=models.Index(fields=['-bucket'], name='integration_bucket_6e4c5c_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contextualevent',
+            index=models.Index(fields=['event_type', 'event_date'], name='integration_event_t_102426_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contextualevent',
+            index=models.Index(fields=['city', 'event_date'], name='integration_city_05026b_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contextualevent',
+            index=models.Index(fields=['category', 'event_date'], name='integration_categor_c25cec_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contextualevent',
+            index=models.Index(fields=['location'], name='integration_locatio_c288fd_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contextualevent',
+            index=models.Index(fields=['-created_at'], name='integration_created_e7ba3d_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contextualevent',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['extra_fields'], name='contextual_event_extra_gin', opclasses=['jsonb_path_ops']),
+        ),
+    ]
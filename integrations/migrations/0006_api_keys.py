@@ -0,0 +1,35 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:22
+
+import django.db.models.deletion
+import integrations.utils
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0005_indexed_rql_filters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIKey',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('uid', models.UUIDField(default=integrations.utils.get_uuid, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, verbose_name='Nome')),
+                ('prefix', models.CharField(editable=False, max_length=16, unique=True, verbose_name='Prefixo')),
+                ('hashed_key', models.CharField(editable=False, max_length=64, unique=True, verbose_name='Hash da Chave')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Ativo?')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Expira em')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_keys', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Chave de API',
+                'verbose_name_plural': 'Chaves de API',
+            },
+        ),
+    ]
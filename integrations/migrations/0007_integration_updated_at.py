@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0006_api_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='integration',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Atualizado em'),
+        ),
+    ]
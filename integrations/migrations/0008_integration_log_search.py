@@ -0,0 +1,27 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:28
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Índices criados com CREATE INDEX CONCURRENTLY, sem reescrever nem bloquear a tabela de logs.
+    atomic = False
+
+    dependencies = [
+        ('integrations', '0007_integration_updated_at'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='integrationlog',
+            index=models.Index(fields=['-timestamp'], name='integration_timesta_6bc854_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='integrationlog',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector(django.db.models.functions.text.Left('message', 100000), config='simple'), name='integration_log_search_gin'),
+        ),
+    ]
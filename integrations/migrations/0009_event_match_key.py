@@ -0,0 +1,81 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:35
+
+import hashlib
+import re
+import unicodedata
+from datetime import timedelta
+
+import integrations.utils
+from django.conf import settings
+from django.db import migrations, models
+
+# Cópia de integrations.dedup (normalize_text, get_date_bucket e get_match_key) na data desta migração.
+NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+MATCH_KEY_SEPARATOR = '\x1f'
+
+
+def normalize_text(value):
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', str(value))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return NON_ALPHANUMERIC.sub(' ', value.casefold()).strip()
+
+
+def get_date_bucket(event_date):
+    if event_date is None:
+        return ''
+    granularity = settings.EVENT_DEDUP_DATE_BUCKET
+    if granularity == 'week':
+        event_date = event_date - timedelta(days=event_date.weekday())
+    elif granularity == 'month':
+        event_date = event_date.replace(day=1)
+    return event_date.isoformat()
+
+
+def get_match_key(event_type, event_date, location=None, city=None):
+    # Na criação da tabela de apelidos não há apelidos: a cidade canônica é a própria cidade normalizada.
+    raw = MATCH_KEY_SEPARATOR.join(
+        (normalize_text(event_type), normalize_text(city), normalize_text(location), get_date_bucket(event_date)))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def populate_match_keys(apps, schema_editor):
+    ContextualEvent = apps.get_model('integrations', 'ContextualEvent')
+    batch = []
+    for event in ContextualEvent.objects.order_by().iterator(chunk_size=2000):
+        event.match_key = get_match_key(event.event_type, event.event_date, event.location, event.city)
+        batch.append(event)
+        if len(batch) >= 2000:
+            ContextualEvent.objects.bulk_update(batch, ['match_key'])
+            batch = []
+    if batch:
+        ContextualEvent.objects.bulk_update(batch, ['match_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0008_integration_log_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CityAlias',
+            fields=[
+                ('uid', models.UUIDField(default=integrations.utils.get_uuid, editable=False, primary_key=True, serialize=False)),
+                ('alias', models.CharField(max_length=255, unique=True, verbose_name='Apelido')),
+                ('city', models.CharField(max_length=255, verbose_name='Cidade Canônica')),
+            ],
+            options={
+                'verbose_name': 'Apelido de Cidade',
+                'verbose_name_plural': 'Apelidos de Cidades',
+            },
+        ),
+        migrations.AddField(
+            model_name='contextualevent',
+            name='match_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text='Hash do tipo, cidade canônica, localização e intervalo da data (ver integrations.dedup).', max_length=40, verbose_name='Chave de Deduplicação'),
+        ),
+        migrations.RunPython(populate_match_keys, migrations.RunPython.noop),
+    ]
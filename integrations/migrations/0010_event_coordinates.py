@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:37
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0009_event_match_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contextualevent',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Célula geográfica das coordenadas, usada nas consultas por proximidade (ver integrations.geo).', max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AddField(
+            model_name='contextualevent',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='Latitude'),
+        ),
+        migrations.AddField(
+            model_name='contextualevent',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='Longitude'),
+        ),
+        migrations.AddIndex(
+            model_name='contextualevent',
+            index=models.Index(fields=['geohash'], name='contextual_event_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:45
+
+import django.db.models.deletion
+import integrations.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0010_event_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='integration',
+            name='enable_profiling',
+            field=models.BooleanField(default=False, help_text='Grava um profile por amostragem de cada execução da importação (disponível em Perfis de Execução).', verbose_name='Habilitar Profiling'),
+        ),
+        migrations.CreateModel(
+            name='ProfileSample',
+            fields=[
+                ('uid', models.UUIDField(default=integrations.utils.get_uuid, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('task', 'Importação'), ('request', 'Requisição')], max_length=16, verbose_name='Tipo')),
+                ('name', models.CharField(max_length=255, verbose_name='Nome')),
+                ('task_id', models.CharField(blank=True, db_index=True, default='', max_length=255, verbose_name='ID da Task')),
+                ('duration', models.FloatField(default=0, verbose_name='Duração (s)')),
+                ('samples', models.PositiveIntegerField(default=0, verbose_name='Amostras')),
+                ('interval', models.FloatField(default=0, verbose_name='Intervalo (s)')),
+                ('data', models.BinaryField(verbose_name='Pilhas (folded, gzip)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('integration', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='profiles', to='integrations.integration', verbose_name='Integração')),
+            ],
+            options={
+                'verbose_name': 'Perfil de Execução',
+                'verbose_name_plural': 'Perfis de Execução',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
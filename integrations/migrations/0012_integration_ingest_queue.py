@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0011_profile_samples'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='integration',
+            name='ingest_queue',
+            field=models.CharField(blank=True, default='', help_text='Fila do Celery em que a importação é executada. Vazio: shard definido por hash consistente do uid.', max_length=100, verbose_name='Fila da Importação'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0012_integration_ingest_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestLease',
+            fields=[
+                ('integration', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ingest_lease', serialize=False, to='integrations.integration', verbose_name='Integração')),
+                ('owner', models.CharField(max_length=255, verbose_name='Dono')),
+                ('acquired_at', models.DateTimeField(verbose_name='Adquirido em')),
+                ('expires_at', models.DateTimeField(verbose_name='Expira em')),
+            ],
+            options={
+                'verbose_name': 'Lease da Importação',
+                'verbose_name_plural': 'Leases da Importação',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.2 on 2026-10-19 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0013_ingest_leases'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Tentativas'),
+        ),
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Falhou em'),
+        ),
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='last_error',
+            field=models.TextField(blank=True, default='', verbose_name='Último Erro'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.2 on 2026-10-19 05:10
+
+from datetime import datetime, timezone
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+BATCH_SIZE = 5000
+
+
+def get_observed_at(data, default):
+    # Cópia de integrations.utils.get_observed_at na data desta migração.
+    value = data.get('timestamp') if isinstance(data, dict) else None
+    if isinstance(value, str):
+        try:
+            value = parse_datetime(value)
+        except ValueError:
+            return default
+    if not isinstance(value, datetime):
+        return default
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def fill_observed_at(apps, schema_editor):
+    """Preenche observed_at em lotes (cada lote em sua própria transação)."""
+    ContextualData = apps.get_model('integrations', 'ContextualData')
+    now = datetime.now(timezone.utc)
+    while True:
+        batch = list(
+            ContextualData.objects
+            .filter(observed_at__isnull=True)
+            .order_by('pk')
+            .only('pk', 'extra_fields', 'fetched_at')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for contextual_data in batch:
+            contextual_data.observed_at = get_observed_at(contextual_data.extra_fields, contextual_data.fetched_at or now)
+        ContextualData.objects.bulk_update(batch, ['observed_at'])
+
+
+class Migration(migrations.Migration):
+    # Sem transação: o preenchimento é feito em lotes e o índice é criado com CREATE INDEX CONCURRENTLY.
+    atomic = False
+
+    dependencies = [
+        ('integrations', '0014_webhook_delivery_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contextualdata',
+            name='observed_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Instante da observação (campo timestamp dos dados ou a data de coleta), usado nos agregados.', null=True, verbose_name='Observado em'),
+        ),
+        migrations.RunPython(fill_observed_at, migrations.RunPython.noop, elidable=True),
+        AddIndexConcurrently(
+            model_name='contextualdata',
+            index=models.Index(fields=['integration', 'observed_at'], name='contextual_data_observed_idx'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.2 on 2026-10-19 05:18
+
+from django.db import migrations, models, transaction
+from django.db.models import Count
+
+TEMPORARY_VERSION_OFFSET = 1_000_000_000
+
+
+def merge_duplicate_events(apps, schema_editor):
+    """
+    Une os eventos com a mesma chave de deduplicação no mais antigo (cópia da lógica de
+    relink_contextual_events na data desta migração), antes da criação do índice único.
+    Cada grupo é unido em sua própria transação.
+    """
+    ContextualEvent = apps.get_model('integrations', 'ContextualEvent')
+    ContextualData = apps.get_model('integrations', 'ContextualData')
+    using = schema_editor.connection.alias
+
+    duplicated_keys = list(
+        ContextualEvent.objects.using(using)
+        .order_by()
+        .values('match_key')
+        .annotate(total=Count('pk'))
+        .filter(total__gt=1)
+        .values_list('match_key', flat=True)
+    )
+    merged = 0
+    for match_key in duplicated_keys:
+        with transaction.atomic(using=using):
+            events = list(
+                ContextualEvent.objects.using(using).select_for_update()
+                .filter(match_key=match_key).order_by('created_at')
+            )
+            canonical, duplicates = events[0], events[1:]
+            contextual_data = list(
+                ContextualData.objects.using(using).select_for_update()
+                .filter(event__in=events).order_by('integration_id', 'fetched_at', 'version')
+            )
+            for index, item in enumerate(contextual_data):
+                item.event = canonical
+                item.version = TEMPORARY_VERSION_OFFSET + index
+            ContextualData.objects.using(using).bulk_update(contextual_data, ['event', 'version'])
+
+            versions = {}
+            for item in contextual_data:
+                versions[item.integration_id] = versions.get(item.integration_id, 0) + 1
+                item.version = versions[item.integration_id]
+            ContextualData.objects.using(using).bulk_update(contextual_data, ['version'])
+
+            ContextualEvent.objects.using(using).filter(pk__in=[event.pk for event in duplicates]).delete()
+            merged += len(duplicates)
+
+    if merged:
+        print(f'\n  {merged} eventos duplicados unidos; execute rebuild_contextual_rollups para recalcular os agregados.')
+
+
+class Migration(migrations.Migration):
+    # Sem transação: os duplicados são unidos grupo a grupo e o índice único é criado com
+    # CREATE UNIQUE INDEX CONCURRENTLY, antes de remover o índice simples de match_key.
+    atomic = False
+
+    dependencies = [
+        ('integrations', '0015_contextual_data_observed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_events, migrations.RunPython.noop, elidable=True),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "contextual_event_match_key_uniq" '
+                    'ON "integrations_contextualevent" ("match_key")',
+                    'DROP INDEX CONCURRENTLY IF EXISTS "contextual_event_match_key_uniq"',
+                ),
+                migrations.RunSQL(
+                    'ALTER TABLE "integrations_contextualevent" ADD CONSTRAINT "contextual_event_match_key_uniq" '
+                    'UNIQUE USING INDEX "contextual_event_match_key_uniq"',
+                    'ALTER TABLE "integrations_contextualevent" DROP CONSTRAINT "contextual_event_match_key_uniq"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='contextualevent',
+                    constraint=models.UniqueConstraint(fields=('match_key',), name='contextual_event_match_key_uniq'),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='contextualevent',
+            name='match_key',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Hash do tipo, cidade canônica, localização e intervalo da data (ver integrations.dedup).', max_length=40, verbose_name='Chave de Deduplicação'),
+        ),
+    ]
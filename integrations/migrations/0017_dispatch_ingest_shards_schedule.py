@@ -0,0 +1,74 @@
+# Generated by Django 5.2.2 on 2026-10-19 06:10
+
+import json
+
+from django.db import migrations
+from django.utils import timezone
+
+FETCH_TASK = 'integrations.tasks.fetch_all_active_integrations'
+DISPATCH_TASK = 'integrations.tasks.dispatch_ingest_shards'
+
+
+def is_unsharded(periodic_task):
+    """Agendamento da importação de todas as integrações (sem o kwarg `queue` de um shard)."""
+    try:
+        kwargs = json.loads(periodic_task.kwargs or '{}')
+    except ValueError:
+        return False
+    return not (isinstance(kwargs, dict) and kwargs.get('queue'))
+
+
+def mark_schedule_changed(apps, using):
+    """Sinaliza ao DatabaseScheduler que os agendamentos mudaram (os sinais não rodam nas migrações)."""
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+    PeriodicTasks.objects.using(using).update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+def replace_fetch_schedule(apps, schema_editor):
+    """
+    Troca os agendamentos de fetch_all_active_integrations (sem shard) por dispatch_ingest_shards, mantendo
+    o intervalo configurado; se dispatch_ingest_shards já estiver agendada, os antigos são apenas desativados.
+    Sem isso, o agendamento antigo e o novo importariam as mesmas integrações após o deploy.
+    """
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    using = schema_editor.connection.alias
+
+    periodic_tasks = [
+        periodic_task
+        for periodic_task in PeriodicTask.objects.using(using).filter(task=FETCH_TASK, enabled=True)
+        if is_unsharded(periodic_task)
+    ]
+    if not periodic_tasks:
+        return
+
+    dispatch_scheduled = PeriodicTask.objects.using(using).filter(task=DISPATCH_TASK, enabled=True).exists()
+    for periodic_task in periodic_tasks:
+        if dispatch_scheduled:
+            periodic_task.enabled = False
+        else:
+            periodic_task.task = DISPATCH_TASK
+            periodic_task.args = '[]'
+            periodic_task.kwargs = '{}'
+            dispatch_scheduled = True
+        periodic_task.save()
+    mark_schedule_changed(apps, using)
+    print(f'\n  {len(periodic_tasks)} agendamentos de {FETCH_TASK} substituídos por {DISPATCH_TASK}.')
+
+
+def restore_fetch_schedule(apps, schema_editor):
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    using = schema_editor.connection.alias
+    if PeriodicTask.objects.using(using).filter(task=DISPATCH_TASK).update(task=FETCH_TASK):
+        mark_schedule_changed(apps, using)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+        ('integrations', '0016_unique_event_match_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(replace_fetch_schedule, restore_fetch_schedule),
+    ]
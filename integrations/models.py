@@ -1,8 +1,22 @@
+import gzip
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Left
+from django.utils import timezone
 
 from core.models import BaseModel
+from .caching import validated_objects
+from .dedup import get_event_match_key, normalize_text
+from .geo import get_event_geohash
 from .registry import plugin_registry
-from .utils import get_uuid
+from .utils import get_observed_at, get_uuid, get_token
 
 
 class CredentialsEntity(BaseModel):
@@ -51,6 +65,7 @@ class CredentialsEntity(BaseModel):
 
     def save(self, *args, **kwargs):
         self.clean()
+        validated_objects.clear_instance(self)
         super().save(*args, **kwargs)
 
 
@@ -68,6 +83,18 @@ class Integration(models.Model):
         verbose_name="Habilitar Logging",
         help_text="Habilita o registro de logs para depuração."
     )
+    enable_profiling = models.BooleanField(
+        default=False,
+        verbose_name="Habilitar Profiling",
+        help_text="Grava um profile por amostragem de cada execução da importação (disponível em Perfis de Execução)."
+    )
+    ingest_queue = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name="Fila da Importação",
+        help_text="Fila do Celery em que a importação é executada. Vazio: shard definido por hash consistente do uid."
+    )
     provider_backend_id = models.CharField(max_length=32, verbose_name='ID do Provedor Backend')
     provider_backend_data = models.JSONField(default=dict, verbose_name='Dados do Backend do Provedor')
     credentials = models.ForeignKey(
@@ -78,10 +105,22 @@ class Integration(models.Model):
         related_name='integrations'
     )
     is_active = models.BooleanField(default=False, verbose_name='Ativo?')
+    webhook_token = models.CharField(
+        max_length=64,
+        default=get_token,
+        editable=False,
+        verbose_name='Token do Webhook',
+        help_text="Token enviado no header X-Webhook-Token pelos sistemas que publicam eventos para a integração."
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
 
     def __str__(self):
         return self.name or self.handle
 
+    def save(self, *args, **kwargs):
+        validated_objects.clear_instance(self)
+        super().save(*args, **kwargs)
+
 
 class ContextualEvent(models.Model):
     """
@@ -102,13 +141,87 @@ class ContextualEvent(models.Model):
     event_date = models.DateField(null=True, blank=True, verbose_name='Data do Evento')
     location = models.CharField(max_length=255, null=True, blank=True, verbose_name='Localização do Evento')
     city = models.CharField(max_length=255, null=True, blank=True, verbose_name='Cidade do Evento')
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+        verbose_name='Latitude'
+    )
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+        verbose_name='Longitude'
+    )
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Geohash',
+        help_text='Célula geográfica das coordenadas, usada nas consultas por proximidade (ver integrations.geo).'
+    )
     category = models.CharField(max_length=100, null=True, blank=True, verbose_name='Categoria do Evento')
     extra_fields = models.JSONField(default=dict, blank=True, verbose_name='Atributos do Evento')
+    match_key = models.CharField(
+        max_length=40,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Chave de Deduplicação',
+        help_text='Hash do tipo, cidade canônica, localização e intervalo da data (ver integrations.dedup).'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['event_type', 'event_date']),
+            models.Index(fields=['city', 'event_date']),
+            models.Index(fields=['category', 'event_date']),
+            models.Index(fields=['location']),
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['geohash'], opclasses=['varchar_pattern_ops'], name='contextual_event_geohash_idx'),
+            GinIndex(fields=['extra_fields'], opclasses=['jsonb_path_ops'], name='contextual_event_extra_gin'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['match_key'], name='contextual_event_match_key_uniq'),
+        ]
+
     def __str__(self):
         return f"{self.event_type} - {self.event_date or ''} ({self.uid})"
 
+    def clean(self):
+        super().clean()
+        match_key = get_event_match_key(self)
+        if ContextualEvent.objects.filter(match_key=match_key).exclude(pk=self.pk).exists():
+            raise ValidationError('Já existe um evento com o mesmo tipo, cidade, localização e data.')
+
+    def save(self, *args, **kwargs):
+        self.match_key = get_event_match_key(self)
+        self.geohash = get_event_geohash(self.latitude, self.longitude)
+        super().save(*args, **kwargs)
+
+
+class CityAlias(models.Model):
+    """
+    Apelido ou grafia alternativa de uma cidade (ex.: "SP", "Sampa" -> "São Paulo"),
+    usado na deduplicação de eventos contextuais.
+    """
+    uid = models.UUIDField(primary_key=True, default=get_uuid, editable=False)
+    alias = models.CharField(max_length=255, unique=True, verbose_name='Apelido')
+    city = models.CharField(max_length=255, verbose_name='Cidade Canônica')
+
+    class Meta:
+        verbose_name = 'Apelido de Cidade'
+        verbose_name_plural = 'Apelidos de Cidades'
+
+    def __str__(self):
+        return f"{self.alias} -> {self.city}"
+
+    def save(self, *args, **kwargs):
+        self.alias = normalize_text(self.alias)
+        super().save(*args, **kwargs)
+
 
 class ContextualData(models.Model):
     """
@@ -122,15 +235,116 @@ class ContextualData(models.Model):
     integration = models.ForeignKey('Integration', on_delete=models.CASCADE, related_name='contextual_data')
     version = models.PositiveIntegerField(default=1, verbose_name='Versão')
     fetched_at = models.DateTimeField(auto_now_add=True, verbose_name='Data de Coleta')
+    observed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Observado em',
+        help_text='Instante da observação (campo timestamp dos dados ou a data de coleta), usado nos agregados.'
+    )
     extra_fields = models.JSONField(default=dict, blank=True, verbose_name='Dados Contextuais')
 
     class Meta:
         unique_together = ('event', 'integration', 'version')
         ordering = ['-fetched_at']
+        indexes = [
+            models.Index(fields=['-fetched_at']),
+            models.Index(fields=['integration', '-fetched_at']),
+            models.Index(fields=['integration', 'observed_at'], name='contextual_data_observed_idx'),
+            GinIndex(fields=['extra_fields'], opclasses=['jsonb_path_ops'], name='contextual_data_extra_gin'),
+        ]
 
     def __str__(self):
         return f"Data v{self.version} - {self.integration.name} para evento {self.event.uid}"
 
+    def save(self, *args, **kwargs):
+        self.observed_at = get_observed_at(self.extra_fields or {}, self.fetched_at or timezone.now())
+        super().save(*args, **kwargs)
+
+
+class WeatherObservation(models.Model):
+    """
+    Projeção tipada dos dados contextuais da categoria 'weather'.
+    Materializada na ingestão a partir do schema normalizado do provider, permite filtrar e
+    ordenar por temperatura, umidade e data de observação usando índices, sem consultar o JSON.
+    """
+    contextual_data = models.OneToOneField(
+        ContextualData,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='weather_observation',
+        verbose_name='Dado Contextual'
+    )
+    observed_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='Observado em')
+    temperature = models.FloatField(null=True, blank=True, db_index=True, verbose_name='Temperatura')
+    humidity = models.IntegerField(null=True, blank=True, db_index=True, verbose_name='Umidade')
+    weather = models.CharField(max_length=255, null=True, blank=True, verbose_name='Condição do Tempo')
+    country = models.CharField(max_length=8, null=True, blank=True, verbose_name='País')
+
+    class Meta:
+        verbose_name = 'Observação Meteorológica'
+        verbose_name_plural = 'Observações Meteorológicas'
+
+    def __str__(self):
+        return f"{self.temperature} / {self.humidity} em {self.observed_at}"
+
+
+class ContextualDataRollup(models.Model):
+    """
+    Agregado incremental (contagem, soma, mínimo e máximo) de uma métrica numérica dos dados contextuais,
+    por integração, cidade, categoria e intervalo de tempo (hora ou dia).
+    É atualizado a cada ingestão, permitindo consultas analíticas sem varrer ContextualData.
+    """
+
+    class GranularityChoices(models.TextChoices):
+        HOUR = 'hour', 'Hora'
+        DAY = 'day', 'Dia'
+
+    uid = models.UUIDField(primary_key=True, default=get_uuid, editable=False)
+    integration = models.ForeignKey(
+        Integration,
+        on_delete=models.CASCADE,
+        related_name='rollups',
+        verbose_name='Integração'
+    )
+    city = models.CharField(max_length=255, blank=True, default='', verbose_name='Cidade')
+    category = models.CharField(max_length=100, blank=True, default='', verbose_name='Categoria')
+    granularity = models.CharField(max_length=10, choices=GranularityChoices.choices, verbose_name='Granularidade')
+    bucket = models.DateTimeField(verbose_name='Início do Intervalo')
+    metric = models.CharField(max_length=100, verbose_name='Métrica')
+    count = models.PositiveBigIntegerField(default=0, verbose_name='Quantidade')
+    total = models.FloatField(default=0, verbose_name='Soma')
+    minimum = models.FloatField(null=True, blank=True, verbose_name='Mínimo')
+    maximum = models.FloatField(null=True, blank=True, verbose_name='Máximo')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        ordering = ['-bucket']
+        verbose_name = 'Agregado de Dados Contextuais'
+        verbose_name_plural = 'Agregados de Dados Contextuais'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['integration', 'city', 'category', 'granularity', 'metric', 'bucket'],
+                name='unique_contextual_data_rollup',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['city', 'category', 'granularity', 'metric', 'bucket']),
+            models.Index(fields=['-bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} - {self.city} ({self.get_granularity_display()} {self.bucket})"
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+
+# Expressão do índice de busca textual dos logs: apenas o início da mensagem, já que to_tsvector falha
+# acima de 1 MB. As consultas devem usar a mesma expressão para aproveitar o índice.
+LOG_SEARCH_VECTOR = SearchVector(Left('message', 100000), config='simple')
+
 
 class IntegrationLog(models.Model):
     class MethodChoices(models.TextChoices):
@@ -159,6 +373,147 @@ class IntegrationLog(models.Model):
     response_data = models.JSONField(default=dict, blank=True, verbose_name='Dados da Resposta')
     timestamp = models.DateTimeField(auto_now_add=True, verbose_name='Data e Hora')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-timestamp']),
+            GinIndex(LOG_SEARCH_VECTOR, name='integration_log_search_gin'),
+        ]
+
     def __str__(self):
         status = "Sucesso" if self.success else "Erro"
         return f"{self.integration.name} - {status} em {self.timestamp}"
+
+
+class WebhookDelivery(models.Model):
+    """
+    Payload recebido pelo webhook de uma integração, aguardando processamento assíncrono.
+    As entregas são consumidas em lote pela task consume_webhook_deliveries e removidas após o processamento.
+    Entregas que falham são mantidas com o número de tentativas e o último erro; ao atingir
+    WEBHOOK_MAX_ATTEMPTS são marcadas como falhas (failed_at) e deixam de ser consumidas.
+    """
+    uid = models.UUIDField(primary_key=True, default=get_uuid, editable=False)
+    integration = models.ForeignKey(
+        Integration,
+        on_delete=models.CASCADE,
+        related_name='webhook_deliveries',
+        verbose_name='Integração'
+    )
+    event = models.CharField(max_length=100, verbose_name='Evento')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Payload')
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name='Recebido em')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Tentativas')
+    last_error = models.TextField(blank=True, default='', verbose_name='Último Erro')
+    failed_at = models.DateTimeField(null=True, blank=True, verbose_name='Falhou em')
+
+    class Meta:
+        ordering = ['received_at']
+        verbose_name = 'Entrega de Webhook'
+        verbose_name_plural = 'Entregas de Webhook'
+
+    def __str__(self):
+        return f"{self.event} - {self.integration_id} em {self.received_at}"
+
+
+class IngestLease(models.Model):
+    """
+    Lease da importação de uma integração (integrations.leases): garante que cada integração seja
+    importada por no máximo um worker por vez. O dono renova o lease durante a execução e o remove
+    ao terminar; um lease expirado (worker interrompido) pode ser assumido por outra execução.
+    """
+    integration = models.OneToOneField(
+        Integration,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ingest_lease',
+        verbose_name='Integração'
+    )
+    owner = models.CharField(max_length=255, verbose_name='Dono')
+    acquired_at = models.DateTimeField(verbose_name='Adquirido em')
+    expires_at = models.DateTimeField(verbose_name='Expira em')
+
+    class Meta:
+        verbose_name = 'Lease da Importação'
+        verbose_name_plural = 'Leases da Importação'
+
+    def __str__(self):
+        return f"{self.integration_id} - {self.owner} até {self.expires_at}"
+
+
+class ProfileSample(models.Model):
+    """
+    Profile por amostragem de uma execução da importação ou de uma requisição da API (integrations.profiling).
+    As pilhas ficam no formato folded, comprimidas com gzip.
+    """
+
+    class KindChoices(models.TextChoices):
+        TASK = 'task', 'Importação'
+        REQUEST = 'request', 'Requisição'
+
+    uid = models.UUIDField(primary_key=True, default=get_uuid, editable=False)
+    kind = models.CharField(max_length=16, choices=KindChoices.choices, verbose_name='Tipo')
+    name = models.CharField(max_length=255, verbose_name='Nome')
+    integration = models.ForeignKey(
+        Integration,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='profiles',
+        verbose_name='Integração'
+    )
+    task_id = models.CharField(max_length=255, blank=True, default='', db_index=True, verbose_name='ID da Task')
+    duration = models.FloatField(default=0, verbose_name='Duração (s)')
+    samples = models.PositiveIntegerField(default=0, verbose_name='Amostras')
+    interval = models.FloatField(default=0, verbose_name='Intervalo (s)')
+    data = models.BinaryField(verbose_name='Pilhas (folded, gzip)')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Perfil de Execução'
+        verbose_name_plural = 'Perfis de Execução'
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.name} em {self.created_at}"
+
+    def get_folded(self) -> str:
+        return gzip.decompress(bytes(self.data)).decode()
+
+
+class APIKey(BaseModel):
+    """
+    Chave de API de longa duração para clientes de máquina.
+    Apenas o hash SHA-256 da chave é armazenado; a chave completa é exibida uma única vez, na criação.
+    """
+    uid = models.UUIDField(primary_key=True, default=get_uuid, editable=False)
+    name = models.CharField(max_length=255, verbose_name='Nome')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='api_keys',
+        verbose_name='Usuário'
+    )
+    prefix = models.CharField(max_length=16, unique=True, editable=False, verbose_name='Prefixo')
+    hashed_key = models.CharField(max_length=64, unique=True, editable=False, verbose_name='Hash da Chave')
+    is_active = models.BooleanField(default=True, verbose_name='Ativo?')
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name='Expira em')
+
+    class Meta:
+        verbose_name = 'Chave de API'
+        verbose_name_plural = 'Chaves de API'
+
+    def __str__(self):
+        return f"{self.name} ({self.prefix})"
+
+    @staticmethod
+    def hash_key(raw_key: str) -> str:
+        # A chave tem 256 bits de entropia, então um hash rápido é suficiente e mantém a verificação barata.
+        return hashlib.sha256(raw_key.encode()).hexdigest()
+
+    def set_new_key(self) -> str:
+        """
+        Gera uma nova chave, armazena seu prefixo e hash e retorna a chave completa.
+        """
+        self.prefix = secrets.token_hex(4)
+        raw_key = f"{self.prefix}.{secrets.token_urlsafe(32)}"
+        self.hashed_key = self.hash_key(raw_key)
+        return raw_key
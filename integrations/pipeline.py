@@ -0,0 +1,126 @@
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from integrations import metrics
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+def rebatch(pages, batch_size):
+    """
+    Reagrupa um iterador de páginas (listas) em lotes de até batch_size itens.
+    Lê uma nova página apenas quando o lote atual foi consumido.
+    """
+    batch = []
+    for page in pages:
+        for item in page:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def prefetch(pages, max_pages):
+    """
+    Busca as páginas em uma thread separada, mantendo no máximo max_pages prontas em memória.
+    Quando a fila está cheia, a busca fica bloqueada até a persistência consumir uma página (backpressure).
+    Erros da busca são repassados para quem consome o iterador.
+    """
+    buffer = queue.Queue(maxsize=max_pages)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        close_old_connections()
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+            put((_END, None))
+        except BaseException as e:
+            put((_END, e))
+        finally:
+            connection.close()
+
+    producer = threading.Thread(target=produce, name='ingest-prefetch', daemon=True)
+    producer.start()
+    try:
+        while True:
+            page = buffer.get()
+            if isinstance(page, tuple) and page and page[0] is _END:
+                if page[1] is not None:
+                    raise page[1]
+                return
+            yield page
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+
+
+def run_ingest_pipeline(provider_backend, batch_size=None, prefetch_pages=None, lease=None):
+    """
+    Executa o pipeline de ingestão de um provider: busca (em páginas) → normalização → persistência em lotes.
+
+    Cada lote é persistido assim que fica completo, com no máximo batch_size registros e prefetch_pages
+    páginas em memória, de forma que o consumo de memória não depende do volume total do provider.
+    Falhas na persistência de um lote são registradas e não interrompem os demais; falhas na busca
+    são propagadas.
+
+    Com `lease` (integrations.leases.Lease), o lease é renovado a cada página e antes de cada lote;
+    se outro worker o assumiu, LeaseLost é propagado sem persistir o lote.
+
+    Retorna um dict com as estatísticas da execução; as mesmas contagens e o tempo de cada lote
+    são registrados nas métricas da ingestão (integrations.metrics).
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    prefetch_pages = settings.INGEST_PREFETCH_PAGES if prefetch_pages is None else prefetch_pages
+
+    stats = {'pages': 0, 'records': 0, 'persisted': 0, 'batches': 0, 'failed_batches': 0}
+    labels = metrics.get_labels(provider_backend)
+
+    def count_pages(pages):
+        for page in pages:
+            if lease is not None:
+                lease.renew()
+            stats['pages'] += 1
+            stats['records'] += len(page)
+            metrics.records.labels(*labels).inc(len(page))
+            yield page
+
+    pages = provider_backend.iter_normalized_pages()
+    if prefetch_pages > 0:
+        pages = prefetch(pages, prefetch_pages)
+
+    for batch in rebatch(count_pages(pages), batch_size):
+        stats['batches'] += 1
+        if lease is not None:
+            lease.renew()
+        try:
+            with metrics.time_stage(labels, 'persist'), metrics.time_queries(labels):
+                persisted = provider_backend.persist_records(batch)
+            stats['persisted'] += persisted
+            metrics.rows_written.labels(*labels).inc(persisted)
+        except Exception as e:
+            stats['failed_batches'] += 1
+            metrics.failed_batches.labels(*labels).inc()
+            logger.error(
+                f"[ERRO] Falha ao persistir lote de {len(batch)} registros da integração "
+                f"'{getattr(provider_backend.integration, 'name', None)}': {e}")
+
+    return stats
@@ -0,0 +1,152 @@
+"""
+Profiler por amostragem para execuções da importação e requisições da API.
+
+Uma thread captura, a cada PROFILING_INTERVAL segundos, a pilha das threads observadas
+(sys._current_frames) e conta as pilhas no formato "folded" (uma linha "frame;frame;frame N"
+por pilha), lido por flamegraph.pl, speedscope e similares. O código observado não é
+instrumentado: o custo é apenas o de cada amostra, feita por outra thread.
+"""
+import gzip
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Amostra as pilhas da thread que iniciou o profiler (ou de todas as threads, com all_threads=True,
+    prefixando cada pilha com o nome da thread) até stop() ser chamado ou max_duration ser atingido.
+    """
+
+    def __init__(self, interval=None, all_threads=False, max_depth=128, max_duration=None):
+        self.interval = interval or settings.PROFILING_INTERVAL
+        self.all_threads = all_threads
+        self.max_depth = max_depth
+        self.max_duration = max_duration or settings.PROFILING_MAX_DURATION
+        self.stacks = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._labels = {}
+        self._target = None
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def _run(self):
+        deadline = self._started + self.max_duration
+        while not self._stop.wait(self.interval):
+            if time.perf_counter() > deadline:
+                logger.warning(f"[AVISO] Profiling interrompido após {self.max_duration}s.")
+                return
+            self.sample()
+
+    def get_label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def sample(self):
+        own = threading.get_ident()
+        frames = sys._current_frames()
+        if self.all_threads:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            targets = [(ident, frame) for ident, frame in frames.items() if ident != own]
+        else:
+            names = None
+            frame = frames.get(self._target)
+            targets = [(self._target, frame)] if frame is not None else []
+
+        for ident, frame in targets:
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self.get_label(frame.f_code))
+                frame = frame.f_back
+            if names is not None:
+                stack.append(names.get(ident, str(ident)))
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def to_folded(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def save_profile(profiler, kind, name, integration=None, task_id=''):
+    """
+    Grava o resultado do profiler (texto folded comprimido com gzip) em ProfileSample.
+    Falhas na gravação são apenas registradas, para não afetar a execução observada.
+    """
+    from integrations.models import ProfileSample
+
+    try:
+        return ProfileSample.objects.create(
+            kind=kind,
+            name=name[:255],
+            integration=integration,
+            task_id=task_id or '',
+            duration=profiler.duration,
+            samples=profiler.samples,
+            interval=profiler.interval,
+            data=gzip.compress(profiler.to_folded().encode()),
+        )
+    except Exception as e:
+        logger.error(f"[ERRO] Falha ao gravar o profile de '{name}': {e}")
+        return None
+
+
+def is_profiling_requested(request) -> bool:
+    """Indica se a requisição pediu um profile (header PROFILING_HEADER) com PROFILING_ENABLED ativo."""
+    return settings.PROFILING_ENABLED and bool(request.headers.get(settings.PROFILING_HEADER))
+
+
+def save_request_profile(profiler, request, response):
+    """Grava o profile de uma requisição (profiler já encerrado) e informa o seu id no header X-Profile-Id."""
+    from integrations.models import ProfileSample
+
+    profile = save_profile(profiler, ProfileSample.KindChoices.REQUEST, f"{request.method} {request.get_full_path()}")
+    if profile is not None:
+        response['X-Profile-Id'] = str(profile.uid)
+    return response
+
+
+@contextmanager
+def profile_integration(integration, task_id=''):
+    """
+    Executa o bloco com o profiler quando a integração tem enable_profiling ativo.
+    Todas as threads são amostradas, para incluir a busca feita pelo prefetch da ingestão.
+    """
+    from integrations.models import ProfileSample
+
+    if not integration.enable_profiling:
+        yield None
+        return
+
+    profiler = SamplingProfiler(all_threads=True).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        save_profile(profiler, ProfileSample.KindChoices.TASK, integration.handle, integration, task_id)
@@ -1,7 +1,20 @@
+import hmac
 import logging
 from abc import ABC, abstractmethod
+from functools import lru_cache
 
+from pydantic import TypeAdapter, ValidationError
+
+from integrations import metrics
+from integrations.caching import validated_objects
 from integrations.models import Integration, CredentialsEntity, ContextualData
+from integrations.utils import to_json_safe
+
+
+@lru_cache(maxsize=None)
+def get_list_adapter(schema):
+    """Retorna o TypeAdapter de list[schema], criado uma única vez por schema."""
+    return TypeAdapter(list[schema])
 
 
 class BaseProviderBackend(ABC):
@@ -11,6 +24,9 @@ class BaseProviderBackend(ABC):
     order = 1000
     allowed_credentials_types = []
     listening_events = []
+    normalized_schema = None
+    projection_model = None
+    projection_fields = {}
 
     """
     Classe base para todos os providers de dados contextuais.
@@ -35,6 +51,37 @@ class BaseProviderBackend(ABC):
         """
         return cls.category or "unknown"
 
+    @classmethod
+    def get_projection_model(cls):
+        """
+        Retorna o model da projeção tipada da categoria (ex.: 'integrations.WeatherObservation'),
+        ou None se o provider não declarar projeção.
+        """
+        if not cls.projection_model:
+            return None
+
+        from django.apps import apps
+        return apps.get_model(cls.projection_model)
+
+    @classmethod
+    def get_projection_values(cls, normalized_data: dict):
+        """
+        Extrai do dado normalizado os valores da projeção tipada, conforme projection_fields
+        ({campo_da_projecao: campo_normalizado}). Datas sem fuso são consideradas UTC.
+        """
+        from datetime import datetime, timezone
+
+        if not cls.projection_fields:
+            return None
+
+        values = {}
+        for field, source in cls.projection_fields.items():
+            value = normalized_data.get(source)
+            if isinstance(value, datetime) and value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            values[field] = value
+        return values
+
     """Métodos abstratos que devem ser implementados por cada provider."""
 
     @abstractmethod
@@ -49,15 +96,47 @@ class BaseProviderBackend(ABC):
         """
         raise NotImplementedError
 
+    def fetch_pages(self):
+        """
+        (Opcional) Busca os dados do provider em páginas, retornando um iterador de listas de dados crus.
+        Providers que paginam ou fazem streaming da resposta devem sobrescrever este método como gerador,
+        para que cada página seja persistida antes da próxima ser buscada.
+        Retorna None quando o provider só implementa fetch().
+        """
+        return None
+
+    def iter_normalized_pages(self):
+        """
+        Gera as páginas de dados normalizados usadas pelo pipeline de ingestão.
+        Usa fetch_pages() + normalize_batch() quando disponível; caso contrário, a lista retornada por fetch().
+        O tempo de busca e de normalização de cada página é registrado nas métricas da ingestão.
+        """
+        labels = metrics.get_labels(self)
+        pages = self.fetch_pages()
+        if pages is None:
+            with metrics.time_stage(labels, 'fetch'):
+                normalized_data_list = self.fetch()
+            if normalized_data_list:
+                yield normalized_data_list
+            return
+
+        for raw_records in metrics.time_iter(pages, labels, 'fetch'):
+            if raw_records:
+                with metrics.time_stage(labels, 'normalize'):
+                    normalized_data_list = self.normalize_batch(raw_records)
+                yield normalized_data_list
+
     """Métodos de acesso e normalização de dados."""
 
     def get_provider_backend_data_obj(self):
         """
         Converte provider_backend_data em objeto Pydantic usando o schema definido pelo provider.
+        A validação é memorizada enquanto provider_backend_data não muda (ver integrations.caching).
         """
         schema_model = self.get_provider_backend_data_config()
-        data = self.integration.provider_backend_data if self.integration else {}
-        return schema_model(**(data or {}))
+        if not self.integration:
+            return schema_model()
+        return validated_objects.get(self.integration, 'provider_backend_data', schema_model)
 
     def normalize(self, raw_data: dict) -> dict:
         """
@@ -65,26 +144,93 @@ class BaseProviderBackend(ABC):
         """
         return raw_data
 
+    def map_record(self, raw_data: dict) -> dict:
+        """
+        (Opcional) Extrai de um dado cru os campos do schema normalizado, sem validá-los.
+        Usado por normalize_batch quando o provider define normalized_schema.
+        """
+        return raw_data
+
+    @classmethod
+    def get_batch_adapter(cls):
+        """
+        Retorna o TypeAdapter (cacheado) que valida listas do schema normalizado, ou None se não houver schema.
+        """
+        if cls.normalized_schema is None:
+            return None
+        return get_list_adapter(cls.normalized_schema)
+
+    def normalize_batch(self, raw_records) -> list:
+        """
+        Normaliza uma lista de dados crus, validando a lista inteira em uma única chamada do Pydantic.
+        Registros cujo mapeamento (map_record) falha ou que não validam são descartados (e registrados
+        em log e na métrica de registros descartados); os demais são retornados como dicts, no mesmo
+        formato de normalize().
+        Sem normalized_schema, aplica normalize() a cada registro.
+        """
+        adapter = self.get_batch_adapter()
+        if adapter is None:
+            return [self.normalize(raw_data) for raw_data in raw_records]
+
+        integration_name = getattr(self.integration, 'name', None)
+        records = []
+        skipped = 0
+        for raw_data in raw_records:
+            try:
+                records.append(self.map_record(raw_data))
+            except Exception as e:
+                skipped += 1
+                logging.warning(
+                    f"[AVISO] Registro descartado na normalização da integração '{integration_name}' "
+                    f"({type(e).__name__}: {e}).")
+
+        try:
+            normalized_data_list = adapter.dump_python(adapter.validate_python(records))
+        except ValidationError as e:
+            invalid = {error['loc'][0] for error in e.errors() if error['loc']}
+            logging.error(
+                f"[ERRO] {len(invalid)} registros inválidos descartados na normalização da integração "
+                f"'{integration_name}': {e.errors()[:3]}")
+            records = [record for index, record in enumerate(records) if index not in invalid]
+            normalized_data_list = adapter.dump_python(adapter.validate_python(records))
+            skipped += len(invalid)
+
+        if skipped:
+            metrics.skipped_records.labels(*metrics.get_labels(self)).inc(skipped)
+        return normalized_data_list
+
+    """Métodos de consumo de eventos recebidos via webhook."""
+
+    @classmethod
+    def supports_event(cls, event: str) -> bool:
+        """
+        Indica se o provider consome o evento informado (declarado em listening_events).
+        """
+        return event in cls.listening_events
+
+    def verify_webhook(self, request) -> bool:
+        """
+        Valida a autenticidade de uma requisição recebida pelo webhook da integração.
+        Por padrão compara o header X-Webhook-Token com o token da integração.
+        Pode ser sobrescrito para validar assinaturas específicas do provider.
+        """
+        token = request.headers.get('X-Webhook-Token', '')
+        expected = getattr(self.integration, 'webhook_token', None)
+        return bool(expected) and hmac.compare_digest(token.encode(), expected.encode())
+
+    def consume(self, event: str, payload) -> list:
+        """
+        (Opcional) Normaliza o payload de um evento recebido via webhook.
+        Deve retornar a lista de dados normalizados, no mesmo formato retornado por fetch().
+        """
+        raise NotImplementedError
+
     def serialize_data(self, data: dict) -> dict:
         """
-        Serializa os dados para um formato JSON serializável.
+        Serializa os dados (recursivamente) para um formato JSON serializável.
         Pode ser sobrescrito por cada provider.
         """
-        from datetime import datetime, date
-
-        if isinstance(data, dict):
-            return {
-                key: (value.isoformat() if isinstance(value, (datetime, date)) else value)
-                for key, value in data.items()
-            }
-        elif isinstance(data, list):
-            return [
-                (item.isoformat() if isinstance(item, (datetime, date)) else item)
-                for item in data
-            ]
-        elif isinstance(data, (datetime, date)):
-            return data.isoformat()
-        return data
+        return to_json_safe(data)
 
     """Métodos de validação e schema."""
 
@@ -145,23 +291,82 @@ class BaseProviderBackend(ABC):
 
     """Métodos de criação e manipulação de eventos contextuais."""
 
+    def build_event_item(self, normalized_data: dict):
+        """
+        Converte um dado normalizado no item de evento usado pela ingestão em lote.
+        Retorna None quando os dados obrigatórios (cidade e data) não estão presentes.
+        """
+        if not normalized_data.get("city") or not normalized_data.get("timestamp"):
+            return None
+
+        category = self.get_category()
+        normalized_data_serializable = self.serialize_data(normalized_data)
+        return {
+            "event_type": f"{normalized_data['city']} - {category}",
+            "event_date": normalized_data["timestamp"].date(),
+            "location": None,
+            "city": normalized_data["city"],
+            "latitude": normalized_data.get("latitude"),
+            "longitude": normalized_data.get("longitude"),
+            "category": category,
+            "extra_fields": normalized_data_serializable,
+            "integration": self.integration,
+            "data": normalized_data_serializable,
+            "projection": self.get_projection_values(normalized_data),
+        }
+
+    def persist_records(self, normalized_data_list) -> int:
+        """
+        Persiste em lote os dados normalizados, criando ou atualizando os eventos
+        e adicionando uma nova versão de ContextualData para cada registro.
+        Retorna a quantidade de registros persistidos.
+        """
+        from integrations.helpers import bulk_upsert_events
+
+        items = []
+        for normalized_data in normalized_data_list:
+            item = self.build_event_item(normalized_data)
+            if item is None:
+                logging.error(
+                    f"[ERRO] Dados normalizados incompletos para integração "
+                    f"'{getattr(self.integration, 'name', None)}': {normalized_data}")
+                continue
+            items.append(item)
+
+        return len(bulk_upsert_events(items, projection_model=self.get_projection_model()))
+
     def get_or_create_event(self, event_type, event_date, location=None, city=None, category=None, extra_fields=None):
         """
         Obtém ou cria um evento contextual genérico.
+        O evento existente é localizado pela chave de deduplicação (integrations.dedup), em uma consulta por índice.
         """
+        from django.db import IntegrityError, transaction
+
+        from integrations.dedup import get_match_key
+        from integrations.helpers import syncing_contextual_data
         from integrations.models import ContextualEvent
 
-        event, created = ContextualEvent.objects.update_or_create(
-            event_type=event_type,
-            event_date=event_date,
-            location=location,
-            city=city,
-            defaults={
-                "category": category,
-                "integration": self.integration,
-                "extra_fields": extra_fields or {},
-            }
-        )
+        match_key = get_match_key(event_type, event_date, location, city)
+        attrs = {'category': category, 'integration': self.integration, 'extra_fields': extra_fields or {}}
+        with transaction.atomic():
+            event = ContextualEvent.objects.select_for_update().filter(match_key=match_key).first()
+            created = event is None
+            if created:
+                try:
+                    # Outro processo pode criar o evento entre a consulta e a inserção (índice único de match_key).
+                    with transaction.atomic():
+                        event = ContextualEvent.objects.create(
+                            event_type=event_type, event_date=event_date, location=location, city=city, **attrs)
+                except IntegrityError:
+                    event = ContextualEvent.objects.select_for_update().get(match_key=match_key)
+                    created = False
+
+            if not created:
+                with syncing_contextual_data(event, projections=False):
+                    for field, value in attrs.items():
+                        setattr(event, field, value)
+                    event.save()
+
         if created:
             self.save_log(
                 success=True,
@@ -175,17 +380,23 @@ class BaseProviderBackend(ABC):
 
     def create_contextual_data(self, event, normalized_data):
         """
-        Cria um registro de ContextualData vinculado ao evento.
+        Cria um registro de ContextualData vinculado ao evento, atualizando a projeção e os agregados.
         """
+        from django.db import transaction
+
+        from integrations.helpers import get_affected_contextual_data, sync_contextual_data
+
         last = ContextualData.objects.filter(event=event, integration=self.integration).order_by('-version').first()
         next_version = (last.version + 1 if last else 1)
 
-        contextual_data = ContextualData.objects.create(
-            event=event,
-            integration=self.integration,
-            version=next_version,
-            extra_fields={**normalized_data, "data_hash": self.version_data(normalized_data)}
-        )
+        with transaction.atomic():
+            contextual_data = ContextualData.objects.create(
+                event=event,
+                integration=self.integration,
+                version=next_version,
+                extra_fields={**normalized_data, "data_hash": self.version_data(normalized_data)}
+            )
+            sync_contextual_data(get_affected_contextual_data(contextual_data))
         return contextual_data
 
     """Métodos de logging e eventos."""
@@ -0,0 +1,163 @@
+import codecs
+import json
+from itertools import islice
+
+JSON_WHITESPACE = ' \t\n\r'
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_json_decoder = json.JSONDecoder()
+
+
+class JSONStreamReader:
+    """
+    Leitor incremental de JSON sobre um iterador de blocos (bytes ou str).
+
+    Permite percorrer um documento até um array e gerar os seus itens um a um, à medida que os blocos
+    chegam, mantendo em memória apenas o item atual (e o restante do bloco ainda não lido).
+    Cada item é decodificado com json.JSONDecoder.raw_decode.
+    """
+
+    def __init__(self, chunks, encoding='utf-8'):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self, min_size=0):
+        """
+        Lê blocos até acrescentar ao menos min_size caracteres ao buffer (ou um bloco, se min_size=0).
+        Retorna False quando o documento terminou sem novos dados.
+        """
+        if self.eof:
+            return False
+
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+
+        parts = []
+        size = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                parts.append(text)
+                size += len(text)
+                if size >= min_size:
+                    break
+        else:
+            text = self._decoder.decode(b'', final=True)
+            if text:
+                parts.append(text)
+            self.eof = True
+
+        if not parts:
+            return False
+        self.buffer += ''.join(parts)
+        return True
+
+    def peek(self):
+        """Retorna o próximo caractere significativo (ignorando espaços), ou '' no fim do documento."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in JSON_WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read_more():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON inválido: esperado '{char}', encontrado '{found or 'fim do documento'}'.")
+        self.pos += 1
+
+    def read_value(self):
+        """Decodifica o próximo valor JSON completo, lendo mais blocos quando necessário."""
+        self.peek()
+        while True:
+            try:
+                value, end = _json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Valor incompleto: dobra o trecho pendente antes de tentar de novo (custo linear).
+                if not self._read_more(min_size=len(self.buffer) - self.pos):
+                    raise
+                continue
+
+            # Um número no fim do buffer pode continuar no próximo bloco.
+            if end == len(self.buffer) and self._read_more():
+                continue
+
+            self.pos = end
+            return value
+
+    def seek_key(self, key):
+        """Avança dentro do objeto atual até o valor da chave informada."""
+        self.expect('{')
+        while True:
+            if self.peek() == '}':
+                raise KeyError(f"Chave '{key}' não encontrada na resposta.")
+            name = self.read_value()
+            self.expect(':')
+            if name == key:
+                return
+            self.read_value()
+            if self.peek() == ',':
+                self.pos += 1
+
+    def iter_array(self, path=None):
+        """
+        Gera os itens do array localizado em path (chaves separadas por ponto, ex.: 'data.items');
+        sem path, o próprio documento deve ser um array.
+        """
+        for key in (path.split('.') if path else ()):
+            self.seek_key(key)
+
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+
+        while True:
+            yield self.read_value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"JSON inválido: esperado ',' ou ']', encontrado '{separator or 'fim do documento'}'.")
+
+
+def iter_json_records(chunks, path=None):
+    """Gera os itens de um array JSON a partir de um iterador de blocos."""
+    return JSONStreamReader(chunks).iter_array(path)
+
+
+class ByteCounter:
+    """Conta os bytes dos blocos lidos de uma resposta em streaming."""
+
+    def __init__(self):
+        self.size = 0
+
+    def wrap(self, chunks):
+        for chunk in chunks:
+            self.size += len(chunk)
+            yield chunk
+
+
+def stream_json_records(response, path=None, chunk_size=DEFAULT_CHUNK_SIZE, counter=None):
+    """
+    Gera os itens de um array JSON de uma resposta do requests feita com stream=True,
+    sem carregar o corpo inteiro em memória. Com counter (ByteCounter), os bytes lidos são contados.
+    """
+    chunks = response.iter_content(chunk_size=chunk_size)
+    if counter is not None:
+        chunks = counter.wrap(chunks)
+    return iter_json_records(chunks, path)
+
+
+def iter_pages(records, page_size):
+    """Agrupa um iterador de registros em páginas (listas) de até page_size itens."""
+    records = iter(records)
+    while page := list(islice(records, page_size)):
+        yield page
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -16,6 +16,14 @@ class OpenWeatherConfig(BaseModel):
         title="Cidade",
         json_schema_extra={"placeholder": "São Paulo", "help_text": "Nome da cidade para buscar o clima."}
     )
+    mode: Literal["current", "forecast"] = Field(
+        "current",
+        title="Modo",
+        json_schema_extra={
+            "help_text": "current: clima atual (/weather). forecast: previsão de 5 dias em intervalos de 3 horas "
+                         "(/forecast), processada em streaming."
+        }
+    )
 
     @field_validator("language", mode="after")
     @classmethod
@@ -33,3 +41,5 @@ class NormalizedDataSchema(BaseModel):
     city: Optional[str]
     country: Optional[str]
     timestamp: Optional[datetime]
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
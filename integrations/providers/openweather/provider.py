@@ -2,8 +2,10 @@ from datetime import datetime
 
 import requests
 
+from integrations import metrics
 from integrations.credentials.openweather.credentials import OpenWeatherCredentials
 from integrations.providers.base import BaseProviderBackend
+from integrations.providers.http import ByteCounter, iter_pages, stream_json_records
 from integrations.providers.openweather.config import OpenWeatherConfig, NormalizedDataSchema
 
 
@@ -12,6 +14,19 @@ class OpenWeatherProviderBackend(BaseProviderBackend):
     name = "OpenWeather API"
     category = "weather"
     allowed_credentials_types = ["open_weather"]
+    listening_events = ["weather.current"]
+    normalized_schema = NormalizedDataSchema
+    projection_model = "integrations.WeatherObservation"
+    projection_fields = {
+        "observed_at": "timestamp",
+        "temperature": "temperature",
+        "humidity": "humidity",
+        "weather": "weather",
+        "country": "country",
+    }
+
+    forecast_page_size = 500
+    request_timeout = 30
 
     def __init__(self, integration=None, credentials=None):
         """
@@ -52,16 +67,33 @@ class OpenWeatherProviderBackend(BaseProviderBackend):
         validated = OpenWeatherConfig(**data)
         return validated.model_dump()
 
+    def map_record(self, raw_data: dict) -> dict:
+        """
+        Extracts the normalized fields from a /weather response, without validating them.
+        """
+        main = raw_data.get("main") or {}
+        coord = raw_data.get("coord") or {}
+        return {
+            "temperature": main.get("temp"),
+            "humidity": main.get("humidity"),
+            "weather": (raw_data.get("weather") or [{}])[0].get("description"),
+            "city": raw_data.get("name"),
+            "country": (raw_data.get("sys") or {}).get("country"),
+            "timestamp": datetime.utcfromtimestamp(int(raw_data["dt"])) if raw_data.get("dt") else None,
+            "latitude": coord.get("lat"),
+            "longitude": coord.get("lon"),
+        }
+
     def normalize(self, raw_data: dict) -> dict:
-        timestamp = datetime.utcfromtimestamp(int(raw_data.get("dt"))) if raw_data.get("dt") else None
-        return NormalizedDataSchema(
-            temperature=raw_data.get("main", {}).get("temp"),
-            humidity=raw_data.get("main", {}).get("humidity"),
-            weather=raw_data.get("weather", [{}])[0].get("description"),
-            city=raw_data.get("name"),
-            country=raw_data.get("sys", {}).get("country"),
-            timestamp=timestamp,
-        ).model_dump()
+        return NormalizedDataSchema(**self.map_record(raw_data)).model_dump()
+
+    def consume(self, event, payload):
+        """
+        Normalizes current weather payloads pushed to the integration webhook.
+        The payload has the same shape as the /weather endpoint response (or a list of them).
+        """
+        raw_records = payload if isinstance(payload, list) else [payload]
+        return self.normalize_batch(raw_records)
 
     def fetch(self):
         """
@@ -77,7 +109,8 @@ class OpenWeatherProviderBackend(BaseProviderBackend):
             "lang": self.config.language,
         }
         try:
-            response = requests.get(base_url, params=self.request_data)
+            response = requests.get(base_url, params=self.request_data, timeout=self.request_timeout)
+            metrics.observe_response(self, response)
             response.raise_for_status()
             raw_data = response.json()
             normalized_data = self.normalize(raw_data)
@@ -102,3 +135,57 @@ class OpenWeatherProviderBackend(BaseProviderBackend):
                 response_data={},
             )
             return []
+
+    def fetch_pages(self):
+        """
+        Returns the forecast pages when the integration is configured in forecast mode.
+        Current weather keeps using fetch().
+        """
+        if self.config.mode == "forecast":
+            return self.fetch_forecast_pages()
+        return None
+
+    def fetch_forecast_pages(self):
+        """
+        Streams the /forecast response, yielding pages of raw records from its "list" array as they arrive.
+        Forecast items do not carry the city name or coordinates (they come in the trailing "city" object),
+        so the configured city is used and the events get no coordinates.
+        """
+        base_url = str(self.credentials.base_url).rstrip("/") + "/forecast"
+        self.request_data = {
+            "appid": self.credentials.api_key,
+            "q": self.config.city,
+            "lang": self.config.language,
+        }
+        records_imported = 0
+        counter = ByteCounter()
+        try:
+            with requests.get(base_url, params=self.request_data, stream=True, timeout=self.request_timeout) as response:
+                try:
+                    response.raise_for_status()
+                    records = stream_json_records(response, path="list", counter=counter)
+                    for raw_records in iter_pages(records, self.forecast_page_size):
+                        records_imported += len(raw_records)
+                        yield [{**raw_data, "name": raw_data.get("name") or self.config.city} for raw_data in raw_records]
+                finally:
+                    metrics.observe_response(self, response, counter.size)
+
+        except Exception as e:
+            self.save_log(
+                success=False,
+                message=f"Erro ao buscar previsão do clima: {e}",
+                method="fetch",
+                records_imported=records_imported,
+                request_data=self.request_data,
+                response_data={},
+            )
+            return
+
+        self.save_log(
+            success=True,
+            message="Previsão do clima obtida com sucesso.",
+            method="fetch",
+            records_imported=records_imported,
+            request_data=self.request_data,
+            response_data={},
+        )
@@ -1,10 +1,34 @@
+import hashlib
+import json
+import logging
+import os
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+PLUGIN_PACKAGES = {
+    'credentials': ('integrations.credentials', Path(__file__).parent / 'credentials'),
+    'providers': ('integrations.providers', Path(__file__).parent / 'providers'),
+}
+
 
 class PluginRegistry:
+    """
+    Registro dos plugins de credenciais e providers.
+
+    Os metadados dos plugins (id, nome, categoria, credenciais permitidas e caminho da classe) ficam em
+    um manifesto JSON (PLUGIN_MANIFEST_PATH). As classes só são importadas quando efetivamente usadas;
+    a descoberta com importação de todos os módulos acontece apenas quando o manifesto não existe, quando
+    um plugin consultado não consta dele ou não pode ser importado ou, com PLUGIN_MANIFEST_AUTO_REFRESH
+    ativo (padrão em DEBUG), quando os arquivos dos plugins mudam.
+    """
+
     def __init__(self):
-        self._credentials = None
-        self._providers = None
+        self._manifest = None
+        self._classes = {}
+        self._missing = set()
+
+    """Descoberta e manifesto."""
 
     def _discover_plugins(self, base_class, package_name, package_path):
         """
@@ -28,49 +52,174 @@ class PluginRegistry:
                     plugins[obj.id] = obj
         return plugins
 
-    def _load_credentials_types(self):
-        """Carrega e armazena as credenciais se ainda não carregadas."""
-        if self._credentials is None:
-            package_name = "integrations.credentials"
-            package_path = Path(__file__).parent / "credentials"
+    @staticmethod
+    def get_plugins_fingerprint():
+        """
+        Calcula uma assinatura dos arquivos dos plugins (caminho, data de modificação e tamanho),
+        usada para detectar quando o manifesto precisa ser refeito.
+        """
+        digest = hashlib.sha256()
+        for _, package_path in PLUGIN_PACKAGES.values():
+            for root, dirs, files in os.walk(package_path):
+                dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+                for filename in sorted(files):
+                    if not filename.endswith('.py'):
+                        continue
+                    stat = os.stat(os.path.join(root, filename))
+                    digest.update(f"{os.path.join(root, filename)}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+        return digest.hexdigest()
+
+    def build_manifest(self):
+        """
+        Importa todos os plugins e gera o manifesto com os seus metadados.
+        """
+        from integrations.credentials.base import BaseCredentialsType
+        from integrations.providers.base import BaseProviderBackend
+
+        credentials = self._discover_plugins(BaseCredentialsType, *PLUGIN_PACKAGES['credentials'])
+        providers = self._discover_plugins(BaseProviderBackend, *PLUGIN_PACKAGES['providers'])
+
+        manifest = {
+            'fingerprint': self.get_plugins_fingerprint(),
+            'credentials': {
+                plugin_id: {
+                    'path': f"{cls.__module__}:{cls.__qualname__}",
+                    'name': cls.name,
+                }
+                for plugin_id, cls in credentials.items()
+            },
+            'providers': {
+                plugin_id: {
+                    'path': f"{cls.__module__}:{cls.__qualname__}",
+                    'name': cls.name,
+                    'category': cls.category,
+                    'allowed_credentials_types': list(cls.allowed_credentials_types),
+                    'listening_events': list(cls.listening_events),
+                }
+                for plugin_id, cls in providers.items()
+            },
+        }
+        self._classes.update({('credentials', plugin_id): cls for plugin_id, cls in credentials.items()})
+        self._classes.update({('providers', plugin_id): cls for plugin_id, cls in providers.items()})
+        return manifest
+
+    def write_manifest(self, manifest, path):
+        """
+        Grava o manifesto de forma atômica. Falhas de escrita (ex.: sistema de arquivos somente leitura)
+        são apenas registradas, pois o manifesto continua disponível em memória.
+        """
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"[AVISO] Não foi possível gravar o manifesto de plugins em {path}: {e}")
+
+    def read_manifest(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
 
-            from integrations.credentials.base import BaseCredentialsType
-            self._credentials = self._discover_plugins(BaseCredentialsType, package_name, package_path)
+    def load_manifest(self, rebuild=False):
+        """
+        Carrega o manifesto do arquivo, refazendo-o quando inexistente, desatualizado ou se rebuild=True.
+        """
+        from django.conf import settings
+
+        path = settings.PLUGIN_MANIFEST_PATH
+        manifest = None if rebuild else self.read_manifest(path)
+
+        if manifest is not None and settings.PLUGIN_MANIFEST_AUTO_REFRESH:
+            if manifest.get('fingerprint') != self.get_plugins_fingerprint():
+                manifest = None
+
+        if manifest is None:
+            manifest = self.build_manifest()
+            self.write_manifest(manifest, path)
+
+        self._manifest = manifest
+        return manifest
+
+    def invalidate(self):
+        """Descarta o manifesto e as classes carregadas; o próximo acesso recarrega o manifesto."""
+        self._manifest = None
+        self._classes = {}
+        self._missing = set()
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            self.load_manifest()
+        return self._manifest
 
-    def _load_providers_backends(self):
-        """Carrega e armazena os providers se ainda não carregados."""
-        if self._providers is None:
-            package_name = "integrations.providers"
-            package_path = Path(__file__).parent / "providers"
+    """Carregamento sob demanda."""
 
-            from integrations.providers.base import BaseProviderBackend
-            self._providers = self._discover_plugins(BaseProviderBackend, package_name, package_path)
+    def _get_plugin_class(self, kind, id):
+        """Importa (uma única vez) e retorna a classe do plugin pelo id."""
+        key = (kind, id)
+        if key in self._classes:
+            return self._classes[key]
+
+        if not id:
+            return None
+
+        entry = self.manifest[kind].get(id)
+        if entry is None:
+            if key in self._missing:
+                return None
+            # Manifesto desatualizado (plugin adicionado depois de gerado): refaz a descoberta uma única vez
+            # por id ausente, para que ids inexistentes não importem todos os plugins a cada consulta.
+            self._missing.add(key)
+            logger.warning(f"[AVISO] Plugin '{id}' ausente do manifesto, refazendo o manifesto.")
+            self.load_manifest(rebuild=True)
+            return self._classes.get(key)
+
+        import importlib
+
+        module_name, _, qualname = entry['path'].partition(':')
+        try:
+            obj = importlib.import_module(module_name)
+            for attr in qualname.split('.'):
+                obj = getattr(obj, attr)
+        except (ImportError, AttributeError):
+            # Manifesto desatualizado (plugin movido ou renomeado): refaz a descoberta.
+            logger.warning(f"[AVISO] Plugin '{id}' não encontrado em {entry['path']}, refazendo o manifesto.")
+            self.load_manifest(rebuild=True)
+            return self._classes.get(key)
+
+        self._classes[key] = obj
+        return obj
+
+    """Métodos de consulta."""
 
     def get_credentials_types_choices(self):
         """Retorna lista de choices [(id, name), ...] para tipos de credenciais, para usar no form."""
-        self._load_credentials_types()
-        choices = [(ct.id, ct.name) for ct in self._credentials.values()]
+        choices = [(plugin_id, entry['name']) for plugin_id, entry in self.manifest['credentials'].items()]
         choices = sorted(choices, key=lambda x: x[1])
         choices.insert(0, ('', 'Selecione um tipo de credencial'))
         return choices
 
     def get_provider_backends_choices(self):
         """Retorna lista de choices [(id, name), ...] para providers, para usar no form."""
-        self._load_providers_backends()
-        choices = [(cls.id, cls.name) for cls in self._providers.values()]
+        choices = [(plugin_id, entry['name']) for plugin_id, entry in self.manifest['providers'].items()]
         choices = sorted(choices, key=lambda x: x[1])
         choices.insert(0, ('', 'Selecione um provedor'))
         return choices
 
+    def get_provider_backend_info(self, id: str):
+        """Retorna os metadados do provider backend pelo id, sem importar a classe."""
+        return self.manifest['providers'].get(id) if id else None
+
     def get_credentials_type(self, id: str):
         """Retorna a classe da credencial pelo id."""
-        self._load_credentials_types()
-        return self._credentials.get(id)
+        return self._get_plugin_class('credentials', id)
 
     def get_provider_backend(self, id: str):
         """Retorna a classe do provider backend pelo id."""
-        self._load_providers_backends()
-        return self._providers.get(id)
+        return self._get_plugin_class('providers', id)
 
 
 plugin_registry = PluginRegistry()
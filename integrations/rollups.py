@@ -0,0 +1,269 @@
+"""
+Agregados (ContextualDataRollup) das métricas numéricas dos dados contextuais.
+
+Cada observação (evento, integração e instante observado) é contada uma única vez, pela sua última
+versão: uma nova versão com os mesmos dados (ex.: a mesma leitura buscada de novo) não altera os agregados.
+
+A ingestão soma as novas observações aos agregados existentes (upsert_rollups). Alterações e exclusões
+feitas fora dela (API, Django Admin, união de eventos duplicados) e novas versões com dados diferentes
+recalculam, a partir de ContextualData, os grupos afetados: integração, cidade, categoria e dia (com as
+horas do dia), ver refresh_rollup_groups.
+
+Para que o recálculo não perca somas concorrentes, as gravações usam advisory locks do PostgreSQL por
+grupo, na transação: a ingestão usa locks compartilhados (as somas comutam entre si) e o recálculo
+usa locks exclusivos. A reconstrução completa (rebuild_contextual_rollups) usa o lock exclusivo global,
+que os demais também adquirem (compartilhado) antes dos locks dos grupos, sempre na mesma ordem.
+"""
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from integrations.models import ContextualData, ContextualDataRollup
+from integrations.utils import get_observed_at, get_uuid  # noqa: F401 (get_observed_at é reexportado)
+
+ROLLUP_IGNORED_FIELDS = {'data_hash', 'latitude', 'longitude'}
+
+
+def get_lock_key(*parts) -> int:
+    """Chave (bigint) de advisory lock derivada das partes informadas."""
+    raw = '\x1f'.join(str(part) for part in parts).encode()
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'big', signed=True)
+
+
+ROLLUPS_LOCK_KEY = get_lock_key('contextual-data-rollups')
+
+
+def get_buckets(observed_at: datetime):
+    """
+    Retorna os intervalos (granularidade, início) em que o instante informado é agregado,
+    calculados no fuso horário do projeto.
+    """
+    local = timezone.localtime(observed_at)
+    hour = local.replace(minute=0, second=0, microsecond=0)
+    return (
+        (ContextualDataRollup.GranularityChoices.HOUR.value, hour),
+        (ContextualDataRollup.GranularityChoices.DAY.value, hour.replace(hour=0)),
+    )
+
+
+def get_rollup_group(integration_id, city, category, observed_at):
+    """Grupo de recálculo dos agregados: (integração, cidade, categoria, início do dia)."""
+    day = get_buckets(observed_at)[1][1]
+    return integration_id, city or '', category or '', day
+
+
+def get_rollup_groups(queryset):
+    """Grupos dos agregados afetados pelos dados contextuais do queryset (uma consulta)."""
+    rows = queryset.order_by().values_list('integration_id', 'event__city', 'event__category', 'observed_at')
+    return {
+        get_rollup_group(integration_id, city, category, observed_at)
+        for integration_id, city, category, observed_at in rows
+        if observed_at is not None
+    }
+
+
+def lock_rollup_groups(groups, exclusive=False, exclusive_groups=()):
+    """
+    Adquire, na transação atual, o lock global compartilhado e os locks dos grupos (compartilhados ou
+    exclusivos; os de exclusive_groups sempre exclusivos), em ordem, em uma única consulta.
+    """
+    modes = {get_lock_key(*group): exclusive for group in groups}
+    modes.update((get_lock_key(*group), True) for group in exclusive_groups)
+    keys = sorted(modes)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT CASE
+                WHEN position = 1 THEN pg_advisory_xact_lock_shared(key)
+                WHEN is_exclusive THEN pg_advisory_xact_lock(key)
+                ELSE pg_advisory_xact_lock_shared(key)
+            END
+            FROM unnest(%s::bigint[], %s::boolean[]) WITH ORDINALITY AS keys(key, is_exclusive, position)
+            ORDER BY position
+            """,
+            [[ROLLUPS_LOCK_KEY] + keys, [False] + [modes[key] for key in keys]],
+        )
+
+
+def lock_all_rollups():
+    """Adquire o lock exclusivo global: nenhuma outra gravação de agregados ocorre até o fim da transação."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [ROLLUPS_LOCK_KEY])
+
+
+def get_numeric_metrics(data: dict):
+    """
+    Retorna as métricas numéricas de primeiro nível de um dado contextual.
+    """
+    for key, value in data.items():
+        if key in ROLLUP_IGNORED_FIELDS or isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            yield key, float(value)
+
+
+def accumulate_rollups(entries, accumulated=None):
+    """
+    Agrega em memória as entradas (integration_id, city, category, observed_at, data).
+    Retorna um dict {(integration_id, city, category, granularity, metric, bucket): [count, total, min, max]}.
+    """
+    accumulated = accumulated if accumulated is not None else defaultdict(lambda: [0, 0.0, None, None])
+    for integration_id, city, category, observed_at, data in entries:
+        metrics = list(get_numeric_metrics(data))
+        if not metrics:
+            continue
+        for granularity, bucket in get_buckets(observed_at):
+            for metric, value in metrics:
+                stats = accumulated[(integration_id, city or '', category or '', granularity, metric, bucket)]
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = value if stats[2] is None else min(stats[2], value)
+                stats[3] = value if stats[3] is None else max(stats[3], value)
+    return accumulated
+
+
+def upsert_rollups(accumulated, batch_size=1000):
+    """
+    Soma os agregados calculados aos já existentes, com INSERT ... ON CONFLICT DO UPDATE,
+    mantendo a atualização atômica mesmo com vários workers gravando no mesmo intervalo.
+    """
+    if not accumulated:
+        return 0
+
+    table = ContextualDataRollup._meta.db_table
+    sql = f"""
+        INSERT INTO {table}
+            (uid, integration_id, city, category, granularity, metric, bucket,
+             count, total, minimum, maximum, updated_at)
+        VALUES {{values}}
+        ON CONFLICT (integration_id, city, category, granularity, metric, bucket) DO UPDATE SET
+            count = {table}.count + EXCLUDED.count,
+            total = {table}.total + EXCLUDED.total,
+            minimum = LEAST({table}.minimum, EXCLUDED.minimum),
+            maximum = GREATEST({table}.maximum, EXCLUDED.maximum),
+            updated_at = EXCLUDED.updated_at
+    """
+    now = timezone.now()
+    rows = [
+        (get_uuid(), *key, *stats, now)
+        for key, stats in accumulated.items()
+    ]
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(batch))
+            cursor.execute(sql.format(values=placeholders), [value for row in batch for value in row])
+    return len(rows)
+
+
+def get_latest_observations(queryset):
+    """Apenas a última versão de cada observação (evento, integração, instante observado) do queryset."""
+    return (
+        queryset
+        .order_by('event_id', 'integration_id', 'observed_at', '-version')
+        .distinct('event_id', 'integration_id', 'observed_at')
+    )
+
+
+def get_previous_data_hashes(contextual_data_list, observed_at_list):
+    """
+    Retorna {(event_id, integration_id, observed_at): data_hash} da última versão já gravada de cada
+    observação dos registros informados, sem contar os próprios registros. Só consulta o banco para os
+    pares (evento, integração) com versões anteriores às do lote.
+    """
+    first_versions = {}
+    for contextual_data in contextual_data_list:
+        pair = (contextual_data.event_id, contextual_data.integration_id)
+        first_versions[pair] = min(first_versions.get(pair, contextual_data.version), contextual_data.version)
+    pairs = [pair for pair, version in first_versions.items() if version > 1]
+    if not pairs:
+        return {}
+
+    rows = get_latest_observations(
+        ContextualData.objects
+        .filter(
+            event_id__in={event_id for event_id, _ in pairs},
+            integration_id__in={integration_id for _, integration_id in pairs},
+            observed_at__in=set(observed_at_list),
+        )
+        .exclude(pk__in=[contextual_data.pk for contextual_data in contextual_data_list])
+    ).values_list('event_id', 'integration_id', 'observed_at', 'extra_fields__data_hash')
+    return {tuple(row[:3]): row[3] for row in rows}
+
+
+def update_rollups_for_contextual_data(contextual_data_list):
+    """
+    Soma aos agregados os registros de ContextualData recém-criados (deve ser chamado na transação que os criou).
+    Novas versões de uma observação já contada são ignoradas quando os dados (data_hash) não mudaram; quando
+    mudaram, o grupo da observação é recalculado (a contribuição anterior não pode ser subtraída).
+    """
+    if not contextual_data_list:
+        return 0
+    observed_at_list = [
+        contextual_data.observed_at or get_observed_at(contextual_data.extra_fields, timezone.now())
+        for contextual_data in contextual_data_list
+    ]
+
+    data_hashes = get_previous_data_hashes(contextual_data_list, observed_at_list)
+    entries = []
+    refresh_groups = set()
+    for contextual_data, observed_at in zip(contextual_data_list, observed_at_list):
+        entry = (
+            contextual_data.integration_id,
+            contextual_data.event.city,
+            contextual_data.event.category,
+            observed_at,
+            contextual_data.extra_fields,
+        )
+        observation = (contextual_data.event_id, contextual_data.integration_id, observed_at)
+        data_hash = contextual_data.extra_fields.get('data_hash')
+        if observation not in data_hashes:
+            entries.append(entry)
+        elif data_hashes[observation] != data_hash or data_hash is None:
+            refresh_groups.add(get_rollup_group(*entry[:4]))
+        data_hashes[observation] = data_hash
+
+    entries = [entry for entry in entries if get_rollup_group(*entry[:4]) not in refresh_groups]
+    lock_rollup_groups({get_rollup_group(*entry[:4]) for entry in entries}, exclusive_groups=refresh_groups)
+    created = upsert_rollups(accumulate_rollups(entries))
+    return created + refresh_rollup_groups(refresh_groups)
+
+
+def get_blank_filter(field, value):
+    """Filtro do campo do evento que corresponde ao valor do agregado ('' inclui NULL)."""
+    if value:
+        return Q(**{field: value})
+    return Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+
+
+def refresh_rollup_groups(groups):
+    """
+    Recalcula, a partir de ContextualData, os agregados dos grupos (integração, cidade, categoria, dia)
+    informados, com locks exclusivos dos grupos. Usado nas alterações feitas fora da ingestão.
+    """
+    if not groups:
+        return 0
+
+    created = 0
+    with transaction.atomic():
+        lock_rollup_groups(groups, exclusive=True)
+        for integration_id, city, category, day in sorted(groups, key=str):
+            next_day = timezone.localtime(day + timedelta(days=1)).replace(hour=0)
+            rows = get_latest_observations(
+                ContextualData.objects
+                .filter(integration_id=integration_id, observed_at__gte=day, observed_at__lt=next_day)
+                .filter(get_blank_filter('event__city', city), get_blank_filter('event__category', category))
+            ).values_list('observed_at', 'extra_fields')
+            accumulated = accumulate_rollups(
+                (integration_id, city, category, observed_at, data) for observed_at, data in rows.iterator()
+            )
+            ContextualDataRollup.objects.filter(
+                integration_id=integration_id, city=city, category=category, bucket__gte=day, bucket__lt=next_day,
+            ).delete()
+            created += upsert_rollups(accumulated)
+    return created
@@ -0,0 +1,64 @@
+"""
+Distribuição das integrações entre as filas da importação (shards) por hash consistente do uid.
+
+Cada fila ocupa INGEST_SHARD_VNODES pontos em um anel de hashes e a integração vai para a fila do
+primeiro ponto a partir do hash do seu uid. Com vários pontos por fila a carga fica equilibrada e,
+ao alterar INGEST_SHARDS, apenas as integrações dos trechos afetados mudam de fila (em média 1/N);
+as demais continuam no mesmo worker, com as conexões e os caches já aquecidos.
+
+Cada worker consome uma ou mais filas (celery worker -Q ingest.0,ingest.1) e a integração pode fixar
+a sua fila em Integration.ingest_queue (ex.: a fila de alta prioridade). Com INGEST_SHARDS=0 todas
+as integrações vão para CELERY_HIGH_PRIORITY_QUEUE.
+"""
+import bisect
+import hashlib
+from functools import lru_cache
+
+from django.conf import settings
+
+
+def get_hash(value) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Anel de hash consistente com `vnodes` pontos por nó."""
+
+    def __init__(self, nodes, vnodes=64):
+        self.nodes = list(nodes)
+        points = sorted((get_hash(f'{node}#{index}'), node) for node in self.nodes for index in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def get_node(self, key):
+        if not self._nodes:
+            return None
+        index = bisect.bisect(self._hashes, get_hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+@lru_cache(maxsize=8)
+def _get_ring(queues, vnodes):
+    return HashRing(queues, vnodes)
+
+
+def get_shard_queues():
+    """Filas dos shards da importação, na ordem (ex.: ['ingest.0', 'ingest.1'])."""
+    return [f'{settings.INGEST_SHARD_QUEUE_PREFIX}.{index}' for index in range(settings.INGEST_SHARDS)]
+
+
+def get_ring():
+    return _get_ring(tuple(get_shard_queues()), settings.INGEST_SHARD_VNODES)
+
+
+def get_ingest_queue(integration):
+    """Fila em que a importação da integração é executada."""
+    if integration.ingest_queue:
+        return integration.ingest_queue
+    return get_ring().get_node(integration.uid) or settings.CELERY_HIGH_PRIORITY_QUEUE
+
+
+def get_queue_choices():
+    """Opções para Integration.ingest_queue: automática (hash consistente), alta prioridade e os shards."""
+    queues = [settings.CELERY_HIGH_PRIORITY_QUEUE] + get_shard_queues()
+    return [('', 'Automática (hash consistente do uid)')] + [(queue, queue) for queue in queues]
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from integrations.api.authentication import get_api_key_cache_key, get_user_cache_key
+from integrations.caching import active_integrations, validated_objects
+from integrations.dedup import city_aliases
+from integrations.models import APIKey, CityAlias, CredentialsEntity, Integration
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user_auth_cache(sender, instance, **kwargs):
+    """
+    Remove do cache de autenticação o usuário alterado e as suas chaves de API.
+    """
+    cache.delete(get_user_cache_key(getattr(instance, api_settings.USER_ID_FIELD)))
+    hashed_keys = APIKey.objects.filter(user_id=instance.pk).values_list('hashed_key', flat=True)
+    cache.delete_many([get_api_key_cache_key(hashed_key) for hashed_key in hashed_keys])
+
+
+@receiver([post_save, post_delete], sender=APIKey)
+def invalidate_api_key_auth_cache(sender, instance, **kwargs):
+    cache.delete(get_api_key_cache_key(instance.hashed_key))
+
+
+@receiver([post_save, post_delete], sender=Integration)
+@receiver([post_save, post_delete], sender=CredentialsEntity)
+def invalidate_integration_caches(sender, instance, **kwargs):
+    """
+    Descarta os objetos de configuração e credenciais validados em cache para o registro alterado
+    e a lista de integrações ativas do worker.
+    """
+    validated_objects.invalidate(sender._meta.label, instance.pk)
+    active_integrations.invalidate()
+
+
+@receiver([post_save, post_delete], sender=CityAlias)
+def invalidate_city_aliases(sender, instance, **kwargs):
+    city_aliases.invalidate()
@@ -1,16 +1,56 @@
 import logging
+from collections import defaultdict
 
 from celery import shared_task
 from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
-from integrations.models import Integration
+from integrations import metrics
+from integrations.caching import active_integrations
+from integrations.leases import Lease, LeaseLost, get_lease_owner
+from integrations.models import Integration, IntegrationLog, WebhookDelivery
+from integrations.pipeline import run_ingest_pipeline
+from integrations.profiling import profile_integration
 from integrations.registry import plugin_registry
+from integrations.sharding import get_ingest_queue
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60, soft_time_limit=300, queue='high_priority')
-def fetch_all_active_integrations(self):
+class WebhookDeliveryError(Exception):
+    pass
+
+
+@shared_task(bind=True, soft_time_limit=60, queue=settings.CELERY_HIGH_PRIORITY_QUEUE)
+def dispatch_ingest_shards(self):
+    """
+    Agenda uma execução de fetch_all_active_integrations por fila (shard) com integrações ativas,
+    na própria fila, para que cada integração seja sempre processada pelos mesmos workers.
+    É a task a ser agendada no Celery Beat.
+    """
+    queues = defaultdict(list)
+    for integration, _ in active_integrations.get_entries():
+        queues[get_ingest_queue(integration)].append(integration.handle)
+
+    if not queues:
+        logger.info("[INFO] Nenhuma integração ativa encontrada.")
+        return {}
+
+    for queue in queues:
+        fetch_all_active_integrations.apply_async(kwargs={'queue': queue}, queue=queue)
+    logger.info(f"[INFO] Importação agendada em {len(queues)} filas: {', '.join(sorted(queues))}.")
+    return dict(queues)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60, soft_time_limit=300,
+             queue=settings.CELERY_HIGH_PRIORITY_QUEUE)
+def fetch_all_active_integrations(self, queue=None):
+    """
+    Importa as integrações ativas. Com `queue`, apenas as integrações atribuídas a essa fila
+    (ver integrations.sharding); sem ela, todas as integrações ativas.
+    """
     try:
         self.update_state(
             state='STARTED',
@@ -19,55 +59,161 @@ def fetch_all_active_integrations(self):
                 'task_id': self.request.id
             }
         )
-        integrations = Integration.objects.filter(is_active=True)
+        integrations = active_integrations.get_entries()
+        if queue is not None:
+            integrations = [entry for entry in integrations if get_ingest_queue(entry[0]) == queue]
         if not integrations:
             logger.info("[INFO] Nenhuma integração ativa encontrada.")
             self.update_state(state='FAILURE', meta={'status': 'Nenhuma integração ativa encontrada.'})
             return
 
         logger.info(f"[INFO] Iniciando a importação de {len(integrations)} integrações ativas.")
-        for integration in integrations:
+        results = {}
+        owner = get_lease_owner(self.request.id)
+        for integration, provider_backend in integrations:
+            # Cada integração é importada por no máximo um worker por vez; as ocupadas são puladas.
+            lease = Lease(integration, owner)
+            if not lease.acquire():
+                logger.info(
+                    f"[INFO] Integração '{integration.name}' já está sendo importada por '{lease.get_holder()}'.")
+                continue
             try:
                 self.update_state(state='PROGRESS', meta={'status': f'Processando integração {integration.name}.'})
-                provider_cls = plugin_registry.get_provider_backend(integration.provider_backend_id)
-                provider_backend = provider_cls(integration=integration, credentials=integration.credentials)
-                normalized_data_list = provider_backend.fetch()
+                with lease.keep_alive(), profile_integration(integration, task_id=self.request.id):
+                    stats = run_ingest_pipeline(provider_backend, lease=lease)
+                results[integration.handle] = stats
 
-                if not normalized_data_list:
+                if not stats['records']:
                     logger.warning(f"[AVISO] Nenhum dado retornado para a integração '{integration.name}'.")
-                    continue
-
-                for normalized_data in normalized_data_list:
-                    if not all(key in normalized_data for key in ["city", "timestamp"]):
-                        logger.error(
-                            f"[ERRO] Dados normalizados incompletos para integração '{integration.name}': {normalized_data}")
-                        continue
-
-                    try:
-                        category = provider_backend.get_category()
-                        event_type = f"{normalized_data['city']} - {category}"
-                        event_date = normalized_data["timestamp"].date().isoformat()
-                        city = normalized_data["city"]
-
-                        normalized_data_serializable = provider_backend.serialize_data(normalized_data)
-
-                        event = provider_backend.get_or_create_event(
-                            event_type=event_type,
-                            event_date=event_date,
-                            city=city,
-                            category=category,
-                            extra_fields=normalized_data_serializable
-                        )
-                        provider_backend.create_contextual_data(event, normalized_data_serializable)
-                    except Exception as e:
-                        logger.error(
-                            f"[ERRO] Falha ao processar dados normalizados para integração '{integration.name}': {e}")
 
+            except LeaseLost as e:
+                logger.warning(f"[AVISO] Importação da integração '{integration.name}' interrompida: {e}")
             except Exception as e:
                 logger.error(f"[ERRO] Falha ao processar integração '{integration.name}': {e}")
+                metrics.retries.labels(*metrics.get_labels(provider_backend)).inc()
                 self.retry(exc=e)
+            finally:
+                lease.release()
 
         self.update_state(state='SUCCESS', meta={'status': 'Importação concluída com sucesso.'})
+        return results
     except SoftTimeLimitExceeded:
         logger.error("[ERRO] Tempo limite excedido para a task.")
         self.update_state(state='FAILURE', meta={'status': 'Tempo limite excedido.'})
+
+
+def persist_webhook_deliveries(provider_backend, consumed):
+    """
+    Persiste em um único lote os dados normalizados das entregas [(entrega, dados)]. Se o lote falhar,
+    persiste entrega a entrega (em savepoints), para que apenas as entregas com problema fiquem de fora.
+    Retorna (registros importados, entregas persistidas, falhas [(entrega, erro)]).
+    """
+    try:
+        with transaction.atomic():
+            records_imported = provider_backend.persist_records([data for _, items in consumed for data in items])
+        return records_imported, [delivery for delivery, _ in consumed], []
+    except Exception as e:
+        logger.error(
+            f"[ERRO] Falha ao persistir lote de webhooks da integração "
+            f"'{provider_backend.integration.name}', persistindo entrega a entrega: {e}")
+
+    records_imported = 0
+    persisted = []
+    failures = []
+    for delivery, items in consumed:
+        try:
+            with transaction.atomic():
+                records_imported += provider_backend.persist_records(items)
+            persisted.append(delivery)
+        except Exception as e:
+            failures.append((delivery, e))
+    return records_imported, persisted, failures
+
+
+def record_webhook_failures(failures):
+    """
+    Registra a tentativa e o erro das entregas que falharam; as que atingem WEBHOOK_MAX_ATTEMPTS
+    são marcadas como falhas (failed_at) e deixam de ser consumidas.
+    Retorna as entregas que ainda serão tentadas novamente.
+    """
+    now = timezone.now()
+    deliveries = []
+    for delivery, error in failures:
+        delivery.attempts += 1
+        delivery.last_error = str(error)[:2000]
+        if delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            delivery.failed_at = now
+            logger.error(
+                f"[ERRO] Entrega de webhook '{delivery.uid}' ({delivery.event}) marcada como falha após "
+                f"{delivery.attempts} tentativas: {error}")
+        deliveries.append(delivery)
+    WebhookDelivery.objects.bulk_update(deliveries, ['attempts', 'last_error', 'failed_at'])
+    return [delivery for delivery in deliveries if delivery.failed_at is None]
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60, soft_time_limit=300,
+             queue=settings.CELERY_HIGH_PRIORITY_QUEUE)
+def consume_webhook_deliveries(self, integration_uid):
+    """
+    Processa em lote as entregas de webhook pendentes de uma integração.
+    Cada lote é travado com SKIP LOCKED, permitindo várias execuções concorrentes sem processamento duplicado.
+
+    As entregas persistidas são removidas; as que falham (no consumo ou na persistência) são mantidas
+    com o número de tentativas e a task é reagendada. Ao atingir WEBHOOK_MAX_ATTEMPTS, a entrega é
+    marcada como falha e não bloqueia as seguintes (pode ser reprocessada pelo Django Admin).
+    """
+    integration = Integration.objects.select_related('credentials').filter(uid=integration_uid, is_active=True).first()
+    if not integration:
+        logger.warning(f"[AVISO] Integração '{integration_uid}' não encontrada ou inativa para consumo de webhooks.")
+        return
+
+    provider_cls = plugin_registry.get_provider_backend(integration.provider_backend_id)
+    provider_backend = provider_cls(integration=integration, credentials=integration.credentials)
+
+    retrying = []
+    try:
+        while not retrying:
+            with transaction.atomic():
+                deliveries = list(
+                    WebhookDelivery.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(integration=integration, failed_at__isnull=True)
+                    .order_by('received_at')[:settings.WEBHOOK_BATCH_SIZE]
+                )
+                if not deliveries:
+                    break
+
+                consumed = []
+                failures = []
+                for delivery in deliveries:
+                    try:
+                        consumed.append((delivery, provider_backend.consume(delivery.event, delivery.payload) or []))
+                    except Exception as e:
+                        logger.error(
+                            f"[ERRO] Falha ao consumir evento '{delivery.event}' da integração '{integration.name}': {e}")
+                        failures.append((delivery, e))
+
+                records_imported, persisted, persist_failures = persist_webhook_deliveries(provider_backend, consumed)
+                failures.extend(persist_failures)
+                WebhookDelivery.objects.filter(pk__in=[delivery.pk for delivery in persisted]).delete()
+                if failures:
+                    retrying = record_webhook_failures(failures)
+
+            provider_backend.save_log(
+                success=not failures,
+                message=f"{len(persisted)} entregas de webhook processadas, {len(failures)} com falha.",
+                method=IntegrationLog.MethodChoices.CONSUME,
+                records_imported=records_imported,
+            )
+    except SoftTimeLimitExceeded:
+        logger.error("[ERRO] Tempo limite excedido para a task.")
+        return
+
+    # As entregas com falha continuam sendo as mais antigas: o próximo lote só é lido na nova tentativa.
+    if retrying:
+        if self.request.retries >= self.max_retries:
+            logger.error(
+                f"[ERRO] Retentativas esgotadas para os webhooks da integração '{integration.name}': "
+                f"{len(retrying)} entregas pendentes serão tentadas no próximo consumo.")
+            return
+        self.retry(exc=WebhookDeliveryError(retrying[-1].last_error))
@@ -0,0 +1,1151 @@
+import base64
+import datetime
+import importlib
+import tempfile
+import time
+import uuid
+from collections import Counter
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django_celery_beat.models import IntervalSchedule, PeriodicTask
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from benchmarks.fake_openweather import FakeOpenWeatherServer
+from core.testing import Budget, BudgetTestMixin
+from integrations.api.authentication import APIKeyAuthentication, get_api_key_cache_key
+from integrations.api.throttling import CostWeightedRateThrottle
+from integrations import metrics
+from integrations.admin_forms import get_integration_form_class
+from integrations.api.views import ContextualEventViewSet
+from integrations.caching import ActiveIntegrationsCache, active_integrations, validated_objects
+from integrations.dedup import get_match_key
+from integrations.geo import (
+    encode_geohash,
+    filter_within,
+    get_bounding_box,
+    get_covering_cells,
+    haversine_km,
+    split_bounding_box,
+)
+from integrations.helpers import bulk_upsert_events
+from integrations.leases import Lease, LeaseLost
+from integrations.models import (
+    APIKey,
+    CityAlias,
+    ContextualData,
+    ContextualDataRollup,
+    ContextualEvent,
+    CredentialsEntity,
+    IngestLease,
+    Integration,
+    IntegrationLog,
+    ProfileSample,
+    WeatherObservation,
+    WebhookDelivery,
+)
+from integrations.profiling import SamplingProfiler
+from integrations.providers.http import ByteCounter, iter_json_records, iter_pages, stream_json_records
+from integrations.registry import PluginRegistry
+from integrations.sharding import HashRing
+from integrations.utils import get_observed_at
+from integrations.providers.openweather.provider import OpenWeatherProviderBackend
+from integrations.tasks import consume_webhook_deliveries, fetch_all_active_integrations
+
+BATCH_SIZE = 50
+
+
+def create_integration(base_url='http://127.0.0.1:9', mode='forecast', handle='budget'):
+    credentials = CredentialsEntity.objects.create(
+        name='Credenciais de teste',
+        handle=f'{handle}-credentials',
+        credentials_type_id='open_weather',
+        credentials_type_data={'base_url': base_url},
+        credentials_type_private_data={'api_key': 'test-api-key'},
+        is_active=True,
+    )
+    return Integration.objects.create(
+        name='Integração de teste',
+        handle=handle,
+        credentials=credentials,
+        provider_backend_id='open_weather',
+        provider_backend_data={'city': 'São Paulo', 'language': 'pt_br', 'mode': mode},
+        is_active=True,
+    )
+
+
+def create_contextual_data(integration, size):
+    """Cria `size` eventos em datas distintas, cada um com um dado contextual e um log da integração."""
+    start = datetime.date(2024, 1, 1)
+    bulk_upsert_events([
+        {
+            'event_type': 'weather',
+            'event_date': start + datetime.timedelta(days=index),
+            'location': 'São Paulo',
+            'city': 'São Paulo',
+            'category': 'weather',
+            'integration': integration,
+            'extra_fields': {},
+            'data': {'temperature': 20 + index % 10},
+        }
+        for index in range(size)
+    ])
+    IntegrationLog.objects.bulk_create([
+        IntegrationLog(integration=integration, message=f'Log {index}', success=True)
+        for index in range(size)
+    ])
+
+
+def reset_contextual_data():
+    IntegrationLog.objects.all().delete()
+    ContextualEvent.objects.all().delete()
+
+
+@override_settings(INGEST_BATCH_SIZE=BATCH_SIZE, INGEST_PREFETCH_PAGES=0)
+class FetchAllActiveIntegrationsBudgetTests(BudgetTestMixin, TestCase):
+    """
+    A importação deve custar um número fixo de consultas por lote persistido, independentemente
+    da quantidade de registros do lote (mais a aquisição e a liberação do lease da integração).
+    O prefetch em thread fica desligado para que todas as consultas passem pela conexão observada.
+    """
+    budget = Budget(queries=12, per_unit=12, unit_size=BATCH_SIZE, seconds=5, seconds_per_unit=2)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeOpenWeatherServer().start()
+        cls.addClassCleanup(cls.server.stop)
+
+    def setUp(self):
+        self.integration = create_integration(self.server.base_url)
+
+    def prepare(self, size):
+        reset_contextual_data()
+        self.server.forecast_records = size
+        return size
+
+    def run_task(self, size):
+        result = fetch_all_active_integrations.apply()
+        self.assertEqual(result.result[self.integration.handle]['persisted'], size)
+
+    def test_queries_per_batch(self):
+        self.assertScales(
+            self.budget,
+            [BATCH_SIZE // 2, BATCH_SIZE, BATCH_SIZE * 4],
+            self.prepare,
+            self.run_task,
+            label='fetch_all_active_integrations',
+        )
+
+
+class ContextualDataAPIBudgetTests(BudgetTestMixin, TestCase):
+    """As listagens da API (inclusive a de dados contextuais com depth=1) custam O(1) consultas por página."""
+    budget = Budget(queries=4, seconds=2)
+
+    def setUp(self):
+        self.integration = create_integration()
+        user = get_user_model().objects.create_superuser('budget', 'budget@example.com', 'budget')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def prepare(self, size):
+        reset_contextual_data()
+        create_contextual_data(self.integration, size)
+        return size
+
+    def get_list(self, url_name):
+        def operation(size):
+            response = self.client.get(reverse(url_name))
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(len(response.data['results']), size)
+        return operation
+
+    def test_contextual_data_list(self):
+        self.assertScales(self.budget, [2, 10], self.prepare, self.get_list('integrations:contextual-data-list'),
+                          label='GET contextual-data')
+
+    def test_contextual_event_list(self):
+        self.assertScales(self.budget, [2, 10], self.prepare, self.get_list('integrations:contextual-events-list'),
+                          label='GET contextual-events')
+
+
+class AdminChangelistBudgetTests(BudgetTestMixin, TestCase):
+    """As changelists do admin custam O(1) consultas por página."""
+    budget = Budget(queries=10, seconds=3)
+
+    def setUp(self):
+        self.integration = create_integration()
+        user = get_user_model().objects.create_superuser('budget', 'budget@example.com', 'budget')
+        self.client.force_login(user)
+
+    def prepare(self, size):
+        reset_contextual_data()
+        create_contextual_data(self.integration, size)
+        return size
+
+    def get_changelist(self, model):
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+
+        def operation(size):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['cl'].result_list), size)
+        return operation
+
+    def test_changelists(self):
+        for model in (IntegrationLog, ContextualEvent, ContextualData):
+            with self.subTest(model=model._meta.model_name):
+                self.assertScales(self.budget, [5, 50], self.prepare, self.get_changelist(model),
+                                  label=f'admin {model._meta.model_name}')
+
+    def test_search(self):
+        create_contextual_data(self.integration, 3)
+        searches = (
+            (IntegrationLog, 'Log 1', 1),
+            (ContextualEvent, 'weather', 3),
+            (ContextualData, 'São Paulo', 3),
+            (ContextualData, 'Recife', 0),
+        )
+        for model, search_term, expected in searches:
+            with self.subTest(model=model._meta.model_name, search_term=search_term):
+                url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+                response = self.client.get(url, {'q': search_term})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['cl'].result_list), expected)
+
+
+class HashRingTests(SimpleTestCase):
+    """A distribuição das integrações entre os shards é equilibrada e estável ao adicionar shards."""
+    keys = [uuid.UUID(int=index * 7919 + 1) for index in range(4000)]
+
+    def test_balance(self):
+        ring = HashRing([f'ingest.{index}' for index in range(4)])
+        counts = Counter(ring.get_node(key) for key in self.keys)
+        self.assertEqual(len(counts), 4)
+        for count in counts.values():
+            self.assertLess(abs(count - 1000), 250)
+
+    def test_adding_shard_moves_only_to_new_shard(self):
+        before = HashRing([f'ingest.{index}' for index in range(4)])
+        after = HashRing([f'ingest.{index}' for index in range(5)])
+        moved = [key for key in self.keys if before.get_node(key) != after.get_node(key)]
+        self.assertTrue(all(after.get_node(key) == 'ingest.4' for key in moved))
+        self.assertLess(len(moved), len(self.keys) * 0.3)
+
+
+class GeoTests(TestCase):
+    """As células de geohash cobrem todo o retângulo, inclusive no antimeridiano e nos polos."""
+
+    def get_points(self, min_lat, min_lon, max_lat, max_lon, steps=20):
+        for lat_index in range(steps + 1):
+            for lon_index in range(steps + 1):
+                yield (
+                    min_lat + (max_lat - min_lat) * lat_index / steps,
+                    min_lon + (max_lon - min_lon) * lon_index / steps,
+                )
+
+    def assertCovers(self, min_lat, min_lon, max_lat, max_lon):
+        for box in split_bounding_box(min_lat, min_lon, max_lat, max_lon):
+            cells = get_covering_cells(*box)
+            self.assertLessEqual(len(cells), 32)
+            for latitude, longitude in self.get_points(*box):
+                geohash = encode_geohash(latitude, longitude)
+                self.assertTrue(any(geohash.startswith(cell) for cell in cells), (box, latitude, longitude))
+
+    def test_covering_cells(self):
+        self.assertCovers(-23.6, -46.8, -23.4, -46.5)
+        self.assertCovers(-90.0, -180.0, 90.0, 180.0)
+
+    def test_antimeridian(self):
+        min_lat, min_lon, max_lat, max_lon = get_bounding_box(0.0, 179.9, 50)
+        self.assertGreater(min_lon, max_lon)
+        self.assertLess(max_lon, -179.0)
+        self.assertCovers(min_lat, min_lon, max_lat, max_lon)
+
+    def test_poles(self):
+        # O círculo contém o polo: todas as longitudes, mesmo as opostas ao centro.
+        self.assertEqual(get_bounding_box(89.0, 0.0, 150)[1:], (-180.0, 90.0, 180.0))
+        self.assertEqual(get_bounding_box(-89.5, 10.0, 100)[:2], (-90.0, -180.0))
+        # Perto do polo, sem contê-lo, a faixa de longitudes é maior que a do paralelo do centro.
+        max_lon = get_bounding_box(88.0, 0.0, 100)[3]
+        edge_distance = min(haversine_km(88.0, 0.0, index / 100, max_lon) for index in range(8800, 9000))
+        self.assertAlmostEqual(edge_distance, 100, delta=0.5)
+        self.assertCovers(89.0, -180.0, 90.0, 180.0)
+
+    def test_filter_within(self):
+        integration = create_integration()
+        points = {
+            'antimeridiano': (0.0, -179.95),
+            'longe': (0.0, 178.0),
+            'polo': (89.6, 120.0),
+            'polo longe': (87.0, 120.0),
+        }
+        bulk_upsert_events([
+            {
+                'event_type': f'{name} - weather', 'event_date': datetime.date(2024, 1, 1), 'location': None,
+                'city': name, 'category': 'weather', 'integration': integration, 'extra_fields': {},
+                'latitude': latitude, 'longitude': longitude,
+            }
+            for name, (latitude, longitude) in points.items()
+        ])
+
+        def within(latitude, longitude, radius_km):
+            return set(filter_within(ContextualEvent.objects.all(), latitude, longitude, radius_km)
+                       .values_list('city', flat=True))
+
+        self.assertEqual(within(0.0, 179.95, 50), {'antimeridiano'})
+        self.assertLess(haversine_km(89.0, 0.0, 89.6, 120.0), 150)
+        self.assertEqual(within(89.0, 0.0, 150), {'polo'})
+
+
+class DispatchScheduleMigrationTests(TestCase):
+    """A migração troca o agendamento da importação sem shard por dispatch_ingest_shards."""
+    migration = importlib.import_module('integrations.migrations.0017_dispatch_ingest_shards_schedule')
+
+    def test_replace_fetch_schedule(self):
+        interval = IntervalSchedule.objects.create(every=5, period=IntervalSchedule.MINUTES)
+        for name, kwargs in [('importação', '{}'), ('importação 2', '{}'), ('shard', '{"queue": "ingest.0"}')]:
+            PeriodicTask.objects.create(name=name, task=self.migration.FETCH_TASK, interval=interval, kwargs=kwargs)
+
+        with mock.patch('builtins.print'):
+            self.migration.replace_fetch_schedule(apps, mock.Mock(connection=mock.Mock(alias='default')))
+
+        self.assertEqual(
+            set(PeriodicTask.objects.values_list('name', 'task', 'enabled')),
+            {
+                ('importação', self.migration.DISPATCH_TASK, True),
+                ('importação 2', self.migration.FETCH_TASK, False),
+                ('shard', self.migration.FETCH_TASK, True),
+            },
+        )
+
+
+class JSONStreamTests(SimpleTestCase):
+    """O leitor incremental de JSON gera os itens do array independentemente da divisão em blocos."""
+
+    def get_chunks(self, document, size):
+        raw = document.encode()
+        return [raw[start:start + size] for start in range(0, len(raw), size)]
+
+    def read(self, document, path=None, size=1):
+        return list(iter_json_records(self.get_chunks(document, size), path))
+
+    def test_values_split_across_chunks(self):
+        document = '[{"cidade": "São Paulo", "temperatura": 12345.5}, "ção", 42, [true, null]]'
+        expected = [{'cidade': 'São Paulo', 'temperatura': 12345.5}, 'ção', 42, [True, None]]
+        for size in (1, 2, 3, 7, 1024):
+            self.assertEqual(self.read(document, size=size), expected, size)
+
+    def test_nested_path(self):
+        document = '{"cod": "200", "meta": {"ignorado": [1, {"list": []}], "list": [{"a": 1}, {"a": 2}]}}'
+        self.assertEqual(self.read(document, 'meta.list', size=5), [{'a': 1}, {'a': 2}])
+
+    def test_empty_array(self):
+        self.assertEqual(self.read('{"list": [ ]}', 'list'), [])
+        self.assertEqual(self.read('[]'), [])
+
+    def test_missing_key(self):
+        with self.assertRaises(KeyError):
+            self.read('{"cod": "200", "message": 0}', 'list')
+
+    def test_invalid_documents(self):
+        for document in ('[{"a": 1}, {"b"', '[1, 2', '[1 2]', '{"list": {}}', ''):
+            with self.subTest(document=document), self.assertRaises(ValueError):
+                self.read(document, 'list' if document.startswith('{') else None, size=3)
+
+    def test_byte_counter(self):
+        document = '{"list": [{"cidade": "Belém"}, {"cidade": "Goiânia"}]}'
+        response = mock.Mock()
+        response.iter_content.side_effect = lambda chunk_size: iter(self.get_chunks(document, chunk_size))
+        counter = ByteCounter()
+
+        records = stream_json_records(response, path='list', chunk_size=4, counter=counter)
+        self.assertEqual([page for page in iter_pages(records, 1)], [[{'cidade': 'Belém'}], [{'cidade': 'Goiânia'}]])
+        self.assertEqual(counter.size, len(document.encode()))
+
+
+class MetricsTests(TestCase):
+    """As etapas da ingestão são medidas e expostas em /metrics, protegido por METRICS_TOKEN quando configurado."""
+    labels = ('open_weather', 'metrics-test')
+
+    def get_value(self, name, **labels):
+        provider, integration = self.labels
+        return REGISTRY.get_sample_value(name, {'provider': provider, 'integration': integration, **labels}) or 0
+
+    def test_time_stage_and_iter(self):
+        persist = self.get_value('hopen_ingest_stage_seconds_count', stage='persist')
+        fetch = self.get_value('hopen_ingest_stage_seconds_count', stage='fetch')
+
+        with metrics.time_stage(self.labels, 'persist'):
+            pass
+        self.assertEqual(list(metrics.time_iter(iter([1, 2, 3]), self.labels, 'fetch')), [1, 2, 3])
+
+        self.assertEqual(self.get_value('hopen_ingest_stage_seconds_count', stage='persist'), persist + 1)
+        self.assertEqual(self.get_value('hopen_ingest_stage_seconds_count', stage='fetch'), fetch + 3)
+
+    def test_time_queries(self):
+        db_seconds = self.get_value('hopen_ingest_db_seconds_total')
+        with metrics.time_queries(self.labels) as timer:
+            list(Integration.objects.all())
+            list(IntegrationLog.objects.all())
+        self.assertGreater(timer.elapsed, 0)
+        self.assertAlmostEqual(self.get_value('hopen_ingest_db_seconds_total'), db_seconds + timer.elapsed)
+
+    def test_query_timer_counts_failed_queries(self):
+        timer = metrics.QueryTimer()
+        execute = mock.Mock(side_effect=RuntimeError)
+        with self.assertRaises(RuntimeError):
+            timer(execute, 'SELECT 1', None, False, {})
+        execute.assert_called_once_with('SELECT 1', None, False, {})
+        self.assertGreater(timer.elapsed, 0)
+
+    def test_endpoint_without_token(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE_LATEST)
+        self.assertIn(b'hopen_ingest_records', response.content)
+
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_endpoint_with_token(self):
+        for headers in ({}, {'Authorization': 'Bearer outro'}):
+            response = self.client.get(reverse('metrics'), headers=headers)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer segredo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE_LATEST)
+
+
+class ValidatedObjectCacheTests(TestCase):
+    """Os objetos validados em cache acompanham o valor atual do campo JSON, mesmo sem save()."""
+
+    def setUp(self):
+        validated_objects.clear()
+        self.integration = create_integration()
+
+    def get_config(self, integration):
+        return OpenWeatherProviderBackend(integration).config
+
+    def test_cache_hit(self):
+        config = self.get_config(self.integration)
+        self.assertIs(self.get_config(Integration.objects.get(pk=self.integration.pk)), config)
+
+    def test_update_without_save(self):
+        self.get_config(self.integration)
+        Integration.objects.filter(pk=self.integration.pk).update(
+            provider_backend_data={'city': 'Recife', 'language': 'pt_br', 'mode': 'forecast'})
+        self.assertEqual(self.get_config(Integration.objects.get(pk=self.integration.pk)).city, 'Recife')
+
+    def test_in_memory_change(self):
+        self.get_config(self.integration)
+        self.integration.provider_backend_data['city'] = 'Recife'
+        self.assertEqual(self.get_config(self.integration).city, 'Recife')
+
+
+class ActiveIntegrationsCacheTests(TestCase):
+    """
+    A lista de integrações ativas é recarregada quando a consulta de versão muda, inclusive por alterações
+    feitas em outro processo (uma instância separada do cache, que os sinais deste processo não invalidam).
+    """
+
+    def setUp(self):
+        self.integration = create_integration()
+        self.other = create_integration(handle='other')
+        self.cache = ActiveIntegrationsCache()
+
+    def get_handles(self):
+        return {integration.handle for integration, _ in self.cache.get_entries()}
+
+    def test_warm_cache(self):
+        self.assertEqual(self.get_handles(), {'budget', 'other'})
+        with self.assertNumQueries(1):
+            entries = self.cache.get_entries()
+        self.assertIs(entries[0][1].integration, entries[0][0])
+
+    def test_deactivate_integration(self):
+        self.get_handles()
+        Integration.objects.filter(pk=self.other.pk).update(is_active=False)
+        self.assertEqual(self.get_handles(), {'budget'})
+
+    def test_edit_credentials(self):
+        self.get_handles()
+        credentials = self.integration.credentials
+        credentials.credentials_type_data = {'base_url': 'http://127.0.0.1:10'}
+        credentials.save()
+        provider_backends = {
+            integration.pk: provider_backend for integration, provider_backend in self.cache.get_entries()
+        }
+        base_url = provider_backends[self.integration.pk].credentials.base_url
+        self.assertEqual(str(base_url).rstrip('/'), 'http://127.0.0.1:10')
+
+    def test_delete_integration(self):
+        self.get_handles()
+        self.other.delete()
+        self.assertEqual(self.get_handles(), {'budget'})
+
+    def test_signals_invalidate_worker_cache(self):
+        active_integrations.get_entries()
+        self.integration.name = 'Integração renomeada'
+        self.integration.save()
+        self.assertIsNone(active_integrations._entries)
+
+
+class IntegrationFormCacheTests(TestCase):
+    """O schema do formulário de integração é cacheado por integração (get_schema_dict(integration=...))."""
+
+    def test_schema_per_integration(self):
+        first, second = create_integration(handle='first'), create_integration(handle='second')
+        with mock.patch.object(OpenWeatherProviderBackend, 'get_schema_dict', return_value={}) as get_schema_dict:
+            get_integration_form_class(OpenWeatherProviderBackend, integration=first)
+            get_integration_form_class(OpenWeatherProviderBackend, integration=second)
+            get_integration_form_class(OpenWeatherProviderBackend, integration=first)
+
+        self.assertEqual(
+            [call.kwargs['integration'] for call in get_schema_dict.call_args_list], [first, second])
+
+
+class PluginRegistryTests(SimpleTestCase):
+    """Um manifesto desatualizado é refeito quando um plugin consultado não consta dele."""
+
+    def test_rebuild_on_missing_plugin(self):
+        registry = PluginRegistry()
+        registry._manifest = {'fingerprint': '', 'credentials': {}, 'providers': {}}
+        with override_settings(PLUGIN_MANIFEST_PATH=f'{tempfile.mkdtemp()}/manifest.json'):
+            self.assertIs(registry.get_provider_backend('open_weather'), OpenWeatherProviderBackend)
+            self.assertIsNone(registry.get_provider_backend('inexistente'))
+            with mock.patch.object(registry, 'build_manifest') as build_manifest:
+                self.assertIsNone(registry.get_provider_backend('inexistente'))
+        build_manifest.assert_not_called()
+
+
+class LeaseTests(TestCase):
+    """Cada integração tem no máximo um dono de lease; leases expirados podem ser assumidos."""
+
+    def setUp(self):
+        self.integration = create_integration()
+
+    def test_exclusive(self):
+        first = Lease(self.integration, 'worker-1')
+        second = Lease(self.integration, 'worker-2')
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertEqual(second.get_holder(), 'worker-1')
+
+        first.release()
+        self.assertTrue(second.acquire())
+
+    def test_stale_takeover(self):
+        first = Lease(self.integration, 'worker-1')
+        self.assertTrue(first.acquire())
+        IngestLease.objects.update(expires_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc))
+
+        second = Lease(self.integration, 'worker-2')
+        self.assertTrue(second.acquire())
+        with self.assertRaises(LeaseLost):
+            first.renew(force=True)
+
+        first.release()
+        self.assertEqual(second.get_holder(), 'worker-2')
+
+    def test_busy_integration_is_skipped(self):
+        Lease(self.integration, 'other-worker').acquire()
+        result = fetch_all_active_integrations.apply()
+        self.assertEqual(result.result, {})
+        self.assertEqual(IngestLease.objects.get().owner, 'other-worker')
+
+
+class LeaseHeartbeatTests(TransactionTestCase):
+    """
+    Enquanto a importação executa, o lease é renovado por uma thread com a sua própria conexão
+    (por isso os dados precisam estar gravados, fora da transação de um TestCase).
+    """
+
+    def setUp(self):
+        self.integration = create_integration()
+
+    def get_expires_at(self):
+        return IngestLease.objects.values_list('expires_at', flat=True).get()
+
+    def test_renewed_while_blocked(self):
+        lease = Lease(self.integration, 'worker-1', ttl=3, renew_interval=1)
+        self.assertTrue(lease.acquire())
+        expires_at = self.get_expires_at()
+        with lease.keep_alive():
+            time.sleep(1.5)
+        self.assertGreater(self.get_expires_at(), expires_at)
+        lease.renew()
+        lease.release()
+
+    def test_lost_lease_aborts(self):
+        lease = Lease(self.integration, 'worker-1', ttl=3, renew_interval=1)
+        self.assertTrue(lease.acquire())
+        with lease.keep_alive():
+            IngestLease.objects.update(owner='worker-2')
+            time.sleep(1.5)
+        with self.assertNumQueries(0), self.assertRaises(LeaseLost):
+            lease.renew()
+        lease.release()
+        self.assertEqual(lease.get_holder(), 'worker-2')
+
+
+class GenerateSyntheticDataTests(TransactionTestCase):
+    """Os dados sintéticos têm os mesmos campos derivados que a ingestão grava (gravados por outros processos)."""
+
+    def test_observed_at(self):
+        call_command(
+            'generate_synthetic_data', integrations=1, cities=2, days=2, versions=2, logs_per_day=1, workers=1,
+            end_date=datetime.date(2024, 1, 2), stdout=mock.Mock(),
+        )
+        rows = list(ContextualData.objects.values_list('observed_at', 'extra_fields'))
+        self.assertEqual(len(rows), 8)
+        for observed_at, extra_fields in rows:
+            self.assertEqual(observed_at, get_observed_at(extra_fields))
+
+
+class BulkUpsertEventsTests(TestCase):
+    """Itens com a mesma chave de deduplicação resultam em um único evento, criado uma única vez."""
+
+    def setUp(self):
+        self.integration = create_integration()
+
+    def get_item(self, city='São Paulo', temperature=20):
+        return {
+            'event_type': f'{city} - weather',
+            'event_date': datetime.date(2024, 1, 1),
+            'location': None,
+            'city': city,
+            'category': 'weather',
+            'integration': self.integration,
+            'extra_fields': {},
+            'data': {'temperature': temperature},
+        }
+
+    def test_repeated_key_in_batch(self):
+        results = bulk_upsert_events([self.get_item(), self.get_item('sao paulo', 21), self.get_item(temperature=22)])
+
+        self.assertEqual([created for _, created, _ in results], [True, False, False])
+        self.assertEqual(len({event.pk for event, _, _ in results}), 1)
+        self.assertEqual(ContextualEvent.objects.count(), 1)
+        self.assertEqual([data.version for _, _, data in results], [1, 2, 3])
+
+    def test_existing_event(self):
+        bulk_upsert_events([self.get_item()])
+        results = bulk_upsert_events([self.get_item(temperature=25)])
+
+        self.assertFalse(results[0][1])
+        self.assertEqual(results[0][2].version, 2)
+        self.assertEqual(ContextualEvent.objects.count(), 1)
+
+    def test_event_created_concurrently(self):
+        event = bulk_upsert_events([self.get_item()])[0][0]
+        # Outro processo criou o evento depois da consulta: o conflito no índice único vira atualização.
+        with mock.patch('integrations.helpers._get_existing_events', return_value={}):
+            results = bulk_upsert_events([self.get_item('Sao Paulo', 25)])
+
+        self.assertEqual(results[0][0].pk, event.pk)
+        self.assertFalse(results[0][1])
+        self.assertEqual(results[0][2].version, 2)
+        self.assertEqual(ContextualEvent.objects.count(), 1)
+
+
+class EventDeduplicationTests(TestCase):
+    """A chave de deduplicação é única: criações concorrentes e religações unem os eventos."""
+
+    def setUp(self):
+        self.integration = create_integration()
+        self.provider_backend = OpenWeatherProviderBackend(self.integration)
+
+    def get_or_create_event(self, city):
+        return self.provider_backend.get_or_create_event(f'{city} - weather', datetime.date(2024, 1, 1), city=city)
+
+    def test_alias_replaces_whole_words(self):
+        aliases = {'rio': 'rio de janeiro'}
+        day = datetime.date(2024, 1, 1)
+        self.assertEqual(
+            get_match_key('Rio - Period weather', day, city='Rio', aliases=aliases),
+            get_match_key('Rio de Janeiro - Period weather', day, city='Rio de Janeiro', aliases=aliases),
+        )
+
+    def test_get_or_create_event_race(self):
+        event = self.get_or_create_event('São Paulo')
+        # Simula a criação por outro processo entre a consulta e a inserção.
+        with mock.patch.object(QuerySet, 'first', return_value=None):
+            self.assertEqual(self.get_or_create_event('Sao Paulo').pk, event.pk)
+        self.assertEqual(ContextualEvent.objects.count(), 1)
+
+    def test_relink_merges_events(self):
+        items = [
+            {
+                'event_type': f'{city} - weather', 'event_date': datetime.date(2024, 1, 1), 'location': None,
+                'city': city, 'category': 'weather', 'integration': self.integration, 'extra_fields': {},
+                'data': {'temperature': 20},
+            }
+            for city in ('São Paulo', 'Sampa', 'Sampa')
+        ]
+        bulk_upsert_events(items)
+        self.assertEqual(ContextualEvent.objects.count(), 2)
+
+        CityAlias.objects.create(alias='sampa', city='São Paulo')
+        call_command('relink_contextual_events', stdout=mock.Mock())
+
+        event = ContextualEvent.objects.get()
+        self.assertEqual(event.city, 'São Paulo')
+        self.assertEqual(sorted(event.contextual_data.values_list('version', flat=True)), [1, 2, 3])
+
+    def test_duplicate_event_api(self):
+        self.get_or_create_event('São Paulo')
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_superuser('dedup', 'dedup@example.com', 'dedup'))
+        response = client.post(reverse('integrations:contextual-events-list'), {
+            'event_type': 'Sao Paulo - weather', 'event_date': '2024-01-01', 'city': 'Sao Paulo',
+        }, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+
+
+class WeatherObservationProjectionTests(TestCase):
+    """A ingestão materializa a projeção tipada, filtrável pela API (weather.*)."""
+
+    def setUp(self):
+        self.integration = create_integration()
+        provider_backend = OpenWeatherProviderBackend(self.integration)
+        provider_backend.persist_records([
+            {
+                'temperature': temperature, 'humidity': 50, 'weather': 'céu limpo', 'city': city, 'country': 'BR',
+                'timestamp': datetime.datetime(2024, 1, 1, 12),
+            }
+            for city, temperature in (('São Paulo', 20.0), ('Recife', 30.0))
+        ])
+
+    def test_projection_values(self):
+        observation = WeatherObservation.objects.get(contextual_data__event__city='Recife')
+        self.assertEqual(observation.temperature, 30.0)
+        self.assertEqual(observation.humidity, 50)
+        self.assertEqual(observation.country, 'BR')
+        # Datas sem fuso são consideradas UTC.
+        self.assertEqual(observation.observed_at, datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc))
+
+    def test_filter_by_projection(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_superuser('rql', 'rql@example.com', 'rql'))
+        response = client.get(reverse('integrations:contextual-data-list') + '?weather.temperature=gt=25')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([item['event']['city'] for item in response.data['results']], ['Recife'])
+
+
+class RQLFilterTests(TestCase):
+    """Filtros RQL da API: chaves de campos JSON, projeção weather.*, erros de sintaxe e limite de custo."""
+
+    def setUp(self):
+        self.integration = create_integration()
+        OpenWeatherProviderBackend(self.integration).persist_records([
+            {
+                'temperature': temperature, 'humidity': humidity, 'weather': 'céu limpo', 'city': city,
+                'country': 'BR', 'timestamp': datetime.datetime(2024, 1, 1, 12),
+            }
+            for city, temperature, humidity in (('São Paulo', 20.0, 80), ('Recife', 30.0, 60), ('Natal', 28.0, 70))
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser('rql', 'rql@example.com', 'rql'))
+
+    def get(self, query):
+        return self.client.get(f"{reverse('integrations:contextual-data-list')}?{query}")
+
+    def get_cities(self, query):
+        response = self.get(query)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [item['event']['city'] for item in response.data['results']]
+
+    def test_json_key_filter(self):
+        self.assertEqual(self.get_cities('eq(extra_fields,city:Recife)'), ['Recife'])
+        # Valores JSON (números) são comparados como números.
+        self.assertEqual(self.get_cities('eq(extra_fields,temperature:20.0)'), ['São Paulo'])
+        self.assertEqual(self.get_cities('eq(extra_fields,humidity:60)'), ['Recife'])
+
+        response = self.get('eq(extra_fields,semvalor)')
+        self.assertEqual(response.status_code, 400, response.content)
+
+    def test_weather_namespace(self):
+        self.assertEqual(
+            self.get_cities('weather.country=BR&weather.humidity=le=70&ordering(-weather.temperature)'),
+            ['Recife', 'Natal'],
+        )
+
+    def test_syntax_error(self):
+        response = self.get('eq(city')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn('rql', response.data)
+
+    @override_settings(RQL_MAX_QUERY_COST=0.001)
+    def test_query_cost(self):
+        response = self.get('weather.country=BR')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(response.data['detail'].code, 'query_too_expensive')
+
+        with override_settings(RQL_MAX_QUERY_COST=0):
+            self.assertEqual(len(self.get_cities('weather.country=BR')), 3)
+
+
+class NormalizeBatchTests(SimpleTestCase):
+    """Registros que falham no mapeamento ou na validação são descartados sem perder o restante do lote."""
+
+    def test_invalid_records_skipped(self):
+        provider_backend = OpenWeatherProviderBackend()
+        raw_records = [
+            get_weather_payload('São Paulo'),
+            {**get_weather_payload('Quebrado'), 'dt': 'não é um timestamp'},
+            {**get_weather_payload('Inválido'), 'main': {'temp': 'quente', 'humidity': 50}},
+            get_weather_payload('Recife', day=2),
+        ]
+        with self.assertLogs(level='WARNING') as logs:
+            normalized_data_list = provider_backend.normalize_batch(raw_records)
+
+        self.assertEqual([data['city'] for data in normalized_data_list], ['São Paulo', 'Recife'])
+        self.assertEqual(normalized_data_list[1]['timestamp'], datetime.datetime(2024, 1, 2))
+        self.assertTrue(any('[AVISO]' in line for line in logs.output))
+        self.assertTrue(any('[ERRO] 1 registros inválidos' in line for line in logs.output))
+
+
+class ContextualDataSyncTests(TestCase):
+    """Gravações feitas pela API (fora da ingestão em lote) mantêm os agregados e a projeção tipada."""
+
+    def setUp(self):
+        self.integration = create_integration()
+        user = get_user_model().objects.create_superuser('sync', 'sync@example.com', 'sync')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.data = {
+            'temperature': 20.0, 'humidity': 50, 'weather': 'céu limpo', 'city': 'São Paulo', 'country': 'BR',
+            'timestamp': '2024-01-01T12:00:00+00:00',
+        }
+        _, _, self.contextual_data = bulk_upsert_events([{
+            'event_type': 'São Paulo - weather',
+            'event_date': datetime.date(2024, 1, 1),
+            'location': None,
+            'city': 'São Paulo',
+            'category': 'weather',
+            'integration': self.integration,
+            'extra_fields': {},
+            'data': self.data,
+        }])[0]
+
+    def get_rollups(self, **filters):
+        return dict(
+            ContextualDataRollup.objects
+            .filter(metric='temperature', granularity=ContextualDataRollup.GranularityChoices.DAY, **filters)
+            .values_list('category', 'total')
+        )
+
+    def test_update_contextual_data(self):
+        url = reverse('integrations:contextual-data-detail', args=[self.contextual_data.pk])
+        response = self.client.patch(url, {'extra_fields': {**self.data, 'temperature': 30.0}}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.assertEqual(self.get_rollups(), {'weather': 30.0})
+        self.assertEqual(WeatherObservation.objects.get(contextual_data=self.contextual_data).temperature, 30.0)
+
+    def test_update_event_category(self):
+        url = reverse('integrations:contextual-events-detail', args=[self.contextual_data.event_id])
+        response = self.client.patch(url, {'category': 'climate'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.assertEqual(self.get_rollups(), {'climate': 20.0})
+
+    def test_delete_contextual_data(self):
+        url = reverse('integrations:contextual-data-detail', args=[self.contextual_data.pk])
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204, response.content)
+
+        self.assertFalse(ContextualDataRollup.objects.exists())
+
+
+class ContextualDataRollupTests(TestCase):
+    """Cada observação (evento, integração, instante) é contada uma única vez, pela última versão."""
+
+    def setUp(self):
+        self.integration = create_integration()
+
+    def ingest(self, *temperatures):
+        bulk_upsert_events([
+            {
+                'event_type': 'São Paulo - weather', 'event_date': datetime.date(2024, 1, 1), 'location': None,
+                'city': 'São Paulo', 'category': 'weather', 'integration': self.integration, 'extra_fields': {},
+                'data': {'temperature': temperature, 'timestamp': '2024-01-01T12:00:00+00:00'},
+            }
+            for temperature in temperatures
+        ])
+
+    def get_rollup(self):
+        return ContextualDataRollup.objects.values_list('count', 'total').get(
+            metric='temperature', granularity=ContextualDataRollup.GranularityChoices.DAY)
+
+    def test_same_observation_fetched_again(self):
+        self.ingest(20.0)
+        self.ingest(20.0)
+        self.ingest(20.0, 20.0)
+        self.assertEqual(ContextualData.objects.count(), 4)
+        self.assertEqual(self.get_rollup(), (1, 20.0))
+
+        call_command('rebuild_contextual_rollups', stdout=mock.Mock())
+        self.assertEqual(self.get_rollup(), (1, 20.0))
+
+    def test_corrected_observation(self):
+        self.ingest(20.0)
+        self.ingest(22.0)
+        self.assertEqual(self.get_rollup(), (1, 22.0))
+
+        self.ingest(22.0, 25.0)
+        self.assertEqual(self.get_rollup(), (1, 25.0))
+
+        call_command('rebuild_contextual_rollups', stdout=mock.Mock())
+        self.assertEqual(self.get_rollup(), (1, 25.0))
+
+
+# Cache compartilhado entre processos (em arquivos) para os testes que dependem dele.
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(prefix='hopen-integrator-cache-'),
+}}
+
+
+class APIKeyAuthenticationCacheTests(TestCase):
+    """O cache de autenticação só é usado com um cache compartilhado e nunca aceita chaves desativadas."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('api-key', 'api-key@example.com', 'api-key')
+        self.api_key = APIKey(name='Chave de teste', user=user)
+        self.raw_key = self.api_key.set_new_key()
+        self.api_key.save()
+        self.authentication = APIKeyAuthentication()
+
+    def authenticate(self):
+        return self.authentication.authenticate_credentials(self.raw_key)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_cache_hit_and_invalidation(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate()[1], self.api_key)
+
+        self.api_key.is_active = False
+        self.api_key.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_expiration_checked_on_cache_hit(self):
+        self.authenticate()
+        # Chave que expirou depois de entrar no cache (sem alteração do registro que a invalidasse).
+        cache_key = get_api_key_cache_key(self.api_key.hashed_key)
+        cached = cache.get(cache_key)
+        cached.expires_at = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+        cache.set(cache_key, cached)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_unknown_key_not_cached(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials('desconhecida')
+        self.assertIsNone(cache.get(get_api_key_cache_key(APIKey.hash_key('desconhecida'))))
+
+    def test_process_local_cache_not_used(self):
+        self.authenticate()
+        self.assertIsNone(cache.get(get_api_key_cache_key(self.api_key.hashed_key)))
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class ThrottlingTests(TestCase):
+    """Limite de taxa ponderado por ação (janela deslizante) e vagas de consultas simultâneas por cliente."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_superuser('throttle', 'throttle@example.com', 'throttle')
+
+    def get_view(self, action='list'):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, self.user)
+        view = ContextualEventViewSet(action_map={'get': action}, args=(), kwargs={}, format_kwarg=None, headers={})
+        view.request = view.initialize_request(request)
+        return view
+
+    def allow(self, view, now):
+        throttle = CostWeightedRateThrottle()
+        throttle.rate = '10/min'
+        throttle.num_requests, throttle.duration = throttle.parse_rate(throttle.rate)
+        with mock.patch('integrations.api.throttling.time.time', return_value=now):
+            allowed = throttle.allow_request(view.request, view)
+        return allowed, throttle
+
+    def test_weighted_rate(self):
+        now = 60 * 1000
+        self.assertTrue(self.allow(self.get_view('list'), now)[0])
+        self.assertTrue(self.allow(self.get_view('list'), now + 1)[0])
+        allowed, throttle = self.allow(self.get_view('retrieve'), now + 2)
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 58)
+
+        # Requisições recusadas não consomem o limite; na janela seguinte, a anterior conta proporcionalmente.
+        self.assertFalse(self.allow(self.get_view('list'), now + 60)[0])
+        self.assertTrue(self.allow(self.get_view('list'), now + 90)[0])
+
+    @override_settings(API_MAX_CONCURRENT_REQUESTS=2)
+    def test_concurrency_slots(self):
+        first, second, third = self.get_view(), self.get_view(), self.get_view()
+        first.initial(first.request)
+        second.initial(second.request)
+        with self.assertRaises(Throttled):
+            third.initial(third.request)
+
+        first.finalize_response(first.request, Response())
+        third.initial(third.request)
+        self.assertEqual(third._concurrency_slot[0], first.get_concurrency_cache_key(first.request) + ':0')
+
+
+def get_weather_payload(city='São Paulo', day=1):
+    return {
+        'name': city,
+        'dt': int(datetime.datetime(2024, 1, day, tzinfo=datetime.timezone.utc).timestamp()),
+        'main': {'temp': 20, 'humidity': 50},
+        'weather': [{'description': 'céu limpo'}],
+        'sys': {'country': 'BR'},
+    }
+
+
+@override_settings(WEBHOOK_MAX_ATTEMPTS=4)
+class WebhookConsumerTests(TestCase):
+    """Entregas com falha não são perdidas nem bloqueiam as demais; após as tentativas, ficam marcadas como falha."""
+
+    def setUp(self):
+        self.integration = create_integration()
+
+    def create_deliveries(self, cities):
+        return [
+            WebhookDelivery.objects.create(
+                integration=self.integration, event='weather.current', payload=get_weather_payload(city, day))
+            for day, city in enumerate(cities, 1)
+        ]
+
+    def consume(self):
+        return consume_webhook_deliveries.apply(args=[str(self.integration.uid)])
+
+    def test_consume_failure(self):
+        original = OpenWeatherProviderBackend.consume
+
+        def consume(provider_backend, event, payload):
+            if payload['name'] == 'Poison':
+                raise ValueError('payload inválido')
+            return original(provider_backend, event, payload)
+
+        self.create_deliveries(['São Paulo', 'Poison', 'Recife'])
+        with mock.patch.object(OpenWeatherProviderBackend, 'consume', consume):
+            self.consume()
+
+        self.assertEqual(ContextualEvent.objects.count(), 2)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.payload['name'], 'Poison')
+        self.assertEqual(delivery.attempts, 4)
+        self.assertIsNotNone(delivery.failed_at)
+        self.assertIn('payload inválido', delivery.last_error)
+
+    def test_persist_failure_isolates_delivery(self):
+        original = OpenWeatherProviderBackend.persist_records
+
+        def persist_records(provider_backend, normalized_data_list):
+            if any(data['city'] == 'Poison' for data in normalized_data_list):
+                raise ValueError('falha ao persistir')
+            return original(provider_backend, normalized_data_list)
+
+        self.create_deliveries(['São Paulo', 'Poison', 'Recife'])
+        with mock.patch.object(OpenWeatherProviderBackend, 'persist_records', persist_records):
+            self.consume()
+
+        self.assertEqual(set(ContextualEvent.objects.values_list('city', flat=True)), {'São Paulo', 'Recife'})
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.payload['name'], 'Poison')
+        self.assertIsNotNone(delivery.failed_at)
+
+    def test_failed_deliveries_do_not_block(self):
+        self.create_deliveries(['Recife'])
+        WebhookDelivery.objects.update(failed_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+        self.create_deliveries(['São Paulo'])
+
+        self.consume()
+
+        self.assertEqual(list(ContextualEvent.objects.values_list('city', flat=True)), ['São Paulo'])
+        self.assertEqual(WebhookDelivery.objects.count(), 1)
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMiddlewareTests(TestCase):
+    """O profiler só é iniciado para administradores, com PROFILING_ENABLED ativo."""
+
+    def setUp(self):
+        self.url = reverse('integrations:contextual-events-list')
+
+    def get_api_key(self, is_staff):
+        user = get_user_model().objects.create_user(f'profiling-{is_staff}', is_staff=is_staff)
+        api_key = APIKey(name='Chave de teste', user=user)
+        raw_key = api_key.set_new_key()
+        api_key.save()
+        return raw_key
+
+    def request(self, raw_key=None):
+        headers = {'X-Profile': '1'}
+        if raw_key:
+            headers['Authorization'] = f'Api-Key {raw_key}'
+        with mock.patch.object(SamplingProfiler, 'start', autospec=True, side_effect=SamplingProfiler.start) as start:
+            response = self.client.get(self.url, headers=headers)
+        return response, start.called
+
+    def test_staff_api_key(self):
+        response, started = self.request(self.get_api_key(is_staff=True))
+        self.assertTrue(started)
+        self.assertTrue(ProfileSample.objects.filter(uid=response['X-Profile-Id']).exists())
+
+    def test_not_started_for_other_clients(self):
+        for raw_key in (None, 'chave-invalida', self.get_api_key(is_staff=False)):
+            response, started = self.request(raw_key)
+            self.assertFalse(started)
+            self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(ProfileSample.objects.exists())
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        response, started = self.request(self.get_api_key(is_staff=True))
+        self.assertFalse(started)
+        self.assertEqual(response.status_code, 200)
+
+    def test_staff_session(self):
+        user = get_user_model().objects.create_user('profiling-session', is_staff=True)
+        self.client.force_login(user)
+        with mock.patch.object(SamplingProfiler, 'start', autospec=True, side_effect=SamplingProfiler.start) as start:
+            response = self.client.get(self.url, headers={'X-Profile': '1'})
+        self.assertEqual(start.call_count, 1)
+        self.assertTrue(ProfileSample.objects.filter(uid=response['X-Profile-Id']).exists())
+
+    def test_staff_basic_auth_authenticated_once(self):
+        """O usuário da API é autenticado uma única vez e não passa a exigir CSRF ao ser perfilado."""
+        get_user_model().objects.create_superuser('profiling-basic', password='senha-de-teste')
+        client = APIClient(enforce_csrf_checks=True)
+        client.credentials(HTTP_AUTHORIZATION=f"Basic {base64.b64encode(b'profiling-basic:senha-de-teste').decode()}")
+        with mock.patch.object(
+            BasicAuthentication, 'authenticate_credentials', autospec=True,
+            side_effect=BasicAuthentication.authenticate_credentials,
+        ) as authenticate_credentials:
+            response = client.post(self.url, {}, format='json', headers={'X-Profile': '1'})
+        self.assertEqual(authenticate_credentials.call_count, 1)
+        self.assertNotEqual(response.status_code, 403)
+        self.assertTrue(ProfileSample.objects.filter(uid=response['X-Profile-Id']).exists())
@@ -1,4 +1,13 @@
+import secrets
+from datetime import date, datetime, time, timezone as dt_timezone
+from decimal import Decimal
+from uuid import UUID
+
 import ulid
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+JSON_PRIMITIVE_TYPES = frozenset((str, int, float, bool, type(None)))
 
 
 def get_uuid() -> str:
@@ -7,3 +16,54 @@ def get_uuid() -> str:
     """
     return ulid.new().uuid
 
+
+def get_token() -> str:
+    """
+    Generate a new random URL-safe token.
+    """
+    return secrets.token_urlsafe(32)
+
+
+def to_json_safe(value):
+    """
+    Converte recursivamente um valor para tipos serializáveis em JSON
+    (datas em ISO 8601, UUID e Decimal em texto, tuplas em listas).
+    Tipos primitivos são retornados sem cópia.
+    """
+    value_type = type(value)
+    if value_type in JSON_PRIMITIVE_TYPES:
+        return value
+    if value_type is dict:
+        return {
+            key: item if type(item) in JSON_PRIMITIVE_TYPES else to_json_safe(item)
+            for key, item in value.items()
+        }
+    if value_type is list or value_type is tuple:
+        return [item if type(item) in JSON_PRIMITIVE_TYPES else to_json_safe(item) for item in value]
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: to_json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_safe(item) for item in value]
+    return value
+
+
+def get_observed_at(data: dict, default=None):
+    """
+    Retorna o instante de observação de um dado contextual (campo 'timestamp'),
+    ou o valor padrão quando ausente ou inválido.
+    """
+    value = data.get('timestamp')
+    if isinstance(value, str):
+        try:
+            value = parse_datetime(value)
+        except ValueError:
+            return default
+    if not isinstance(value, datetime):
+        return default
+    if timezone.is_naive(value):
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return value
@@ -1,3 +1,23 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from integrations.metrics import render_metrics
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Expõe as métricas da aplicação no formato do Prometheus.
+    Com METRICS_TOKEN configurado, exige o header "Authorization: Bearer <token>" (401 sem ele ou com
+    outro token).
+    """
+    if settings.METRICS_TOKEN:
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+            return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)